@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+# On-disk cache for Freesound lookups, with a TTL.
+#
+#   <root>/search/<key>.json    search results, keyed by query + filter + fields
+#   <root>/previews/<key>.mp3   downloaded previews, keyed by preview URL
+#
+# Entries older than the TTL count as missing and are replaced on the next
+# fetch. Files are written to a temporary name and renamed into place, so a
+# concurrent reader or an interrupted download never sees a partial entry.
+
+DEFAULT_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "audio/cache")
+DEFAULT_TTL_SECONDS = int(os.getenv("AUDIO_CACHE_TTL", str(7 * 24 * 60 * 60)))
+
+
+def cache_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SoundCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        # Lookups run on several threads at once (see search_and_download_many)
+        self._lock = threading.Lock()
+
+    def _fresh(self, path):
+        try:
+            fresh = time.time() - os.path.getmtime(path) < self.ttl_seconds
+        except OSError:
+            fresh = False
+        with self._lock:
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return fresh
+
+    def _path(self, kind, key, ext):
+        return os.path.join(self.root, kind, f"{key}{ext}")
+
+    # --- Search results ---
+
+    def get_search(self, query, filter, fields):
+        """Cached results for this exact search, or None if missing or expired."""
+        path = self._path("search", cache_key(query, filter, fields), ".json")
+        if not self._fresh(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put_search(self, query, filter, fields, results):
+        path = self._path("search", cache_key(query, filter, fields), ".json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(results, f)
+        os.replace(tmp, path)
+
+    # --- Previews ---
+
+    def preview_path(self, url):
+        """Where the preview at `url` is (or will be) cached."""
+        return self._path("previews", cache_key(url), ".mp3")
+
+    def get_preview(self, url):
+        path = self.preview_path(url)
+        return path if self._fresh(path) else None
+
+    def copy_to(self, cached_path, file_path):
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        shutil.copyfile(cached_path, file_path)
+        return file_path
@@ -1,27 +1,86 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-from modules.utils import save_audio_from_url
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from modules.cache import SoundCache
+from modules.utils import TIMEOUT, save_audio_from_url
+
+# Point at a local stub server for testing: FREESOUND_API_URL=http://127.0.0.1:8765/apiv2
+FREESOUND_API_URL = os.getenv("FREESOUND_API_URL", "https://freesound.org/apiv2")
+SEARCH_FIELDS = "id,name,previews"  # Request specific fields
+DEFAULT_FILTER = "duration:[0 TO 10]"  # Filter for shorter sounds
+MAX_WORKERS = int(os.getenv("FREESOUND_WORKERS", "4"))
+OUTPUT_DIR = "audio/outputs"
+
+_session = None
+_session_lock = threading.Lock()
+_cache = None
+
+
+def get_session():
+    # One pooled session for every lookup and download, so connections to Freesound are reused
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            retries = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                            allowed_methods=("GET",))
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS, max_retries=retries)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = SoundCache()
+    return _cache
+
+
+def _settings(config):
+    # Optional `freesound:` section of config.yaml: {filter: ..., cache_ttl: ...}
+    settings = (config or {}).get("freesound") or {}
+    cache = get_cache()
+    if "cache_ttl" in settings:
+        cache.ttl_seconds = int(settings["cache_ttl"])
+    return settings.get("filter", DEFAULT_FILTER), cache
+
+
+def search_sounds(query, filter=DEFAULT_FILTER, cache=None, session=None):
+    cache = cache or get_cache()
+    results = cache.get_search(query, filter, SEARCH_FIELDS)
+    if results is not None:
+        return results
 
-def search_and_download_sound(query, config):
     api_key = os.getenv("FREESOUND_API_KEY")
     if not api_key:
         raise Exception("Missing FREESOUND_API_KEY")
 
-    search_url = f"https://freesound.org/apiv2/search/text/"
     params = {
         "query": query,
         "token": api_key,
-        "fields": "id,name,previews",  # Request specific fields
-        "filter": "duration:[0 TO 10]"  # Filter for shorter sounds
+        "fields": SEARCH_FIELDS,
+        "filter": filter,
     }
-    
+    res = (session or get_session()).get(f"{FREESOUND_API_URL}/search/text/", params=params, timeout=TIMEOUT)
+    res.raise_for_status()  # Raise an exception for bad status codes
+    results = res.json().get("results", [])
+    cache.put_search(query, filter, SEARCH_FIELDS, results)
+    return results
+
+
+def search_and_download_sound(query, config):
+    filter, cache = _settings(config)
+    session = get_session()
     try:
-        res = requests.get(search_url, params=params)
-        res.raise_for_status()  # Raise an exception for bad status codes
-        
-        data = res.json()
-        results = data.get("results", [])
-        
+        results = search_sounds(query, filter, cache, session)
+
         if not results:
             print(f"[INFO] No results found for query: {query}")
             return None
@@ -31,9 +90,11 @@ def search_and_download_sound(query, config):
             previews = result.get("previews", {})
             if previews and "preview-hq-mp3" in previews:
                 sound_url = previews["preview-hq-mp3"]
-                file_name = f"audio/outputs/{query.replace(' ', '_')}.mp3"
-                save_audio_from_url(sound_url, file_name)
-                return file_name
+                file_name = f"{OUTPUT_DIR}/{query.replace(' ', '_')}.mp3"
+                cached = cache.get_preview(sound_url)
+                if cached is None:
+                    cached = save_audio_from_url(sound_url, cache.preview_path(sound_url), session)
+                return cache.copy_to(cached, file_name)
 
         print(f"[INFO] No preview available for query: {query}")
         return None
@@ -44,3 +105,13 @@ def search_and_download_sound(query, config):
     except Exception as e:
         print(f"[ERROR] Unexpected error: {str(e)}")
         return None
+
+
+def search_and_download_many(queries, config, max_workers=MAX_WORKERS):
+    # Look up every keyword at once over the shared session; {query: file path or None}
+    queries = list(dict.fromkeys(queries))
+    if not queries:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(queries)), thread_name_prefix="freesound") as pool:
+        paths = pool.map(lambda query: search_and_download_sound(query, config), queries)
+        return dict(zip(queries, paths))
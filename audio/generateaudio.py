@@ -1,20 +1,46 @@
-from modules.prompt_parser import extract_keywords_and_emotions
-from modules.freesound_search import search_and_download_sound
+import json
+import sys
+
+from modules.prompt_parser import analyze_game, extract_keywords_and_emotions
+from modules.freesound_search import search_and_download_many
 from modules.utils import load_config
 
+def select_game_audio(game_config, config):
+    # One sound per asset of a game: its four prompts are analyzed in one batch,
+    # then every asset's keyword is looked up at once
+    analysis = analyze_game(game_config)
+    keywords = {asset: (words[0] if words else "sound") for asset, (words, _) in analysis.items()}
+    print(f"[INFO] Searching Freesound for: {', '.join(f'{asset}={word}' for asset, word in keywords.items())}")
+    file_paths = search_and_download_many(keywords.values(), config)
+    return {asset: file_paths.get(word) for asset, word in keywords.items()}
+
 def main():
     config = load_config("config/config.yaml")
+
+    # With a game config (e.g. output_model/My_Game_config.json), pick sounds for the whole game
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "r") as f:
+            game_config = json.load(f)
+        for asset, path in select_game_audio(game_config, config).items():
+            if path:
+                print(f"[SUCCESS] Sound downloaded for {asset}: {path}")
+            else:
+                print(f"[ERROR] No sound found for {asset}.")
+        return
+
     prompt = input("Enter a prompt: ")
-    
+
     keywords, emotions = extract_keywords_and_emotions(prompt)
-    primary_keyword = keywords[0] if keywords else "sound"
-
-    print(f"[INFO] Searching Freesound for: {primary_keyword}")
-    file_path = search_and_download_sound(primary_keyword, config)
-    
-    if file_path:
-        print(f"[SUCCESS] Sound downloaded: {file_path}")
-    else:
+    keywords = keywords or ["sound"]
+
+    # Every keyword is looked up at once; repeats come from the on-disk cache
+    print(f"[INFO] Searching Freesound for: {', '.join(keywords)}")
+    file_paths = search_and_download_many(keywords, config)
+
+    found = {keyword: path for keyword, path in file_paths.items() if path}
+    for keyword, path in found.items():
+        print(f"[SUCCESS] Sound downloaded for '{keyword}': {path}")
+    if not found:
         print("[ERROR] No sound found.")
 
 if __name__ == '__main__':
@@ -1,10 +1,79 @@
-import spacy
-from nrclex import NRCLex
+import os
+import threading
+from collections import OrderedDict
 
-nlp = spacy.load("en_core_web_sm")
+# spaCy is loaded on first use, with only what POS tagging needs: token.pos_
+# comes from the tagger plus the attribute ruler that maps its tags to POS.
+SPACY_MODEL = "en_core_web_sm"
+SPACY_EXCLUDE = ["parser", "ner", "lemmatizer", "senter"]
+KEYWORD_POS = ("NOUN", "VERB", "ADJ")
+
+# nlp.pipe() only forks worker processes for batches big enough to pay for them
+PIPE_PROCESSES = int(os.getenv("SPACY_PROCESSES", str(min(4, os.cpu_count() or 1))))
+MIN_PARALLEL_PROMPTS = 64
+PIPE_BATCH_SIZE = 64
+CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "1024"))
+
+# Prompt fields of a game config, in either the API's or config/game_config.json's naming
+GAME_PROMPT_KEYS = {
+    "character": ("character", "character_prompt"),
+    "enemy": ("enemy", "enemy_prompt"),
+    "reward": ("reward", "reward_prompt"),
+    "background": ("background", "background_prompt"),
+}
+
+_nlp = None
+_nlp_lock = threading.Lock()
+_results = OrderedDict()  # prompt -> (keywords, emotions), least recently used first
+_results_lock = threading.Lock()
+
+def get_nlp():
+    global _nlp
+    with _nlp_lock:
+        if _nlp is None:
+            import spacy
+            _nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+        return _nlp
+
+def _emotions(prompt):
+    from nrclex import NRCLex
+    return NRCLex(prompt).top_emotions
+
+def analyze_many(prompts, n_process=None, batch_size=PIPE_BATCH_SIZE):
+    # [(keywords, emotions)] per prompt; repeats come from the LRU cache, the rest go through nlp.pipe together
+    prompts = list(prompts)
+    results = {}
+    with _results_lock:
+        for prompt in prompts:
+            if prompt in _results:
+                _results.move_to_end(prompt)
+                results[prompt] = _results[prompt]
+    todo = [prompt for prompt in dict.fromkeys(prompts) if prompt not in results]
+
+    if todo:
+        if n_process is None:
+            n_process = PIPE_PROCESSES if len(todo) >= MIN_PARALLEL_PROMPTS else 1
+        docs = get_nlp().pipe(todo, n_process=n_process, batch_size=batch_size)
+        for prompt, doc in zip(todo, docs):
+            keywords = tuple(token.text for token in doc if token.pos_ in KEYWORD_POS)
+            results[prompt] = (keywords, tuple(_emotions(prompt)))
+        with _results_lock:
+            for prompt in todo:
+                _results[prompt] = results[prompt]
+            while len(_results) > CACHE_SIZE:
+                _results.popitem(last=False)
+
+    # Fresh lists, so callers can't change what's cached
+    return [(list(results[prompt][0]), list(results[prompt][1])) for prompt in prompts]
 
 def extract_keywords_and_emotions(prompt):
-    doc = nlp(prompt)
-    keywords = [token.text for token in doc if token.pos_ in ("NOUN", "VERB", "ADJ")]
-    emotion_scores = NRCLex(prompt).top_emotions
-    return keywords, emotion_scores
+    return analyze_many([prompt])[0]
+
+def analyze_game(game_config):
+    # {"character", "enemy", "reward", "background": (keywords, emotions)} in one batched call
+    prompts = {}
+    for asset, keys in GAME_PROMPT_KEYS.items():
+        prompt = next((game_config[key] for key in keys if game_config.get(key)), None)
+        if prompt:
+            prompts[asset] = prompt
+    return dict(zip(prompts, analyze_many(prompts.values())))
@@ -0,0 +1,11 @@
+import os
+import sys
+import types
+
+# The audio modules import each other as `modules.<name>` (the package name
+# they are deployed under); point that package at this folder
+AUDIO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if "modules" not in sys.modules:
+    package = types.ModuleType("modules")
+    package.__path__ = [AUDIO_DIR]
+    sys.modules["modules"] = package
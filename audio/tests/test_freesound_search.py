@@ -0,0 +1,133 @@
+"""Freesound lookups against a local stub of the API."""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from modules import freesound_search
+from modules.cache import SoundCache
+
+QUERIES = ["sword swing", "coin pickup", "jump", "explosion"]
+# Big enough to arrive in several CHUNK_SIZE reads
+PREVIEW_BYTES = bytes(range(256)) * 1024
+# How long the stub holds each search, so concurrent lookups overlap
+SEARCH_DELAY = 0.3
+
+
+class StubFreesound(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        with server.lock:
+            server.requests.append(url.path)
+            server.connections.add(self.client_address)
+
+        if url.path == "/apiv2/search/text/":
+            with server.lock:
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            time.sleep(SEARCH_DELAY)
+            with server.lock:
+                server.in_flight -= 1
+            query = parse_qs(url.query)["query"][0]
+            preview = f"http://127.0.0.1:{server.server_port}/previews/{query.replace(' ', '_')}.mp3"
+            self._send(json.dumps({"results": [{"id": 1, "name": query, "previews": {"preview-hq-mp3": preview}}]})
+                       .encode("utf-8"), "application/json")
+        elif url.path.startswith("/previews/"):
+            self._send(PREVIEW_BYTES, "audio/mpeg")
+        else:
+            self.send_error(404)
+
+    def _send(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubFreesound)
+    server.lock = threading.Lock()
+    server.requests, server.connections = [], set()
+    server.in_flight = server.max_in_flight = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def freesound(stub, tmp_path, monkeypatch):
+    monkeypatch.setenv("FREESOUND_API_KEY", "test-key")
+    monkeypatch.setattr(freesound_search, "FREESOUND_API_URL", f"http://127.0.0.1:{stub.server_port}/apiv2")
+    monkeypatch.setattr(freesound_search, "OUTPUT_DIR", str(tmp_path / "outputs"))
+    monkeypatch.setattr(freesound_search, "_cache", SoundCache(str(tmp_path / "cache")))
+    monkeypatch.setattr(freesound_search, "_session", None)
+    return freesound_search
+
+
+def _fetch(freesound):
+    return freesound.search_and_download_many(QUERIES, {}, max_workers=len(QUERIES))
+
+
+def test_keywords_are_fetched_concurrently_over_one_session(freesound, stub):
+    paths = _fetch(freesound)
+
+    assert set(paths) == set(QUERIES)
+    assert stub.requests.count("/apiv2/search/text/") == len(QUERIES)
+    assert stub.max_in_flight == len(QUERIES)
+    # One search and one download per keyword, over at most one connection per worker
+    assert len(stub.requests) == 2 * len(QUERIES)
+    assert len(stub.connections) <= len(QUERIES)
+    assert freesound.get_session() is freesound.get_session()
+
+
+def test_previews_are_streamed_to_disk(freesound, tmp_path):
+    paths = _fetch(freesound)
+
+    for query, path in paths.items():
+        assert path == os.path.join(freesound.OUTPUT_DIR, f"{query.replace(' ', '_')}.mp3")
+        with open(path, "rb") as f:
+            assert f.read() == PREVIEW_BYTES
+    previews = os.listdir(tmp_path / "cache" / "previews")
+    assert len(previews) == len(QUERIES)
+    assert not [name for name in previews if name.endswith(".part")]
+
+
+def test_fresh_entries_come_from_the_cache(freesound, stub):
+    _fetch(freesound)
+    stub.requests.clear()
+    cache = freesound.get_cache()
+    hits = cache.hits
+
+    paths = _fetch(freesound)
+
+    assert stub.requests == []
+    assert all(path is not None for path in paths.values())
+    # A search and a preview per keyword
+    assert cache.hits - hits == 2 * len(QUERIES)
+
+
+def test_expired_entries_are_fetched_again(freesound, stub):
+    _fetch(freesound)
+    stub.requests.clear()
+
+    freesound.get_cache().ttl_seconds = 0
+    paths = _fetch(freesound)
+
+    assert all(path is not None for path in paths.values())
+    assert stub.requests.count("/apiv2/search/text/") == len(QUERIES)
+    assert len(stub.requests) == 2 * len(QUERIES)
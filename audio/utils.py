@@ -1,13 +1,28 @@
 import yaml
 import requests
 import os
+import threading
 
-def save_audio_from_url(url, file_path):
+CHUNK_SIZE = 64 * 1024
+# (connect, read) seconds for every Freesound request
+TIMEOUT = (5, 30)
+
+def save_audio_from_url(url, file_path, session=None, timeout=TIMEOUT, chunk_size=CHUNK_SIZE):
     # Ensure the output directory exists
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    res = requests.get(url)
-    with open(file_path, "wb") as f:
-        f.write(res.content)
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    # Stream to a temporary file in chunks, then rename, so a failed download leaves nothing behind
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        with (session or requests).get(url, stream=True, timeout=timeout) as res:
+            res.raise_for_status()
+            with open(tmp_path, "wb") as f:
+                for chunk in res.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return file_path
 
 def load_config(path):
     with open(path, "r") as f:
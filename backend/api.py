@@ -1,19 +1,53 @@
+import asyncio
+import json
 import uuid
 import os
-from fastapi import FastAPI, BackgroundTasks
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import Dict
 
-# Import your refactored generation logic (we'll create this in the next step)
-from worker import run_asset_generation
+from generator.bulk import MAX_BATCH_PROMPTS, STYLES, plan_batch
+from generator.cache import get_cache
+from job_store import get_job_store, FAILURE, QUEUED, TERMINAL_STATUSES
+from events import get_event_log, STATUS
+from metrics import get_metrics
+from worker_pool import WorkerPool, QueueFullError, BrokerClosedError, PRIORITY_INTERACTIVE, PRIORITY_BULK
+
+# Job status lives in a persistent store (SQLite by default, Redis via JOB_STORE_URL)
+# so every uvicorn worker process sees the same jobs and status survives restarts.
+jobs = get_job_store()
+events = get_event_log()
+
+# How often the event stream checks the event log, and how often it sends a
+# keep-alive comment so proxies don't drop an idle connection
+EVENT_POLL_SECONDS = 0.25
+EVENT_KEEPALIVE_SECONDS = 15
+
+# Generation runs on a dedicated pool of model-owning workers fed by a bounded
+# priority queue. With a shared broker (BROKER_URL=redis://...) the pool can run
+# separately (`python worker_pool.py`) and the API only enqueues: set EMBEDDED_WORKERS=0.
+# With the default in-memory broker, run a single API process per host: the pool
+# refuses to start twice, and fails jobs a previous process left unfinished.
+pool = WorkerPool()
+EMBEDDED_WORKERS = os.getenv("EMBEDDED_WORKERS", "1") == "1"
 
-# --- FastAPI App Setup ---
-app = FastAPI()
 
-# In-memory "database" to track job status. For a real app, use Redis or a DB.
-jobs: Dict[str, Dict] = {}
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if EMBEDDED_WORKERS:
+        pool.start()
+    yield
+    if EMBEDDED_WORKERS:
+        # Let queued and running jobs finish before the process exits
+        await asyncio.to_thread(pool.shutdown, True)
+
+
+# --- FastAPI App Setup ---
+app = FastAPI(lifespan=lifespan)
 
 # --- Pydantic Models for API Data Validation ---
 class GameGenerationRequest(BaseModel):
@@ -23,6 +57,13 @@ class GameGenerationRequest(BaseModel):
     reward: str
     enemy: str
     levels: int
+    previews: bool = False  # Stream low-resolution latent previews over /events
+
+class BatchGenerationRequest(BaseModel):
+    prompts: List[str]  # Subjects, e.g. the lines of fantasy_background_prompts.txt
+    styles: List[str] = list(STYLES)  # Every prompt is generated in each of these
+    asset_type: str = "backgrounds"  # characters, backgrounds, rewards or enemies
+    white_bg: bool = True
 
 # --- CORS Middleware ---
 # This allows your React app (running on a different port) to talk to this server.
@@ -42,9 +83,17 @@ if not os.path.exists("assets"):
 app.mount("/assets", StaticFiles(directory="assets"), name="assets")
 
 
+def reject(task_id: str, reason: str):
+    # QUEUED was published before submitting (so it can't land after a fast
+    # worker's STARTED); close the job's event stream before forgetting it
+    events.publish(task_id, STATUS, {"status": FAILURE, "result": reason})
+    jobs.delete(task_id)
+
+
 # --- API Endpoints ---
+# Plain `def`: the job store and broker calls block, so FastAPI runs these in its threadpool
 @app.post("/generate-game")
-async def generate_game(request: GameGenerationRequest, background_tasks: BackgroundTasks):
+def generate_game(request: GameGenerationRequest):
     """
     This endpoint kicks off the asset generation process.
     It immediately returns a task_id so the frontend doesn't have to wait.
@@ -52,12 +101,63 @@ async def generate_game(request: GameGenerationRequest, background_tasks: Backgr
     task_id = str(uuid.uuid4())
     
     # Store job info
-    jobs[task_id] = {"status": "QUEUED", "result": None}
+    jobs.create(task_id, owner=pool.owner)
+    events.publish(task_id, STATUS, {"status": QUEUED, "result": None})
     
-    # Run the actual heavy lifting in the background
-    background_tasks.add_task(run_asset_generation, task_id, request.dict(), jobs)
+    # Queue the heavy lifting for the GPU workers, ahead of any bulk jobs
+    try:
+        position = pool.submit(task_id, "worker:run_asset_generation", request.dict(), PRIORITY_INTERACTIVE)
+    except QueueFullError as e:
+        reject(task_id, str(e))
+        raise HTTPException(
+            status_code=429,
+            detail={"message": str(e), "queue_position": e.position, "queue_size": e.max_size},
+        )
+    except BrokerClosedError as e:
+        reject(task_id, str(e))
+        raise HTTPException(status_code=503, detail=str(e))
     
-    return {"task_id": task_id}
+    return {"task_id": task_id, "queue_position": position}
+
+
+@app.post("/generate-batch")
+def generate_batch(request: BatchGenerationRequest):
+    """
+    Queue a bulk job: every prompt in every requested style, with identical
+    composed prompts generated once. Runs behind interactive jobs. Returns one
+    batch ID; /status/{batch_id} reports aggregate progress and throughput while
+    it runs, and /events/{batch_id} streams each image as it is saved.
+    """
+    try:
+        plan = plan_batch(request.prompts, request.asset_type, request.styles, request.white_bg)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not plan.specs:
+        raise HTTPException(status_code=422, detail="No prompts to generate")
+    if len(plan.specs) > MAX_BATCH_PROMPTS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Batch has {len(plan.specs)} prompts; the limit is {MAX_BATCH_PROMPTS}",
+        )
+
+    batch_id = str(uuid.uuid4())
+    jobs.create(batch_id, owner=pool.owner)
+    events.publish(batch_id, STATUS, {"status": QUEUED, "result": None})
+
+    try:
+        position = pool.submit(batch_id, "worker:run_batch_generation", request.dict(), PRIORITY_BULK)
+    except QueueFullError as e:
+        reject(batch_id, str(e))
+        raise HTTPException(
+            status_code=429,
+            detail={"message": str(e), "queue_position": e.position, "queue_size": e.max_size},
+        )
+    except BrokerClosedError as e:
+        reject(batch_id, str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {"batch_id": batch_id, "total": len(plan.specs), "duplicates": plan.duplicates,
+            "queue_position": position}
 
 
 @app.get("/status/{task_id}")
@@ -65,10 +165,71 @@ async def get_status(task_id: str):
     """
     This endpoint lets the frontend poll for the status of a generation job.
     """
-    job = jobs.get(task_id, {})
+    job = jobs.get(task_id) or {}
     # The frontend expects 'result' to be a dict with URLs on success
     # The worker function will populate this.
-    return {"task_id": task_id, "status": job.get("status", "FAILURE"), "result": job.get("result")}
+    response = {"task_id": task_id, "status": job.get("status", FAILURE), "result": job.get("result")}
+    if response["status"] == QUEUED:
+        response["queue_position"] = pool.position(task_id)
+    return response
+
+@app.get("/events/{task_id}")
+async def job_events(task_id: str, request: Request, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events stream of a job's progress: status changes, each asset
+    URL as soon as it is saved, denoising steps and (if requested) previews.
+    The stream ends after the job's final status event. Browsers resume with
+    the Last-Event-ID header automatically after a dropped connection.
+    """
+    if jobs.get(task_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown task_id")
+
+    # Resume after the client's last event; start over if the header isn't one of our ids
+    resume_after = last_event_id if last_event_id and events.is_event_id(last_event_id) else "0"
+
+    async def stream():
+        after = resume_after
+        idle = 0.0
+        while not await request.is_disconnected():
+            batch = await asyncio.to_thread(events.read, task_id, after)
+            if not batch:
+                await asyncio.sleep(EVENT_POLL_SECONDS)
+                idle += EVENT_POLL_SECONDS
+                if idle >= EVENT_KEEPALIVE_SECONDS:
+                    idle = 0.0
+                    yield ": keep-alive\n\n"
+                continue
+
+            idle = 0.0
+            for event in batch:
+                after = event["id"]
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+                if event["type"] == STATUS and event["data"]["status"] in TERMINAL_STATUSES:
+                    return
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Hit/miss counters and size of the generation cache.
+    """
+    cache = get_cache()
+    if cache is None:
+        return {"enabled": False}
+    # Reads counters.db and walks the cache directory
+    return await asyncio.to_thread(cache.stats)
+
+
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    """
+    Micro-batching stats (queue waits, batch fill) of each GPU worker process,
+    as last published by the worker after a job.
+    """
+    snapshots = await asyncio.to_thread(get_metrics().snapshots, "scheduler")
+    return {"workers": snapshots}
 
 # To run the server:
 # In your terminal, in the 'backend' directory, run:
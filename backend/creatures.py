@@ -1,58 +1,50 @@
+import argparse
 import os
-import json
-from PIL import Image
-from transformers import pipeline
-from diffusers import StableDiffusionPipeline
-import torch
-
-# Initialize caption generator (BLIP)
-captioner = pipeline("image-to-text", model="Salesforce/blip-image-captioning-base")
-
-# Initialize Stable Diffusion image generation pipeline
-pipe = StableDiffusionPipeline.from_pretrained(
-    "CompVis/stable-diffusion-v1-4",
-    torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-    variant="fp16" if torch.cuda.is_available() else None,
-).to("cuda" if torch.cuda.is_available() else "cpu")
+
+from generator.dataset_builder import (CAPTION_BATCH_SIZE, DATASETS, GEN_BATCH_SIZE, DatasetBuilder,
+                                       blip_captions, load_prompts)
+from generator.model_registry import default_device, get_pipeline
+
+CREATURE_MODEL_ID = "CompVis/stable-diffusion-v1-4"
+
+def get_pipe():
+    # Stable Diffusion pipeline, loaded on first use and shared through the model registry
+    device = default_device()
+    return get_pipeline(CREATURE_MODEL_ID, device=device,
+                        variant="fp16" if device.startswith("cuda") else None)
 
 def generate_creature_with_caption(prompt, filename):
-    # Generate image
-    image = pipe(prompt).images[0]
+    # Generate image, caption it while still in memory, then save
+    image = get_pipe()(prompt).images[0]
+    caption = blip_captions([image])[0]
     image.save(filename)
 
-    # Generate caption
-    caption = captioner(filename)[0]['generated_text']
-
     return {
         "image": f"./outputs/{os.path.basename(filename)}",
         "text": caption,
         "prompt": prompt
     }
 
-def load_prompts(file_path):
-    with open(file_path, "r", encoding="utf-8") as f:
-        return [line.strip() for line in f if line.strip()]
-
 def main():
-    os.makedirs("outputss", exist_ok=True)
-
-    # Creature prompt themes
-    themes = load_prompts("C:/nus_adv/fantasy_creature_prompts.txt")
-
-    dataset = []
-    for i, theme in enumerate(themes):
-        prompt = f"{theme}, 2D stylized realism, game creature, isolated on white background"
-        filename = os.path.join("outputs", f"creature_{i}.png")
-        result = generate_creature_with_caption(prompt, filename)
-        dataset.append(result)
-        print(f"[{i+1}] Generated: {result['text']}")
-
-    # Save metadata JSON
-    with open("outputs/game_creatures.json", "w", encoding="utf-8") as f:
-        json.dump(dataset, f, indent=2)
-
-    print("\nDataset saved with", len(dataset), "entries in the 'outputs' folder.")
-    print("Files in outputs:", os.listdir("outputs"))
+    parser = argparse.ArgumentParser(description="Build a captioned fine-tuning dataset (resumable).")
+    parser.add_argument("--kind", choices=sorted(DATASETS), default="creatures")
+    parser.add_argument("--prompts", help="Prompt file, one theme per line (default: the dataset's own)")
+    parser.add_argument("--output-dir", help="Image and dataset directory (default: outputs)")
+    parser.add_argument("--gen-batch", type=int, default=GEN_BATCH_SIZE, help="Prompts per diffusion call")
+    parser.add_argument("--caption-batch", type=int, default=CAPTION_BATCH_SIZE, help="Images per BLIP call")
+    args = parser.parse_args()
+
+    spec = DATASETS[args.kind]
+    if args.prompts:
+        spec = spec._replace(prompt_file=args.prompts)
+    if args.output_dir:
+        spec = spec._replace(output_dir=args.output_dir,
+                             dataset_file=os.path.join(args.output_dir, os.path.basename(spec.dataset_file)))
+
+    builder = DatasetBuilder(spec, get_pipe(), gen_batch_size=args.gen_batch, caption_batch_size=args.caption_batch)
+    stats = builder.run()
+    print(f"\nDataset has {stats['written'] + stats['skipped']} of {len(load_prompts(spec.prompt_file))} "
+          f"entries in the '{spec.output_dir}' folder.")
 
 if __name__ == "__main__":
     main()
@@ -1,144 +1,380 @@
-import os
+"""
+Fine-tune the generator's UNet on captioned game art.
+
+    python dreambooth_ft.py --batch-size 4 --grad-accum 2 --epochs 10
+    python dreambooth_ft.py --resume latest        # continue from the newest checkpoint
+    python dreambooth_ft.py --smoke                # tiny random model on CPU, no downloads
+
+Paths default to the GAME_ASSET_MODEL / DREAMBOOTH_* env vars. Images are
+VAE-encoded once into the latent cache (generator/latent_cache.py); training
+then samples latents from the cached moments. Every --checkpoint-every
+optimizer steps the UNet, optimizer and RNG states are saved under
+--checkpoints (a run directory kept apart from the exported model, so the
+model folder only ever holds the final weights), and --resume picks up at the exact batch it stopped at:
+each epoch's shuffle comes from (seed, epoch), so a resumed run sees the same
+batches an uninterrupted one would.
+
+Also usable from Python: train(TrainConfig(...)).
+"""
+
+import argparse
 import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
 from PIL import Image
-from datasets import Dataset
-import torch
-from torch.utils.data import DataLoader
-from transformers import CLIPTokenizer, CLIPTextModel, default_data_collator
-from diffusers import StableDiffusionPipeline, UNet2DConditionModel, DDPMScheduler
-from accelerate import Accelerator
-
-# Paths
-MODEL_ID = "C:/nus_adv/output_model"
-INSTANCE_DIR = "C:/nus_adv"
-CAPTION_FILE = "C:/nus_adv/game_creatures.json"
-OUTPUT_DIR = "C:/nus_adv/output_model"
-
-device = "cuda" if torch.cuda.is_available() else "cpu"
-
-# Load captions
-with open(CAPTION_FILE, "r") as f:
-    captions = json.load(f)
-
-# Load tokenizer and text encoder
-tokenizer = CLIPTokenizer.from_pretrained("openai/clip-vit-large-patch14")
-# We'll use pipe's text_encoder instead of loading separately for consistency
-# But you can load separately too if you prefer:
-# text_encoder = CLIPTextModel.from_pretrained("openai/clip-vit-large-patch14")
-
-# Load pipeline (for VAE, feature extractor, and text_encoder)
-pipe = StableDiffusionPipeline.from_pretrained(
-    MODEL_ID,
-    torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-).to(device)
-
-vae = pipe.vae
-vae.eval()
-vae.to(device)
-
-# Create dataset from images and captions
-def load_dataset():
-    data = []
-    for entry in captions:
-        # Normalize path
-        image_path = os.path.normpath(entry["image"])
-        full_path = os.path.join(INSTANCE_DIR, image_path) if not os.path.isabs(image_path) else image_path
-
-        if os.path.exists(full_path):
-            data.append({
-                "image": full_path,
-                "prompt": entry["text"]  # Fine-tuning on this caption
-            })
-        else:
-            print(f"Missing image: {full_path}")
-    return Dataset.from_list(data)
-
-
-
-dataset = load_dataset()
-
-# Preprocess dataset: resize, pixel normalize, tokenize prompts
-def preprocess(example):
-    image = Image.open(example["image"]).convert("RGB").resize((768, 768))
-    example["pixel_values"] = pipe.feature_extractor(images=image, return_tensors="pt")["pixel_values"][0]
-    example["input_ids"] = tokenizer(
-        example["prompt"],
-        return_tensors="pt",
-        padding="max_length",
-        truncation=True,
-        max_length=77,
-    )["input_ids"][0]
-    return example
-
-dataset = dataset.map(preprocess, remove_columns=["image", "prompt"])
-
-train_dataloader = DataLoader(dataset, batch_size=1, shuffle=True, collate_fn=default_data_collator)
-
-# Load UNet and noise scheduler
-unet = UNet2DConditionModel.from_pretrained(MODEL_ID, subfolder="unet").to(device)
-noise_scheduler = DDPMScheduler.from_pretrained(MODEL_ID, subfolder="scheduler")
-
-# Use accelerator for mixed precision, device management, and optimization
-accelerator = Accelerator(mixed_precision="fp16")
-optimizer = torch.optim.AdamW(unet.parameters(), lr=1e-6)
-
-# Prepare models and dataloader
-unet, optimizer, train_dataloader, vae, pipe.text_encoder = accelerator.prepare(
-    unet, optimizer, train_dataloader, vae, pipe.text_encoder
-)
-
-pipe.text_encoder.eval()  # Freeze text encoder during fine-tuning
-
-# Training loop
-num_epochs = 10
-for epoch in range(num_epochs):
-    unet.train()
-    for step, batch in enumerate(train_dataloader):
-        pixel_values = batch["pixel_values"].to(accelerator.device).to(dtype=vae.dtype)
-        input_ids = batch["input_ids"].to(accelerator.device)
-
-        # Encode images to latents
+
+from generator.caption_index import iter_entries
+from generator.latent_cache import DEFAULT_LATENT_CACHE_DIR, SCALING_FACTOR, CachedLatentDataset, LatentCache, sample_latents
+from generator.model_registry import DEFAULT_MODEL_PATH
+
+DEFAULT_INSTANCE_DIR = os.getenv("DREAMBOOTH_DATA", ".")
+DEFAULT_CAPTION_FILE = os.getenv("DREAMBOOTH_CAPTIONS", "game_creatures.json")
+DEFAULT_OUTPUT_DIR = os.getenv("DREAMBOOTH_OUTPUT", DEFAULT_MODEL_PATH)
+DEFAULT_CHECKPOINT_DIR = os.getenv("DREAMBOOTH_CHECKPOINTS", "checkpoints/dreambooth")
+SMOKE_OUTPUT_DIR = os.path.join(tempfile.gettempdir(), "dreambooth_smoke")
+SMOKE_CHECKPOINT_DIR = os.path.join(tempfile.gettempdir(), "dreambooth_smoke_checkpoints")
+TOKENIZER_ID = "openai/clip-vit-large-patch14"
+
+
+class TrainConfig(NamedTuple):
+    model_id: str = DEFAULT_MODEL_PATH
+    instance_dir: str = DEFAULT_INSTANCE_DIR
+    caption_file: str = DEFAULT_CAPTION_FILE
+    output_dir: str = DEFAULT_OUTPUT_DIR
+    checkpoint_dir: str = DEFAULT_CHECKPOINT_DIR
+    latent_cache_dir: str = DEFAULT_LATENT_CACHE_DIR
+    resolution: int = 768
+    batch_size: int = 1
+    grad_accum: int = 1  # Batches per optimizer step
+    epochs: int = 10
+    lr: float = 1e-6
+    mixed_precision: str = "fp16"  # "no" on CPU
+    seed: int = 0
+    log_every: int = 10  # Optimizer steps between loss read-backs (each one syncs the device)
+    checkpoint_every: int = 500  # Optimizer steps between checkpoints (0 = only at the end)
+    keep_checkpoints: int = 2
+    resume: Optional[str] = None  # Checkpoint directory, or "latest"
+    smoke: bool = False
+
+
+# --- SECTION 1: DATA ---
+
+def load_dataset(caption_file, instance_dir):
+    """
+    Stream {"image": path, "prompt": caption} for every captioned image that
+    exists. `caption_file` is a caption index (.db, see generator/caption_index.py)
+    or a captions.json / game_creatures.json(l) file.
+    """
+    for entry in iter_entries(caption_file, instance_dir):
+        yield {
+            "image": entry["image"],
+            "prompt": entry["text"]  # Fine-tuning on this caption
+        }
+
+
+class EpochSampler:
+    """
+    Shuffled indices drawn from (seed, epoch) alone, so the order of any epoch
+    can be reproduced after a restart. `skip` drops the first items of the
+    epoch (the batches a checkpoint already covered).
+    """
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.seed = seed
+        self.epoch = 0
+        self.skip = 0
+
+    def set_epoch(self, epoch, skip=0):
+        self.epoch = epoch
+        self.skip = skip
+
+    def __iter__(self):
+        order = np.random.default_rng([self.seed, self.epoch]).permutation(self.size)
+        return iter(order[self.skip:].tolist())
+
+    def __len__(self):
+        return max(0, self.size - self.skip)
+
+
+def build_latents(config: TrainConfig, pipe, tokenizer, device):
+    """VAE-encode (once) and tokenize the dataset; returns (cache, rows, scaling factor)."""
+    import torch
+
+    vae = pipe.vae
+    vae.eval()
+    vae.to(device)
+
+    def encode_images(paths):
+        images = [Image.open(path).convert("RGB").resize((config.resolution, config.resolution)) for path in paths]
+        pixel_values = pipe.feature_extractor(images=images, return_tensors="pt")["pixel_values"]
         with torch.no_grad():
-            latents = vae.encode(pixel_values).latent_dist.sample() * 0.18215
-
-        # Sample noise and timesteps
-        noise = torch.randn_like(latents)
-        timesteps = torch.randint(
-            0,
-            noise_scheduler.config.num_train_timesteps,
-            (latents.shape[0],),
-            device=latents.device,
-        ).long()
-
-        # Add noise to latents according to noise schedule
-        noisy_latents = noise_scheduler.add_noise(latents, noise, timesteps)
-
-        # Cast noisy latents and noise to UNet dtype
-        noisy_latents = noisy_latents.to(dtype=unet.dtype)
-        noise = noise.to(dtype=unet.dtype)
-        timesteps = timesteps.to(device=unet.device)
-
-        # Convert input_ids to embeddings using text encoder, cast to unet dtype
-        encoder_hidden_states = pipe.text_encoder(input_ids)[0].to(dtype=unet.dtype)
-
-        # Forward pass through UNet
-        model_pred = unet(
-            sample=noisy_latents,
-            timestep=timesteps,
-            encoder_hidden_states=encoder_hidden_states,
-        ).sample
-
-        # Calculate loss
-        loss = torch.nn.functional.mse_loss(model_pred, noise)
-
-        # Backpropagation
-        accelerator.backward(loss)
-        optimizer.step()
-        optimizer.zero_grad()
-
-        print(f"[Epoch {epoch+1} Step {step+1}] Loss: {loss.item():.4f}")
-
-# Save fine-tuned UNet and pipeline weights
-unet.save_pretrained(OUTPUT_DIR)
-pipe.save_pretrained(OUTPUT_DIR)
-print(f"\nFine-tuned model saved at {OUTPUT_DIR}")
+            latent_dist = vae.encode(pixel_values.to(device, dtype=vae.dtype)).latent_dist
+        return latent_dist.parameters.float().cpu().numpy()
+
+    def tokenize(prompts):
+        return tokenizer(prompts, return_tensors="np", padding="max_length", truncation=True, max_length=77)["input_ids"]
+
+    dataset = load_dataset(config.caption_file, config.instance_dir)
+    cache = LatentCache(config.latent_cache_dir, resolution=config.resolution, model_id=config.model_id)
+    rows = cache.build(dataset, encode_images, tokenize)
+    scaling_factor = getattr(vae.config, "scaling_factor", None) or SCALING_FACTOR
+
+    # The VAE isn't needed for training; free its memory
+    vae.to("cpu")
+    if device == "cuda":
+        torch.cuda.empty_cache()
+    return cache, rows, scaling_factor
+
+
+# --- SECTION 2: MODELS ---
+
+def load_models(config: TrainConfig, device):
+    """(pipe, unet, text encoder, noise scheduler, cache, rows, scaling factor) for a real run."""
+    from diffusers import DDPMScheduler, UNet2DConditionModel
+    from transformers import CLIPTokenizer
+
+    from generator.model_registry import get_pipeline
+
+    tokenizer = CLIPTokenizer.from_pretrained(TOKENIZER_ID)
+    # Shared through the model registry so generation code in the same process reuses it
+    pipe = get_pipeline(config.model_id, device=device)
+    cache, rows, scaling_factor = build_latents(config, pipe, tokenizer, device)
+    unet = UNet2DConditionModel.from_pretrained(config.model_id, subfolder="unet").to(device)
+    noise_scheduler = DDPMScheduler.from_pretrained(config.model_id, subfolder="scheduler")
+    return pipe, unet, pipe.text_encoder, noise_scheduler, cache, rows, scaling_factor
+
+
+def smoke_models(config: TrainConfig, workdir):
+    """
+    Tiny randomly initialised UNet and text encoder plus a few random 64px
+    images, so the whole loop (cache, accumulation, checkpoints, resume) runs
+    on CPU in seconds without downloading anything.
+    """
+    import torch
+    from diffusers import DDPMScheduler, UNet2DConditionModel
+    from transformers import CLIPTextConfig, CLIPTextModel
+
+    # Seeded, so a resumed smoke run rebuilds the same frozen text encoder
+    torch.manual_seed(config.seed)
+    rng = np.random.default_rng(config.seed)
+    dataset = []
+    for i in range(8):
+        path = Path(workdir) / "images" / f"smoke_{i}.png"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        Image.fromarray(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)).save(path)
+        dataset.append({"image": str(path), "prompt": f"smoke test creature {i}"})
+
+    def encode_images(paths):
+        # Stand-in VAE: 4 x 8 x 8 latents, mean ~ N(0, 1), small log-variance
+        mean = rng.standard_normal((len(paths), 4, 8, 8))
+        return np.concatenate([mean, np.full_like(mean, -4.0)], axis=1)
+
+    def tokenize(prompts):
+        return rng.integers(0, 1000, (len(prompts), 77))
+
+    cache = LatentCache(Path(workdir) / "latents", resolution=64, model_id="smoke")
+    rows = cache.build(dataset, encode_images, tokenize)
+    text_encoder = CLIPTextModel(CLIPTextConfig(vocab_size=1000, hidden_size=32, intermediate_size=37,
+                                                num_hidden_layers=2, num_attention_heads=4,
+                                                max_position_embeddings=77))
+    unet = UNet2DConditionModel(sample_size=8, in_channels=4, out_channels=4, layers_per_block=1,
+                                block_out_channels=(32, 64), cross_attention_dim=32,
+                                down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"),
+                                up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"))
+    return None, unet, text_encoder, DDPMScheduler(num_train_timesteps=100), cache, rows, SCALING_FACTOR
+
+
+# --- SECTION 3: CHECKPOINTS ---
+
+def latest_checkpoint(checkpoint_dir) -> Optional[Path]:
+    checkpoints = sorted(Path(checkpoint_dir).glob("step_*"), key=lambda path: int(path.name[5:]))
+    return checkpoints[-1] if checkpoints else None
+
+
+def save_checkpoint(accelerator, config: TrainConfig, state: dict):
+    """Save UNet, optimizer and RNG states plus the loop position; keep the newest few."""
+    path = Path(config.checkpoint_dir, f"step_{state['global_step']}")
+    accelerator.save_state(str(path))  # Models, optimizer, and python / numpy / torch / cuda RNG
+    with open(path / "trainer_state.json", "w") as f:
+        json.dump({**state, "config": config._asdict()}, f, indent=2)
+    print(f"[CKPT] Saved {path}")
+    checkpoints = sorted(path.parent.glob("step_*"), key=lambda p: int(p.name[5:]))
+    for old in checkpoints[:-config.keep_checkpoints] if config.keep_checkpoints else []:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def load_checkpoint(accelerator, config: TrainConfig) -> dict:
+    """Restore a checkpoint (config.resume) and return the loop position it was saved at."""
+    path = latest_checkpoint(config.checkpoint_dir) if config.resume == "latest" else Path(config.resume)
+    if path is None:
+        print("[CKPT] No checkpoint to resume from, starting fresh")
+        return {"epoch": 0, "batch": 0, "global_step": 0}
+    accelerator.load_state(str(path))
+    with open(path / "trainer_state.json") as f:
+        state = json.load(f)
+    print(f"[CKPT] Resumed from {path} (epoch {state['epoch'] + 1}, batch {state['batch']}, step {state['global_step']})")
+    return {key: state[key] for key in ("epoch", "batch", "global_step")}
+
+
+# --- SECTION 4: TRAINING LOOP ---
+
+def train(config: TrainConfig):
+    """Run (or resume) fine-tuning; returns the directory the model was saved to."""
+    import torch
+    from accelerate import Accelerator
+    from torch.utils.data import DataLoader
+    from transformers import default_data_collator
+
+    device = "cuda" if torch.cuda.is_available() and not config.smoke else "cpu"
+    if config.smoke:
+        config = config._replace(mixed_precision="no")
+        pipe, unet, text_encoder, noise_scheduler, cache, rows, scaling_factor = smoke_models(config, config.output_dir)
+    else:
+        pipe, unet, text_encoder, noise_scheduler, cache, rows, scaling_factor = load_models(config, device)
+
+    sampler = EpochSampler(len(rows), seed=config.seed)
+    # Not passed to accelerator.prepare: the sampler alone decides the order, which is what makes resume exact
+    train_dataloader = DataLoader(CachedLatentDataset(cache, rows), batch_size=config.batch_size, sampler=sampler,
+                                  collate_fn=default_data_collator)
+
+    accelerator = Accelerator(mixed_precision=config.mixed_precision, cpu=config.smoke)
+    optimizer = torch.optim.AdamW(unet.parameters(), lr=config.lr)
+    unet, optimizer = accelerator.prepare(unet, optimizer)
+
+    # Frozen text encoder, so it stays out of the checkpoints
+    text_encoder.requires_grad_(False)
+    text_encoder.eval()
+    text_encoder.to(accelerator.device)
+
+    torch.manual_seed(config.seed)
+    position = {"epoch": 0, "batch": 0, "global_step": 0}
+    if config.resume:
+        position = load_checkpoint(accelerator, config)
+
+    batches_per_epoch = -(-len(rows) // config.batch_size)
+    print(f"[TRAIN] {len(rows)} images, {batches_per_epoch} batches/epoch of {config.batch_size}, "
+          f"{config.grad_accum} batch(es) per step, {config.epochs} epochs on {accelerator.device}")
+
+    global_step = position["global_step"]
+    running_loss = torch.zeros((), device=accelerator.device)  # Summed on device, read back every log_every steps
+    logged_batches = 0
+    for epoch in range(position["epoch"], config.epochs):
+        first_batch = position["batch"] if epoch == position["epoch"] else 0
+        sampler.set_epoch(epoch, skip=first_batch * config.batch_size)
+        unet.train()
+        for batch_index, batch in enumerate(train_dataloader, start=first_batch):
+            moments = batch["moments"].to(accelerator.device)
+            input_ids = batch["input_ids"].to(accelerator.device)
+
+            # Sample latents from the cached VAE moments (no VAE forward pass)
+            latents = sample_latents(moments, scaling_factor)
+
+            # Sample noise and timesteps
+            noise = torch.randn_like(latents)
+            timesteps = torch.randint(
+                0,
+                noise_scheduler.config.num_train_timesteps,
+                (latents.shape[0],),
+                device=latents.device,
+            ).long()
+
+            # Add noise to latents according to noise schedule
+            noisy_latents = noise_scheduler.add_noise(latents, noise, timesteps)
+
+            # Cast noisy latents and noise to UNet dtype
+            noisy_latents = noisy_latents.to(dtype=unet.dtype)
+            noise = noise.to(dtype=unet.dtype)
+
+            # Convert input_ids to embeddings using text encoder, cast to unet dtype
+            with torch.no_grad():
+                encoder_hidden_states = text_encoder(input_ids)[0].to(dtype=unet.dtype)
+
+            # Forward pass through UNet
+            model_pred = unet(
+                sample=noisy_latents,
+                timestep=timesteps,
+                encoder_hidden_states=encoder_hidden_states,
+            ).sample
+
+            # Calculate loss
+            loss = torch.nn.functional.mse_loss(model_pred.float(), noise.float())
+
+            # Backpropagation; gradients add up over grad_accum batches
+            accelerator.backward(loss / config.grad_accum)
+
+            running_loss += loss.detach()
+            logged_batches += 1
+            # Step boundaries depend only on the batch index, so a resumed run steps where this one would
+            if (batch_index + 1) % config.grad_accum and batch_index + 1 < batches_per_epoch:
+                continue
+            optimizer.step()
+            optimizer.zero_grad()
+            global_step += 1
+
+            if global_step % config.log_every == 0:
+                # The only device -> host sync in the loop
+                print(f"[Epoch {epoch + 1} Step {global_step}] Loss: {running_loss.item() / logged_batches:.4f}")
+                running_loss.zero_()
+                logged_batches = 0
+
+            if config.checkpoint_every and global_step % config.checkpoint_every == 0:
+                save_checkpoint(accelerator, config, {"epoch": epoch, "batch": batch_index + 1,
+                                                      "global_step": global_step})
+
+    if logged_batches:
+        print(f"[Step {global_step}] Loss: {running_loss.item() / logged_batches:.4f}")
+    save_checkpoint(accelerator, config, {"epoch": config.epochs, "batch": 0, "global_step": global_step})
+
+    # Save fine-tuned UNet and pipeline weights
+    unet = accelerator.unwrap_model(unet)
+    unet.save_pretrained(config.output_dir)
+    if pipe is not None:
+        # A new pipeline around the fine-tuned UNet; `pipe` is shared through the
+        # model registry and must keep generating with the weights it was loaded with
+        type(pipe)(**{**pipe.components, "unet": unet}).save_pretrained(config.output_dir)
+    print(f"\nFine-tuned model saved at {config.output_dir}")
+    return config.output_dir
+
+
+def main():
+    defaults = TrainConfig()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", dest="model_id", default=defaults.model_id, help="Pipeline to fine-tune")
+    parser.add_argument("--data", dest="instance_dir", default=defaults.instance_dir, help="Image root")
+    parser.add_argument("--captions", dest="caption_file", default=defaults.caption_file)
+    parser.add_argument("--output", dest="output_dir", default=defaults.output_dir)
+    parser.add_argument("--checkpoints", dest="checkpoint_dir", default=defaults.checkpoint_dir,
+                        help="Run directory for step checkpoints, outside the exported model")
+    parser.add_argument("--latent-cache", dest="latent_cache_dir", default=defaults.latent_cache_dir)
+    parser.add_argument("--resolution", type=int, default=defaults.resolution)
+    parser.add_argument("--batch-size", type=int, default=defaults.batch_size)
+    parser.add_argument("--grad-accum", type=int, default=defaults.grad_accum, help="Batches per optimizer step")
+    parser.add_argument("--epochs", type=int, default=defaults.epochs)
+    parser.add_argument("--lr", type=float, default=defaults.lr)
+    parser.add_argument("--mixed-precision", choices=["no", "fp16", "bf16"], default=defaults.mixed_precision)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--log-every", type=int, default=defaults.log_every, help="Optimizer steps between loss logs")
+    parser.add_argument("--checkpoint-every", type=int, default=defaults.checkpoint_every,
+                        help="Optimizer steps between checkpoints (0: only at the end)")
+    parser.add_argument("--keep-checkpoints", type=int, default=defaults.keep_checkpoints)
+    parser.add_argument("--resume", help="Checkpoint directory, or 'latest'")
+    parser.add_argument("--smoke", action="store_true", help="Tiny random model on CPU (tests the loop, no downloads)")
+    args = parser.parse_args()
+
+    config = TrainConfig(**vars(args))
+    if config.smoke and config.output_dir == defaults.output_dir:
+        # Never write a random model over the real one
+        config = config._replace(output_dir=SMOKE_OUTPUT_DIR)
+    if config.smoke and config.checkpoint_dir == defaults.checkpoint_dir:
+        config = config._replace(checkpoint_dir=SMOKE_CHECKPOINT_DIR)
+    train(config)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import json
+import re
+
+import pygame
+
+# Sprite atlas loading.
+#
+# The generator packs a game's sprites (and animation frames) into one PNG with
+# a JSON index of frame rects (see generator/atlas.py). Here the PNG is loaded
+# and converted once, and frames are subsurfaces of it: they share its pixels,
+# so there is one decode at launch and every sprite blit reads from the same
+# texture.
+
+
+class SpriteAtlas:
+    def __init__(self, image, frames):
+        self.image = image
+        self.rects = {name: pygame.Rect(f["x"], f["y"], f["w"], f["h"]) for name, f in frames.items()}
+        self._frames = {}
+
+    @classmethod
+    def load(cls, index_path):
+        """Load an atlas from its JSON index (needs a display mode set, for convert_alpha)."""
+        with open(index_path) as f:
+            index = json.load(f)
+        # Frames are pre-multiplied; convert_alpha keeps the pixel values as they are
+        image = pygame.image.load(index["image"]).convert_alpha()
+        return cls(image, index["frames"])
+
+    def __contains__(self, name):
+        return name in self.rects
+
+    def names(self):
+        return list(self.rects)
+
+    def frame(self, name):
+        """Subsurface for frame `name` (KeyError if the atlas doesn't have it)."""
+        surface = self._frames.get(name)
+        if surface is None:
+            surface = self._frames[name] = self.image.subsurface(self.rects[name])
+        return surface
+
+    def animation(self, asset_type, name):
+        """Frames of animation `name` for `asset_type`, in order ([] if there are none)."""
+        pattern = re.compile(rf"{re.escape(asset_type)}/{re.escape(name)}/(\d+)$")
+        numbered = sorted((int(match.group(1)), frame) for frame in self.rects
+                          for match in [pattern.match(frame)] if match)
+        return [self.frame(frame) for _, frame in numbered]
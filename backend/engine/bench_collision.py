@@ -0,0 +1,103 @@
+"""
+Frame-time cost of enemy collision checks, before and after the mask cache.
+
+    python -m engine.bench_collision --enemies 100 300 1000 --frames 300
+
+"legacy" rebuilds every mask each frame and runs the pixel overlap against
+every enemy (what Player.update / Enemy.move / check_collision_and_damage
+used to do). "cached" uses engine.collision: masks built once per surface and
+a rect test before the overlap. Runs headless.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from engine.collision import collide, get_mask
+
+WIDTH, HEIGHT = 960, 540
+
+
+def make_sprite(size, color):
+    # A filled circle on a transparent background, like a matted sprite
+    surface = pygame.Surface(size, pygame.SRCALPHA)
+    pygame.draw.circle(surface, color, (size[0] // 2, size[1] // 2), min(size) // 2 - 2)
+    return surface
+
+
+class Body:
+    def __init__(self, image, x, y):
+        self.image = image
+        self.rect = image.get_rect(topleft=(x, y))
+
+
+def legacy_frame(player, enemies):
+    player_mask = pygame.mask.from_surface(player.image)
+    hits = 0
+    for enemy in enemies:
+        enemy_mask = pygame.mask.from_surface(enemy.image)
+        offset = (player.rect.x - enemy.rect.x, player.rect.y - enemy.rect.y)
+        if enemy_mask.overlap(player_mask, offset):
+            hits += 1
+    return hits
+
+
+def cached_frame(player, enemies):
+    return sum(1 for enemy in enemies if collide(enemy, player))
+
+
+def step(enemies):
+    for enemy in enemies:
+        enemy.rect.x -= 4
+        if enemy.rect.right < 0:
+            enemy.rect.left = WIDTH
+
+
+def run(frame_fn, num_enemies, frames, seed=0):
+    rng = random.Random(seed)
+    enemy_image = make_sprite((64, 64), (200, 40, 40))
+    player = Body(make_sprite((64, 64), (40, 200, 40)), 100, HEIGHT - 104)
+    enemies = [Body(enemy_image, rng.randrange(WIDTH), rng.randrange(HEIGHT - 64)) for _ in range(num_enemies)]
+    get_mask(enemy_image), get_mask(player.image)  # Warm the cache outside the timing
+
+    times, hits = [], 0
+    for _ in range(frames):
+        start = time.perf_counter()
+        hits += frame_fn(player, enemies)
+        times.append(time.perf_counter() - start)
+        step(enemies)
+    times.sort()
+    return {
+        "mean_ms": statistics.fmean(times) * 1000,
+        "p95_ms": times[int(0.95 * (len(times) - 1))] * 1000,
+        "hits": hits,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--enemies", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    print(f"{'enemies':>8} {'legacy ms':>10} {'p95':>8} {'cached ms':>10} {'p95':>8} {'speedup':>8}")
+    for num_enemies in args.enemies:
+        legacy = run(legacy_frame, num_enemies, args.frames)
+        cached = run(cached_frame, num_enemies, args.frames)
+        # Both must agree on what collided
+        assert legacy["hits"] == cached["hits"], (legacy["hits"], cached["hits"])
+        print(f"{num_enemies:>8} {legacy['mean_ms']:>10.3f} {legacy['p95_ms']:>8.3f} "
+              f"{cached['mean_ms']:>10.3f} {cached['p95_ms']:>8.3f} {legacy['mean_ms'] / cached['mean_ms']:>7.1f}x")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Per-frame cost of moving, wrapping, hit-testing and drawing many enemies.
+
+    python -m engine.bench_entities --enemies 100 1000 5000 --frames 300
+
+"objects" is the old loop: one Python Enemy at a time (rect.x -= speed, wrap,
+check_collision_and_damage, blit). "store" keeps the same enemies in an
+EntityStore: vectorized scroll, velocity, gravity and wrap steps, a
+vectorized overlap and cooldown check, and one blits() call for the on-screen
+rows. Update (game logic) and
+draw (SDL blitting) are timed separately, in ms per frame. Runs headless.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from engine.enemy import Enemy
+from engine.entities import ENEMY, EntityStore
+from engine.player import Player
+
+WIDTH, HEIGHT = 960, 540
+SPEED = 3
+GRAVITY = 0.2
+
+
+def make_sprite(size, color):
+    surface = pygame.Surface(size, pygame.SRCALPHA)
+    pygame.draw.circle(surface, color, (size[0] // 2, size[1] // 2), min(size) // 2 - 2)
+    return surface
+
+
+def spawn(num_enemies, image, store=None, seed=0):
+    rng = random.Random(seed)
+    return [Enemy(rng.randrange(WIDTH * 4), rng.randrange(HEIGHT - 64), image, store=store, respawn_x=WIDTH + 100)
+            for _ in range(num_enemies)]
+
+
+def objects_update(player, enemies, _store):
+    for enemy in enemies:
+        enemy.rect.x -= SPEED
+        if enemy.rect.right < 0:
+            enemy.rect.left = WIDTH + 100
+    for enemy in enemies:
+        enemy.check_collision_and_damage(player)
+
+
+def objects_draw(screen, enemies, _store):
+    for enemy in enemies:
+        enemy.draw(screen)
+
+
+def store_update(player, enemies, store):
+    store.scroll(SPEED)
+    store.integrate()
+    store.apply_gravity(GRAVITY, HEIGHT)
+    store.wrap()
+    for row in store.ready(store.overlapping(player.rect, ENEMY), pygame.time.get_ticks()):
+        enemies[row].check_collision_and_damage(player)
+
+
+def store_draw(screen, enemies, store):
+    visible = store.visible(ENEMY, WIDTH, HEIGHT)
+    screen.blits([(enemies[row].image, pos, None, pygame.BLEND_PREMULTIPLIED)
+                  for row, pos in zip(visible.tolist(), store.positions(visible).tolist())], doreturn=False)
+
+
+def run(update_fn, draw_fn, screen, num_enemies, frames, use_store):
+    """Mean update and draw time per frame, in ms."""
+    image = make_sprite((64, 64), (200, 40, 40))
+    store = EntityStore() if use_store else None
+    enemies = spawn(num_enemies, image, store)
+    player = Player(100, HEIGHT - 104, make_sprite((64, 64), (40, 200, 40)))
+    player.health = float("inf")  # Keep the run going however often it is hit
+
+    update_times, draw_times = [], []
+    for _ in range(frames):
+        start = time.perf_counter()
+        update_fn(player, enemies, store)
+        middle = time.perf_counter()
+        draw_fn(screen, enemies, store)
+        update_times.append(middle - start)
+        draw_times.append(time.perf_counter() - middle)
+    return statistics.fmean(update_times) * 1000, statistics.fmean(draw_times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--enemies", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    screen = pygame.Surface((WIDTH, HEIGHT))
+    print(f"{'enemies':>8} {'objects update':>15} {'draw':>8} {'store update':>13} {'draw':>8} {'update speedup':>15}")
+    for num_enemies in args.enemies:
+        objects_update_ms, objects_draw_ms = run(objects_update, objects_draw, screen, num_enemies, args.frames,
+                                                 use_store=False)
+        store_update_ms, store_draw_ms = run(store_update, store_draw, screen, num_enemies, args.frames,
+                                             use_store=True)
+        print(f"{num_enemies:>8} {objects_update_ms:>15.3f} {objects_draw_ms:>8.3f} {store_update_ms:>13.3f} "
+              f"{store_draw_ms:>8.3f} {objects_update_ms / store_update_ms:>14.1f}x")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
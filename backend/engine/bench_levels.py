@@ -0,0 +1,104 @@
+"""
+Memory while streaming a long procedural level.
+
+    python -m engine.bench_levels --levels 5 --chunks-per-level 20
+
+Plays the streamed levels headless (scripted jumps, invincible player) and,
+at every chunk boundary, records the live Python memory (tracemalloc), the
+peak allocated while that chunk played, and how many entities the pools have
+ever created. With recycling, all of these level off after the first few
+chunks of a level however long it is (each level is denser, so they step up
+between levels); the summary compares the two halves of each level.
+"""
+
+import argparse
+import os
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+from engine.benchmark import synthetic_assets
+from engine.game import HEIGHT, WIDTH, Game, ScriptedInput, init_display
+from engine.levels import LevelGenerator
+
+
+def run(levels, chunks_per_level, seed, draw):
+    screen = init_display(WIDTH, HEIGHT, headless=True, title="level streaming benchmark")
+    generator = LevelGenerator(seed, levels, chunks_per_level, WIDTH, HEIGHT)
+    # Jump every 45 ticks, forever (the input is looked up by tick modulo the period)
+    inputs = ScriptedInput.periodic(pygame.K_SPACE, 45, hold=1, ticks=45)
+    game = Game(screen, synthetic_assets(seed), inputs=_Looped(inputs, 45), levels=generator)
+    game.player.health = float("inf")
+
+    # Samples go into an array allocated up front, so recording them doesn't show up as growth
+    columns = ("chunk", "level", "live_kb", "peak_kb", "pooled", "active", "store_rows")
+    table = np.zeros((generator.num_chunks + 1, len(columns)))
+    count = 0
+    tracemalloc.start()
+    try:
+        chunk = game.levels.next_chunk
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        while not game.is_over():
+            game.update()
+            if draw:
+                game.draw()
+            if game.levels.next_chunk != chunk:
+                chunk = game.levels.next_chunk
+                current, peak = tracemalloc.get_traced_memory()
+                table[count] = (chunk, game.level + 1, current / 1024, (peak - start) / 1024,
+                                sum(pool.created for pool in game.levels.pools.values()),
+                                len(game.levels.active), game.store.count)
+                count += 1
+                start, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+    finally:
+        tracemalloc.stop()
+    samples = [dict(zip(columns, row)) for row in table[:count].tolist()]
+    return game, samples
+
+
+class _Looped:
+    def __init__(self, inputs, period):
+        self.inputs = inputs
+        self.period = period
+
+    def keys(self, tick):
+        return self.inputs.keys(tick % self.period)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, default=3)
+    parser.add_argument("--chunks-per-level", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--no-draw", action="store_true", help="Only run the simulation")
+    args = parser.parse_args()
+
+    game, samples = run(args.levels, args.chunks_per_level, args.seed, not args.no_draw)
+    print(f"{'chunk':>6} {'level':>6} {'live KB':>9} {'peak KB':>9} {'created':>8} {'active':>7} {'rows':>6}")
+    step = max(1, len(samples) // 20)
+    for sample in samples[::step] + samples[-1:]:
+        print(f"{sample['chunk']:>6.0f} {sample['level']:>6.0f} {sample['live_kb']:>9.1f} {sample['peak_kb']:>9.1f} "
+              f"{sample['pooled']:>8.0f} {sample['active']:>7.0f} {sample['store_rows']:>6.0f}")
+
+    # Within a level (same density) every column should be flat after its first chunks
+    print(f"Ticks: {game.tick}, score: {game.score}")
+    for level in sorted({int(sample["level"]) for sample in samples}):
+        rows = [sample for sample in samples if sample["level"] == level][1:]
+        if len(rows) < 2:
+            continue
+        half = len(rows) // 2
+        mean = lambda part, key: sum(sample[key] for sample in part) / len(part)
+        print(f"Level {level}: live {mean(rows[:half], 'live_kb'):.1f} KB -> {mean(rows[half:], 'live_kb'):.1f} KB, "
+              f"peak per chunk {mean(rows[:half], 'peak_kb'):.1f} KB -> {mean(rows[half:], 'peak_kb'):.1f} KB, "
+              f"entities created {rows[0]['pooled']:.0f} -> {rows[-1]['pooled']:.0f}")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Headless frame-time benchmark for the game loop.
+
+    python -m engine.benchmark --output engine_bench.json
+    python -m engine.benchmark --baseline engine_bench.json   # fail on p95 regressions
+
+Runs engine.game.Game on SDL's dummy driver with synthetic assets, a fixed
+seed and scripted jumps, so runs are reproducible and need no display, GPU or
+generated assets. Each measured frame is one simulation tick plus one draw.
+Scenarios:
+
+  baseline          the original level
+  enemies_<N>       N enemies spread over four screens
+  platforms_<N>     N platforms spread over four screens
+  background_<WxH>  a large background surface
+  static            the original level with the background not scrolling
+                    (where --render dirty also presents only the dirty rects)
+  streamed          procedural levels streamed in chunks (engine/levels.py),
+                    one chunk per level so density rises during the run
+
+For each scenario it reports update / draw / present (display update) / total
+frame time (p50, p95, p99, in ms) and, in a separate tracemalloc pass so the timings aren't skewed,
+allocations per frame: the peak bytes allocated while the frame ran and the
+net change in live memory blocks (a steady positive value is a leak).
+Results go to a JSON file so engine regressions can be tracked over time.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+from engine.game import HEIGHT, WIDTH, Game, GameAssets, ScriptedInput, default_layout, init_display, random_layout
+from engine.levels import LevelGenerator
+from engine.renderer import FULL, RENDER_MODES
+
+DEFAULT_SEED = 1234
+JUMP_EVERY = 45
+
+
+def _percentiles(samples_s):
+    ordered = sorted(samples_s)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "mean": sum(ordered) / len(ordered) * 1000,
+        "max": ordered[-1] * 1000,
+    }
+
+
+def synthetic_assets(seed, background_size=(WIDTH, HEIGHT)):
+    """Deterministic stand-ins for generated assets."""
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, size=(background_size[0], background_size[1], 3), dtype=np.uint8)
+    background = pygame.surfarray.make_surface(noise).convert()
+
+    def sprite(size, color):
+        surface = pygame.Surface(size, pygame.SRCALPHA)
+        pygame.draw.circle(surface, color, (size[0] // 2, size[1] // 2), min(size) // 2 - 2)
+        return surface.convert_alpha().premul_alpha()
+
+    return GameAssets(
+        background=background,
+        character=sprite((64, 64), (40, 200, 40)),
+        enemy=sprite((64, 64), (200, 40, 40)),
+        reward=sprite((32, 32), (230, 200, 40)),
+        platform_color=(90, 70, 50),
+    )
+
+
+def scenarios(enemy_counts, platform_counts, background_sizes):
+    yield {"name": "baseline", "enemies": 4, "platforms": 4, "background": [WIDTH, HEIGHT]}
+    for count in enemy_counts:
+        yield {"name": f"enemies_{count}", "enemies": count, "platforms": 4, "background": [WIDTH, HEIGHT]}
+    for count in platform_counts:
+        yield {"name": f"platforms_{count}", "enemies": 4, "platforms": count, "background": [WIDTH, HEIGHT]}
+    for width, height in background_sizes:
+        yield {"name": f"background_{width}x{height}", "enemies": 4, "platforms": 4, "background": [width, height]}
+    yield {"name": "static", "enemies": 4, "platforms": 4, "background": [WIDTH, HEIGHT], "scroll_speed": 0}
+    yield {"name": "streamed", "levels": 5, "background": [WIDTH, HEIGHT]}
+
+
+def make_game(screen, scenario, seed, frames, render_mode=FULL):
+    assets = synthetic_assets(seed, tuple(scenario["background"]))
+    layout = levels = None
+    if "levels" in scenario:
+        levels = LevelGenerator(seed, scenario["levels"], chunks_per_level=1, width=WIDTH, height=HEIGHT)
+    elif scenario["name"] in ("baseline", "static"):
+        layout = default_layout(WIDTH, HEIGHT)
+    else:
+        layout = random_layout(seed, scenario["enemies"], scenario["platforms"], WIDTH, HEIGHT)
+    inputs = ScriptedInput.periodic(pygame.K_SPACE, JUMP_EVERY, hold=1, ticks=frames)
+    game = Game(screen, assets, layout=layout, inputs=inputs,
+                scroll_speed=scenario.get("scroll_speed", 3), render_mode=render_mode, levels=levels)
+    game.player.health = float("inf")  # Keep the run going however often it is hit
+    return game
+
+
+def time_frames(game, frames):
+    update_times, draw_times, present_times, frame_times = [], [], [], []
+    for _ in range(frames):
+        start = time.perf_counter()
+        game.update()
+        updated = time.perf_counter()
+        game.draw()
+        drawn = time.perf_counter()
+        game.renderer.present()
+        end = time.perf_counter()
+        update_times.append(updated - start)
+        draw_times.append(drawn - updated)
+        present_times.append(end - drawn)
+        frame_times.append(end - start)
+    return {
+        "frame_ms": _percentiles(frame_times),
+        "update_ms": _percentiles(update_times),
+        "draw_ms": _percentiles(draw_times),
+        "present_ms": _percentiles(present_times),
+    }
+
+
+def allocation_frames(game, frames):
+    peaks, blocks = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(frames):
+            before_blocks = sys.getallocatedblocks()
+            current, _peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            game.update()
+            game.draw()
+            game.renderer.present()
+            _current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - current)
+            blocks.append(sys.getallocatedblocks() - before_blocks)
+    finally:
+        tracemalloc.stop()
+    peaks.sort()
+    return {
+        "peak_bytes_p50": peaks[len(peaks) // 2],
+        "peak_bytes_max": peaks[-1],
+        "net_blocks_mean": sum(blocks) / len(blocks),
+    }
+
+
+def run_scenario(screen, scenario, seed, frames, warmup, alloc_frames, render_mode=FULL):
+    game = make_game(screen, scenario, seed, warmup + frames + alloc_frames, render_mode)
+    for _ in range(warmup):
+        game.update()
+        game.draw()
+    result = dict(scenario)
+    result.update(time_frames(game, frames))
+    if alloc_frames:
+        result["allocations"] = allocation_frames(game, alloc_frames)
+    result["score"] = game.score
+    result["dirty_frames"] = game.renderer.dirty_frames
+    result["scrolled_frames"] = game.renderer.scrolled_frames
+    return result
+
+
+def compare(results, baseline_path, tolerance):
+    """Print p95 changes against an earlier run; returns the scenarios that regressed."""
+    with open(baseline_path) as f:
+        data = json.load(f)
+    if data.get("render", FULL) != results["render"]:
+        print(f"[WARN] Baseline was measured with --render {data.get('render', FULL)}, this run with {results['render']}")
+    baseline = {scenario["name"]: scenario for scenario in data["scenarios"]}
+    regressions = []
+    for scenario in results["scenarios"]:
+        old = baseline.get(scenario["name"])
+        if old is None:
+            continue
+        before, after = old["frame_ms"]["p95"], scenario["frame_ms"]["p95"]
+        change = (after - before) / before if before else 0.0
+        flag = "  REGRESSION" if change > tolerance else ""
+        print(f"  {scenario['name']:<24} p95 {before:8.3f} -> {after:8.3f} ms ({change:+.1%}){flag}")
+        if flag:
+            regressions.append(scenario["name"])
+    return regressions
+
+
+def _size(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--enemies", type=int, nargs="*", default=[100, 1000, 5000])
+    parser.add_argument("--platforms", type=int, nargs="*", default=[100, 1000])
+    parser.add_argument("--backgrounds", type=_size, nargs="*", default=[(3840, 2160)])
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--warmup", type=int, default=60)
+    parser.add_argument("--alloc-frames", type=int, default=100, help="Frames in the allocation pass (0 to skip)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--only", nargs="*", help="Run only these scenario names")
+    parser.add_argument("--render", choices=RENDER_MODES, default=FULL,
+                        help="Renderer mode to measure. 'dirty' repaints only the regions sprites covered "
+                             "and scrolls the rest of the frame in place; only the 'static' scenario (scroll "
+                             "speed 0) also sends just those regions to the display")
+    parser.add_argument("--output", default="engine_bench.json")
+    parser.add_argument("--baseline", help="Earlier results to compare p95 frame time against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed p95 slowdown vs the baseline")
+    args = parser.parse_args()
+
+    screen = init_display(WIDTH, HEIGHT, headless=True, title="engine benchmark")
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "seed": args.seed,
+        "frames": args.frames,
+        "render": args.render,
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "sdl": ".".join(map(str, pygame.get_sdl_version())),
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "scenarios": [],
+    }
+
+    print(f"{'scenario':<24} {'p50':>8} {'p95':>8} {'p99':>8} {'update p50':>11} {'draw p50':>9} "
+          f"{'present p50':>12} {'peak KB':>8}")
+    for scenario in scenarios(args.enemies, args.platforms, args.backgrounds):
+        if args.only and scenario["name"] not in args.only:
+            continue
+        result = run_scenario(screen, scenario, args.seed, args.frames, args.warmup, args.alloc_frames, args.render)
+        results["scenarios"].append(result)
+        frame = result["frame_ms"]
+        peak_kb = result["allocations"]["peak_bytes_p50"] / 1024 if "allocations" in result else float("nan")
+        print(f"{scenario['name']:<24} {frame['p50']:>8.3f} {frame['p95']:>8.3f} {frame['p99']:>8.3f} "
+              f"{result['update_ms']['p50']:>11.3f} {result['draw_ms']['p50']:>9.3f} "
+              f"{result['present_ms']['p50']:>12.3f} {peak_kb:>8.1f}")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        print(f"Compared with {args.baseline}:")
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            pygame.quit()
+            sys.exit(1)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import weakref
+
+import pygame
+
+# Masks keyed by the surface they were built from. Sprite images never change
+# after loading, so a mask is built once per surface (and, with animation, once
+# per frame surface) instead of every frame. Entries go away with their surface.
+_mask_cache = weakref.WeakKeyDictionary()
+
+
+def get_mask(surface):
+    """Collision mask for a surface, built on first use and cached."""
+    mask = _mask_cache.get(surface)
+    if mask is None:
+        mask = pygame.mask.from_surface(surface)
+        _mask_cache[surface] = mask
+    return mask
+
+
+def clear_cache():
+    """Forget every cached mask (e.g. after drawing onto a sprite surface in place)."""
+    _mask_cache.clear()
+
+
+def collide(a, b):
+    """
+    Pixel-perfect collision between two sprites (anything with .rect and .image).
+
+    The bounding rects are checked first; the mask overlap only runs for pairs
+    whose rects actually intersect.
+    """
+    if not a.rect.colliderect(b.rect):
+        return False
+    offset = (b.rect.x - a.rect.x, b.rect.y - a.rect.y)
+    return get_mask(a.image).overlap(get_mask(b.image), offset) is not None
+
@@ -1,14 +1,38 @@
 import pygame
 
+from engine.collision import collide, get_mask
+from engine.entities import ENEMY, RectView
+
 class Enemy:
-    def __init__(self, x, y, image):
+    def __init__(self, x, y, image, store=None, respawn_x=960, vx=0.0, gravity=False):
         self.image = image
-        self.rect = image.get_rect(topleft=(x, y))
-        self.mask = pygame.mask.from_surface(image)
-
         self.speed = 4
         self.damage_cooldown = 1000  # milliseconds between damage
-        self.last_damage_time = 0
+
+        # With an EntityStore this is a thin view over one of its rows; the store
+        # scrolls, wraps, moves (vx, gravity) and checks cooldowns for all enemies at once
+        self.store = store
+        if store is None:
+            self.rect = image.get_rect(topleft=(x, y))
+            self._last_damage_time = 0
+        else:
+            width, height = image.get_size()
+            self.index = store.add(ENEMY, x, y, width, height, respawn_x=respawn_x, cooldown=self.damage_cooldown,
+                                   vx=vx, gravity=gravity)
+            self.rect = RectView(store, self.index)
+
+    @property
+    def last_damage_time(self):
+        if self.store is None:
+            return self._last_damage_time
+        return self.store.last_hit[self.index]
+
+    @last_damage_time.setter
+    def last_damage_time(self, value):
+        if self.store is None:
+            self._last_damage_time = value
+        else:
+            self.store.last_hit[self.index] = value
 
     def move(self):
         self.rect.x -= self.speed
@@ -17,18 +41,22 @@ class Enemy:
         if self.rect.right < 0:
             self.rect.x = 960  # respawn off-screen right
 
-        # Update mask if needed (animation support)
-        self.mask = pygame.mask.from_surface(self.image)
+    @property
+    def mask(self):
+        # Cached per image, so animation frames get their own mask without rebuilding
+        return get_mask(self.image)
 
-    def check_collision_and_damage(self, player):
-        offset = (player.rect.x - self.rect.x, player.rect.y - self.rect.y)
-        overlap = self.mask.overlap(player.mask, offset)
+    def check_collision_and_damage(self, player, now=None):
+        # Rect test first; the pixel overlap only runs when the rects touch
+        overlap = collide(self, player)
 
-        current_time = pygame.time.get_ticks()
+        # `now` (ms) comes from the game's clock when it runs on simulated time
+        current_time = pygame.time.get_ticks() if now is None else now
         if overlap and current_time - self.last_damage_time > self.damage_cooldown:
             player.health -= 10
             self.last_damage_time = current_time
             print(f"[!! ENEMY HIT !!] Player damaged! Health: {player.health}")
 
     def draw(self, screen):
-        screen.blit(self.image, self.rect)
+        # Sprites are pre-multiplied (see generator/postprocess.py)
+        screen.blit(self.image, self.rect, special_flags=pygame.BLEND_PREMULTIPLIED)
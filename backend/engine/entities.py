@@ -0,0 +1,264 @@
+import numpy as np
+import pygame
+
+# Structure-of-arrays entity store.
+#
+# Positions, velocities, sizes and damage cooldowns for every enemy, platform
+# and reward live in contiguous NumPy arrays, so scrolling, wrap-around,
+# gravity and cooldown checks are one vectorized step per tick instead of a
+# Python loop over objects. Enemy / Platform / Reward stay usable on their own;
+# when given a store they become thin views over one row of it (see RectView).
+
+ENEMY = 0
+PLATFORM = 1
+REWARD = 2
+
+
+class EntityStore:
+    def __init__(self, capacity=1024):
+        self.count = 0  # Rows in use (alive or free)
+        self._free = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = self.__dict__.copy()
+        self.capacity = capacity
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.vx = np.zeros(capacity, dtype=np.float64)
+        self.vy = np.zeros(capacity, dtype=np.float64)
+        self.w = np.zeros(capacity, dtype=np.int32)
+        self.h = np.zeros(capacity, dtype=np.int32)
+        self.kind = np.full(capacity, -1, dtype=np.int8)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.gravity = np.zeros(capacity, dtype=bool)  # Falls under apply_gravity()
+        self.respawn_x = np.zeros(capacity, dtype=np.float64)  # Where wrap() puts it back
+        self.cooldown = np.zeros(capacity, dtype=np.float64)  # ms between hits
+        self.last_hit = np.zeros(capacity, dtype=np.float64)  # ms timestamp of the last hit
+        self.prev_x = np.zeros(capacity, dtype=np.float64)  # Position at the previous tick,
+        self.prev_y = np.zeros(capacity, dtype=np.float64)  # for render interpolation
+        if "x" in old:
+            for name in ("x", "y", "vx", "vy", "w", "h", "kind", "alive", "gravity",
+                         "respawn_x", "cooldown", "last_hit", "prev_x", "prev_y"):
+                getattr(self, name)[:old["count"]] = old[name][:old["count"]]
+
+    def add(self, kind, x, y, w, h, vx=0.0, vy=0.0, respawn_x=None, cooldown=0.0, gravity=False):
+        """Add an entity and return its row index."""
+        if self._free:
+            i = self._free.pop()
+        else:
+            if self.count == self.capacity:
+                self._allocate(self.capacity * 2)
+            i = self.count
+            self.count += 1
+        self.kind[i] = kind
+        self.x[i], self.y[i] = x, y
+        self.prev_x[i], self.prev_y[i] = x, y
+        self.vx[i], self.vy[i] = vx, vy
+        self.w[i], self.h[i] = w, h
+        self.respawn_x[i] = x if respawn_x is None else respawn_x
+        self.cooldown[i] = cooldown
+        self.last_hit[i] = 0.0
+        self.gravity[i] = gravity
+        self.alive[i] = True
+        return i
+
+    def remove(self, i):
+        self.alive[i] = False
+        self.kind[i] = -1
+        self._free.append(i)
+
+    def park(self, i):
+        """Take a row out of play but keep it (and its kind) for reuse, see engine/levels.py."""
+        self.alive[i] = False
+
+    def place(self, i, x, y, w=None, h=None):
+        """Put a parked row back in play at (x, y), fresh: no interpolation, no hit cooldown."""
+        self.x[i] = self.prev_x[i] = x
+        self.y[i] = self.prev_y[i] = y
+        if w is not None:
+            self.w[i], self.h[i] = w, h
+        self.vx[i] = self.vy[i] = 0.0
+        self.last_hit[i] = 0.0
+        self.alive[i] = True
+
+    def _select(self, kind=None):
+        n = self.count
+        mask = self.alive[:n].copy()
+        if kind is not None:
+            mask &= self.kind[:n] == kind
+        return mask
+
+    def indices(self, kind=None):
+        return np.flatnonzero(self._select(kind))
+
+    # --- Per-tick vectorized steps ---
+
+    def snapshot(self):
+        """Remember current positions as the previous tick's (call at the start of a tick)."""
+        n = self.count
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+
+    def scroll(self, speed):
+        """Move every entity `speed` pixels left (the level scrolling)."""
+        n = self.count
+        self.x[:n] -= speed
+
+    def integrate(self):
+        """Apply each entity's own velocity (falling entities move vertically in apply_gravity())."""
+        n = self.count
+        self.x[:n] += self.vx[:n]
+        own = ~self.gravity[:n]
+        self.y[:n][own] += self.vy[:n][own]
+
+    def apply_gravity(self, gravity, ground_y):
+        """Accelerate falling entities and land them on `ground_y`."""
+        n = self.count
+        falling = self.alive[:n] & self.gravity[:n]
+        self.vy[:n][falling] += gravity
+        self.y[:n][falling] += self.vy[:n][falling]
+        landed = falling & (self.y[:n] + self.h[:n] >= ground_y)
+        self.y[:n][landed] = ground_y - self.h[:n][landed]
+        self.vy[:n][landed] = 0.0
+
+    def behind(self, left=0):
+        """Rows that have scrolled entirely past `left`."""
+        n = self.count
+        return np.flatnonzero(self.alive[:n] & (self.x[:n] + self.w[:n] < left))
+
+    def wrap(self, left=0):
+        """Send entities that went past `left` back to their respawn x. Returns the wrapped rows."""
+        rows = self.behind(left)
+        self.x[rows] = self.respawn_x[rows]
+        return rows
+
+    def overlapping(self, rect, kind=None):
+        """Rows whose bounding box intersects `rect` (vectorized broad phase)."""
+        n = self.count
+        left, top, width, height = rect
+        x = self.x[:n].astype(np.int64)
+        y = self.y[:n].astype(np.int64)
+        hit = (x < left + width) & (x + self.w[:n] > left) & (y < top + height) & (y + self.h[:n] > top)
+        return np.flatnonzero(hit & self._select(kind))
+
+    def ready(self, rows, now):
+        """Which of `rows` are off cooldown at time `now` (ms)."""
+        rows = np.asarray(rows, dtype=np.intp)
+        return rows[now - self.last_hit[rows] > self.cooldown[rows]]
+
+    def visible(self, kind, width, height):
+        """Rows of `kind` at least partly on a width x height screen."""
+        return self.overlapping((0, 0, width, height), kind)
+
+    def positions(self, rows, alpha=1.0, max_jump=64):
+        """
+        Integer top-left positions for drawing, shape (len(rows), 2), interpolated
+        `alpha` of the way from the previous tick. Rows that moved more than
+        `max_jump` (wrapped, respawned) are drawn where they are now.
+        """
+        x, y = self.x[rows], self.y[rows]
+        if alpha < 1.0:
+            prev_x, prev_y = self.prev_x[rows], self.prev_y[rows]
+            smooth = (np.abs(x - prev_x) <= max_jump) & (np.abs(y - prev_y) <= max_jump)
+            x = np.where(smooth, prev_x + (x - prev_x) * alpha, x)
+            y = np.where(smooth, prev_y + (y - prev_y) * alpha, y)
+        return np.stack([x, y], axis=1).astype(np.int64)
+
+
+class RectView:
+    """
+    Write-through, Rect-like view of one store row.
+
+    Supports the attributes the engine uses (x, y, left, right, top, bottom,
+    width, height, topleft, center, size) and is a 4-sequence, so pygame calls
+    that take a rect (blit, colliderect, collidelistall) accept it directly.
+    Other Rect methods run on a snapshot.
+    """
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def to_rect(self):
+        s, i = self.store, self.index
+        return pygame.Rect(int(s.x[i]), int(s.y[i]), int(s.w[i]), int(s.h[i]))
+
+    def __len__(self):
+        return 4
+
+    def __getitem__(self, item):
+        return (self.x, self.y, self.width, self.height)[item]
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.width, self.height))
+
+    def __repr__(self):
+        return f"<RectView{tuple(self)}>"
+
+    def __getattr__(self, name):
+        return getattr(self.to_rect(), name)
+
+    @property
+    def x(self):
+        return int(self.store.x[self.index])
+
+    @x.setter
+    def x(self, value):
+        self.store.x[self.index] = value
+
+    @property
+    def y(self):
+        return int(self.store.y[self.index])
+
+    @y.setter
+    def y(self, value):
+        self.store.y[self.index] = value
+
+    left = x
+    top = y
+
+    @property
+    def width(self):
+        return int(self.store.w[self.index])
+
+    @property
+    def height(self):
+        return int(self.store.h[self.index])
+
+    w = width
+    h = height
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def right(self):
+        return self.x + self.width
+
+    @right.setter
+    def right(self, value):
+        self.x = value - self.width
+
+    @property
+    def bottom(self):
+        return self.y + self.height
+
+    @bottom.setter
+    def bottom(self, value):
+        self.y = value - self.height
+
+    @property
+    def topleft(self):
+        return self.x, self.y
+
+    @topleft.setter
+    def topleft(self, value):
+        self.x, self.y = value
+
+    @property
+    def center(self):
+        return self.x + self.width // 2, self.y + self.height // 2
@@ -0,0 +1,311 @@
+import os
+import random
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pygame
+
+from engine.enemy import Enemy
+from engine.entities import ENEMY, PLATFORM, REWARD, EntityStore
+from engine.level import BackgroundScroller
+from engine.levels import GROUND_HEIGHT, LevelGenerator, LevelStream
+from engine.platform import Platform
+from engine.player import Player
+from engine.renderer import FULL, Renderer, display_format
+from engine.reward import Reward
+from engine.spatial import SpatialGrid
+from engine.timestep import MAX_CATCH_UP, TICK_RATE, FixedTimestep
+
+WIDTH, HEIGHT = 960, 540
+FPS = 60  # Default render rate; the simulation always ticks at TICK_RATE
+GRAVITY = 0.2  # Per tick, as for the player
+
+
+def init_display(width=WIDTH, height=HEIGHT, headless=False, title="Generative Game"):
+    """
+    Create the game screen. Headless mode uses SDL's dummy video driver, so the
+    game runs (and can be timed) with no display or GPU.
+    """
+    if headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((width, height))
+    pygame.display.set_caption(title)
+    return screen
+
+
+class GameAssets(NamedTuple):
+    background: pygame.Surface
+    character: pygame.Surface  # Sprites are pre-multiplied (see generator/postprocess.py)
+    enemy: pygame.Surface
+    reward: pygame.Surface
+    platform_color: Tuple[int, int, int]
+
+
+class Layout(NamedTuple):
+    platforms: List[Tuple[int, int, int, int]]  # x, y, width, height
+    enemies: List[Tuple[int, int]]  # top-left
+    reward: Tuple[int, int]
+
+
+def default_layout(width=WIDTH, height=HEIGHT):
+    """The original hand-placed level."""
+    return Layout(
+        platforms=[
+            (0, height - 40, width * 2, 40),
+            (400, 400, 120, 20),
+            (700, 300, 100, 20),
+            (1000, 350, 150, 20),
+        ],
+        enemies=[
+            (width + 100, height - 100),
+            (400 + 50, 400 - 64),
+            (700 + 50, 300 - 64),
+            (1000 + 50, 350 - 64),
+        ],
+        reward=(width + 200, height - 90),
+    )
+
+
+def prepare_assets(assets: GameAssets):
+    """The same assets with every surface in the display's pixel format."""
+    return assets._replace(
+        background=display_format(assets.background),
+        character=display_format(assets.character),
+        enemy=display_format(assets.enemy),
+        reward=display_format(assets.reward),
+    )
+
+
+def random_layout(seed, num_enemies, num_platforms, width=WIDTH, height=HEIGHT, span=4):
+    """A reproducible level with the given entity counts, spread over `span` screens."""
+    rng = random.Random(seed)
+    platforms = [(0, height - 40, width * 2, 40)]
+    platforms += [(rng.randrange(width * span), rng.randrange(200, height - 60), rng.randrange(60, 200), 20)
+                  for _ in range(max(0, num_platforms - 1))]
+    enemies = [(rng.randrange(width * span), rng.randrange(0, height - 64)) for _ in range(num_enemies)]
+    return Layout(platforms, enemies, (width + 200, height - 90))
+
+
+class ScriptedInput:
+    """
+    Deterministic keyboard input: `presses` is (key, first_tick, last_tick)
+    ranges, inclusive. Indexing the state for a tick works like
+    pygame.key.get_pressed().
+    """
+
+    def __init__(self, presses: Iterable[Tuple[int, int, int]] = ()):
+        self._by_tick: Dict[int, set] = {}
+        for key, first, last in presses:
+            for tick in range(first, last + 1):
+                self._by_tick.setdefault(tick, set()).add(key)
+
+    @classmethod
+    def periodic(cls, key, every, hold, ticks):
+        """Press `key` for `hold` ticks every `every` ticks."""
+        return cls((key, start, start + hold - 1) for start in range(0, ticks, every))
+
+    def keys(self, tick):
+        return _KeyState(self._by_tick.get(tick, ()))
+
+
+class _KeyState:
+    __slots__ = ("pressed",)
+
+    def __init__(self, pressed):
+        self.pressed = pressed
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+
+class Game:
+    """
+    The side-scroller: level state, one fixed simulation tick (update) and
+    drawing interpolated between ticks (draw).
+
+    :param screen: Surface to draw on (see init_display).
+    :param assets: Loaded sprites, background and platform colour.
+    :param layout: Fixed level layout whose entities wrap around forever
+        (default: the original level). Ignored when `levels` is given.
+    :param inputs: ScriptedInput to replace the keyboard (headless runs).
+    :param render_mode: "full" or "dirty" (see engine/renderer.py).
+    :param levels: LevelGenerator to stream procedural levels from (see
+        engine/levels.py); the game ends after the last one.
+    """
+
+    def __init__(self, screen, assets: GameAssets, layout: Optional[Layout] = None, inputs=None,
+                 scroll_speed=3, render_mode=FULL, levels: Optional[LevelGenerator] = None):
+        self.screen = screen
+        self.width, self.height = screen.get_size()
+        assets = prepare_assets(assets)
+        self.assets = assets
+        self.inputs = inputs
+        self.tick = 0
+        self.score = 0
+        self.clock = pygame.time.Clock()
+        layout = layout or default_layout(self.width, self.height)
+
+        # Enemies, platforms and rewards are rows of one EntityStore, moved in bulk each tick
+        self.store = EntityStore()
+        self.player = Player(100, self.height - 40, assets.character)
+        self.bg_scroller = BackgroundScroller(assets.background, speed=scroll_speed)
+
+        # Broad-phase index over everything that scrolls; collision checks only look at nearby cells
+        self.world = SpatialGrid()
+        self.entities_by_row = {}
+
+        self.levels = None
+        self.level = 0
+        if levels is None:
+            self.reward = Reward(*layout.reward, assets.reward, store=self.store, respawn_x=self.width + 300)
+            self.enemies = [Enemy(x, y, assets.enemy, store=self.store, respawn_x=self.width + 100)
+                            for x, y in layout.enemies]
+            self.platforms = [Platform(*rect, color=assets.platform_color, store=self.store)
+                              for rect in layout.platforms]
+            for entity in [*self.platforms, *self.enemies, self.reward]:
+                self.world.insert(self._register(entity))
+        else:
+            # Entities come from pools and are placed chunk by chunk as the level scrolls in
+            self.reward, self.enemies, self.platforms = None, [], []
+            self.levels = LevelStream(levels, self.store, self.world, {
+                ENEMY: lambda: self._register(Enemy(0, 0, assets.enemy, store=self.store)),
+                PLATFORM: lambda: self._register(Platform(0, 0, 1, 1, color=assets.platform_color, store=self.store)),
+                REWARD: lambda: self._register(Reward(0, 0, assets.reward, store=self.store)),
+            })
+            self.levels.update(self.world.camera_x, self.width)
+
+        self.renderer = Renderer(screen, assets.background, mode=render_mode)
+
+    def _register(self, entity):
+        self.entities_by_row[entity.index] = entity
+        return entity
+
+    def now(self):
+        """Game time in ms, counted in ticks so cooldowns don't depend on the render rate."""
+        return self.tick * 1000 // TICK_RATE
+
+    def update(self):
+        """Advance the simulation by one tick (1 / TICK_RATE seconds)."""
+        speed = self.bg_scroller.speed
+        self.store.snapshot()
+        self.bg_scroller.update()
+
+        keys = self.inputs.keys(self.tick) if self.inputs is not None else None
+        self.player.handle_keys(keys)
+        self.player.update(self.world)
+
+        # One vectorized scroll for every entity; the grid tracks the scroll itself, so only
+        # entities that moved on their own, wrapped (fixed layout) or were recycled (streamed
+        # levels) are re-indexed
+        self.store.scroll(speed)
+        self.world.scroll(speed)
+        for row in self._move_entities():
+            self.world.update(self.entities_by_row[row])
+        if self.store.gravity[:self.store.count].any():
+            self._land_on_platforms()
+        if self.levels is None:
+            for row in self.store.wrap():
+                self.world.update(self.entities_by_row[row])
+        else:
+            self.levels.update(self.world.camera_x, self.width)
+            level = self.levels.level_at(self.world.camera_x + self.player.rect.x)
+            if level != self.level:
+                self.level = level
+                print(f"[LEVEL] Level {level + 1}/{self.levels.generator.num_levels}")
+
+        # Rect overlap and cooldowns for all enemies at once; masks only for the few left
+        now = self.now()
+        for row in self.store.ready(self.store.overlapping(self.player.rect, ENEMY), now):
+            self.entities_by_row[row].check_collision_and_damage(self.player, now)
+        for reward in self.world.colliding(self.player.rect, Reward):
+            self.score += 1
+            if self.levels is None:
+                reward.rect.left = self.width + 300
+                self.world.update(reward)
+            else:
+                self.levels.release(reward.index)
+        self.tick += 1
+
+    def _move_entities(self):
+        """Own velocities and gravity for every entity at once; returns the rows that moved."""
+        n = self.store.count
+        before_x, before_y = self.store.x[:n].copy(), self.store.y[:n].copy()
+        self.store.integrate()
+        self.store.apply_gravity(GRAVITY, self.height - GROUND_HEIGHT)
+        moved = (self.store.x[:n] != before_x) | (self.store.y[:n] != before_y)
+        return np.flatnonzero(moved & self.store.alive[:n]).tolist()
+
+    def _land_on_platforms(self):
+        """Falling entities that dropped onto a platform this tick stand on it."""
+        store = self.store
+        # Entity-vs-entity broad phase: only pairs sharing a grid cell are compared
+        for a, b in self.world.pairs((Enemy, Platform)):
+            if isinstance(a, Platform) == isinstance(b, Platform):
+                continue
+            entity, platform = (b, a) if isinstance(a, Platform) else (a, b)
+            row, top = entity.index, platform.rect.top
+            if not store.gravity[row] or store.vy[row] <= 0 or store.prev_y[row] + store.h[row] > top:
+                continue
+            # Float positions, so an entity standing exactly on the platform stays there
+            overlaps_x = store.x[row] < platform.rect.right and store.x[row] + store.w[row] > platform.rect.left
+            if overlaps_x and store.y[row] + store.h[row] >= top:
+                store.y[row] = top - store.h[row]
+                store.vy[row] = 0.0
+                self.world.update(entity)
+
+    def is_over(self):
+        """The player died or, with streamed levels, the last level has scrolled past."""
+        return not self.player.is_alive() or (self.levels is not None and self.levels.finished)
+
+    def draw(self, alpha=1.0):
+        """Draw the state `alpha` (0..1) of the way from the previous tick to the latest."""
+        self.renderer.draw(self, alpha)
+
+    def run(self, max_ticks=None, render_fps=FPS, realtime=True, max_catch_up=MAX_CATCH_UP):
+        """
+        Play until the window is closed, the player dies or `max_ticks` ticks pass.
+
+        The simulation runs fixed ticks from an accumulator; each rendered frame
+        draws the state interpolated between the last two ticks.
+
+        :param render_fps: Frame cap (0 for uncapped). Doesn't change gameplay.
+        :param realtime: Use the wall clock. With False every frame counts as
+            exactly 1 / render_fps seconds (headless, reproducible runs).
+        :param max_catch_up: Most ticks per frame before the game slows down
+            instead of catching up.
+        """
+        timestep = FixedTimestep(TICK_RATE, max_catch_up)
+        last = time.perf_counter()
+        running = True
+        while running and (max_ticks is None or self.tick < max_ticks):
+            if realtime:
+                self.clock.tick(render_fps)
+                now = time.perf_counter()
+                elapsed, last = now - last, now
+            else:
+                elapsed = 1.0 / render_fps
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+
+            for _ in range(timestep.advance(elapsed)):
+                self.update()
+                if self.is_over() or (max_ticks is not None and self.tick >= max_ticks):
+                    break
+
+            self.draw(timestep.alpha)
+
+            if not self.player.is_alive():
+                print("Game Over!")
+                running = False
+            elif self.levels is not None and self.levels.finished:
+                print(f"[GAME] All {self.levels.generator.num_levels} level(s) cleared!")
+                running = False
+
+            self.renderer.present()
+        if timestep.dropped:
+            print(f"[GAME] Dropped {timestep.dropped} tick(s) on slow frames")
+        return self.score
@@ -1,4 +1,5 @@
-import pygame
+from engine.renderer import default_hud
+from engine.timestep import lerp
 
 class BackgroundScroller:
     def __init__(self, image, speed=2):
@@ -6,8 +7,10 @@ class BackgroundScroller:
         self.speed = speed
         self.x1 = 0
         self.x2 = image.get_width()
+        self.prev_x1, self.prev_x2 = self.x1, self.x2
 
     def update(self):
+        self.prev_x1, self.prev_x2 = self.x1, self.x2
         self.x1 -= self.speed
         self.x2 -= self.speed
 
@@ -17,16 +20,17 @@ class BackgroundScroller:
         if self.x2 <= -self.image.get_width():
             self.x2 = self.image.get_width()
 
-    def draw(self, screen):
-        screen.blit(self.image, (self.x1, 0))
-        screen.blit(self.image, (self.x2, 0))
+    def offsets(self, alpha=1.0):
+        # Interpolated between the last two ticks; the loop-around jump snaps
+        max_jump = self.image.get_width()
+        return (round(lerp(self.prev_x1, self.x1, alpha, max_jump)),
+                round(lerp(self.prev_x2, self.x2, alpha, max_jump)))
 
+    def draw(self, screen, alpha=1.0):
+        for x in self.offsets(alpha):
+            screen.blit(self.image, (x, 0))
 
-def draw_score(screen, score, health=None):
-    font = pygame.font.SysFont("Arial", 30)
-    score_text = font.render(f"Score: {score}", True, (255, 255, 255))
-    screen.blit(score_text, (20, 20))
 
-    if health is not None:
-        health_text = font.render(f"Health: {health}", True, (255, 100, 100))
-        screen.blit(health_text, (20, 60))
+def draw_score(screen, score, health=None):
+    # The font and the rendered text are cached (see engine/renderer.py)
+    return default_hud().draw(screen, score, health)
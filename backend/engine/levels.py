@@ -0,0 +1,164 @@
+import random
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+from engine.entities import ENEMY, PLATFORM, REWARD
+
+# Procedurally generated levels, streamed in chunks.
+#
+# A game has `levels` levels of CHUNKS_PER_LEVEL screen-wide chunks, each level
+# denser than the one before. A chunk's content is generated from (seed, chunk
+# index) just as it scrolls into view, so the same game always gets the same
+# level and nothing is generated ahead of need. Entities that scroll off the
+# left edge go back to a pool and are reused for the next chunk, so the number
+# of live objects (and memory) depends on what fits on screen, not on how long
+# a level is.
+
+CHUNKS_PER_LEVEL = 8
+GROUND_HEIGHT = 40
+PLATFORM_HEIGHT = 20
+ENEMY_SIZE = 64
+REWARD_SIZE = 32
+
+
+class Chunk(NamedTuple):
+    index: int
+    level: int  # 0-based
+    platforms: List[Tuple[int, int, int, int]]  # x, y, width, height; x from the chunk's left edge
+    enemies: List[Tuple[int, int]]  # top-left
+    rewards: List[Tuple[int, int]]
+
+
+class LevelGenerator:
+    """
+    Seeded chunk content for a game.
+
+    :param seed: Same seed, same levels.
+    :param num_levels: Levels in the game (config['levels']).
+    :param chunks_per_level: Length of each level in screen-wide chunks.
+    :param width: Chunk width (one screen).
+    :param height: Screen height.
+    """
+
+    def __init__(self, seed, num_levels=1, chunks_per_level=CHUNKS_PER_LEVEL, width=960, height=540):
+        self.seed = seed
+        self.num_levels = max(1, num_levels)
+        self.chunks_per_level = chunks_per_level
+        self.width = width
+        self.height = height
+
+    @property
+    def num_chunks(self):
+        return self.num_levels * self.chunks_per_level
+
+    def level_of(self, index):
+        """Level (0-based) that chunk `index` belongs to."""
+        return min(max(0, index) // self.chunks_per_level, self.num_levels - 1)
+
+    def density(self, level):
+        """(platforms, enemies) per chunk: each level adds one of each."""
+        return 2 + level, 1 + level
+
+    def chunk(self, index):
+        rng = random.Random(f"{self.seed}:{index}")
+        level = self.level_of(index)
+        num_platforms, num_enemies = self.density(level)
+        ground = self.height - GROUND_HEIGHT
+
+        # Ground, then floating platforms in evenly spaced slots so they don't pile up
+        platforms = [(0, ground, self.width, GROUND_HEIGHT)]
+        slot = self.width // num_platforms
+        for i in range(num_platforms):
+            width = rng.randrange(80, 180)
+            x = i * slot + rng.randrange(max(1, slot - width))
+            platforms.append((x, rng.randrange(220, ground - 80), width, PLATFORM_HEIGHT))
+
+        # Enemies stand on a platform or the ground; the first chunk is left clear for the start
+        enemies = []
+        if index > 0:
+            for _ in range(num_enemies):
+                x, y, width, _ = rng.choice(platforms)
+                enemies.append((x + rng.randrange(max(1, width - ENEMY_SIZE)), y - ENEMY_SIZE))
+
+        # One reward floating above a platform
+        x, y, width, _ = rng.choice(platforms[1:])
+        rewards = [(x + (width - REWARD_SIZE) // 2, y - REWARD_SIZE - 30)]
+        return Chunk(index, level, platforms, enemies, rewards)
+
+
+class EntityPool:
+    """Released entities of one kind; acquire() reuses one before making a new one."""
+
+    def __init__(self, factory: Callable):
+        self.factory = factory
+        self.free = []
+        self.created = 0
+
+    def acquire(self):
+        if self.free:
+            return self.free.pop()
+        self.created += 1
+        return self.factory()
+
+    def release(self, entity):
+        self.free.append(entity)
+
+
+class LevelStream:
+    """
+    Spawns chunks as they scroll into view and recycles entities that scroll out.
+
+    :param generator: LevelGenerator with the game's levels.
+    :param store: EntityStore the entities are rows of.
+    :param world: SpatialGrid the entities are indexed in.
+    :param factories: {ENEMY / PLATFORM / REWARD: callable making a new
+        store-backed entity}, used when a pool runs dry.
+    """
+
+    def __init__(self, generator: LevelGenerator, store, world, factories: Dict[int, Callable]):
+        self.generator = generator
+        self.store = store
+        self.world = world
+        self.pools = {kind: EntityPool(factory) for kind, factory in factories.items()}
+        self.active = {}  # row -> (kind, entity)
+        self.next_chunk = 0
+
+    @property
+    def finished(self):
+        """Every chunk has been spawned and has scrolled past."""
+        return self.next_chunk >= self.generator.num_chunks and not self.active
+
+    def level_at(self, world_x):
+        """Level (0-based) at world x (screen x + the grid's camera_x)."""
+        return self.generator.level_of(int(world_x // self.generator.width))
+
+    def update(self, camera_x, screen_width):
+        """Recycle entities that left the screen and spawn chunks reaching its right edge."""
+        for row in self.store.behind().tolist():
+            if row in self.active:
+                self.release(row)
+        generator = self.generator
+        while (self.next_chunk < generator.num_chunks
+               and self.next_chunk * generator.width - camera_x < screen_width):
+            self._spawn(generator.chunk(self.next_chunk), self.next_chunk * generator.width - camera_x)
+            self.next_chunk += 1
+
+    def _spawn(self, chunk, left):
+        for x, y, width, height in chunk.platforms:
+            self._place(PLATFORM, left + x, y, width, height)
+        for x, y in chunk.enemies:
+            self._place(ENEMY, left + x, y)
+        for x, y in chunk.rewards:
+            self._place(REWARD, left + x, y)
+
+    def _place(self, kind, x, y, width=None, height=None):
+        entity = self.pools[kind].acquire()
+        self.store.place(entity.index, x, y, width, height)
+        self.world.insert(entity)
+        self.active[entity.index] = (kind, entity)
+
+    def release(self, row):
+        """Take the entity at store row `row` out of play and back to its pool."""
+        kind, entity = self.active.pop(row)
+        self.store.park(row)
+        self.world.remove(entity)
+        self.pools[kind].release(entity)
@@ -1,14 +1,27 @@
 import pygame
 
+from engine.entities import PLATFORM, RectView
+
 class Platform:
-    def __init__(self, x, y, width, height, color=(100, 100, 100)):
-        self.rect = pygame.Rect(x, y, width, height)
+    def __init__(self, x, y, width, height, color=(100, 100, 100), store=None, respawn_x=960 + 100):
+        # With an EntityStore this is a thin view over one of its rows
+        self.store = store
+        if store is None:
+            self.rect = pygame.Rect(x, y, width, height)
+        else:
+            self.index = store.add(PLATFORM, x, y, width, height, respawn_x=respawn_x)
+            self.rect = RectView(store, self.index)
         self.color = (100, 100, 255)
 
     def move(self, speed):
+        """Scroll left; returns True if the platform wrapped back to the right."""
         self.rect.x -= speed
         if self.rect.right < 0:
             self.rect.left = 960 + 100  # Wrap around or reset offscreen
+            return True
+        return False
 
-    def draw(self, screen):
-        pygame.draw.rect(screen, self.color, self.rect)
+    def draw(self, screen, pos=None):
+        # `pos` overrides the position, e.g. interpolated between ticks
+        rect = self.rect if pos is None else (pos[0], pos[1], self.rect.width, self.rect.height)
+        return pygame.draw.rect(screen, self.color, rect)
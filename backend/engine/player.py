@@ -1,10 +1,14 @@
 import pygame
 
+from engine.collision import get_mask
+from engine.platform import Platform
+from engine.spatial import SpatialGrid
+from engine.timestep import lerp
+
 class Player:
     def __init__(self, x, y, image):
         self.image = image
         self.rect = self.image.get_rect(topleft=(x, y))
-        self.mask = pygame.mask.from_surface(self.image)
 
         # Physics
         self.vel_y = 0
@@ -18,18 +22,25 @@ class Player:
 
         # Lock x-position (side-scroller static player)
         self.start_x = x
+        self.prev_y = self.rect.y  # For drawing between ticks
 
-    def handle_keys(self):
-        keys = pygame.key.get_pressed()
+    def handle_keys(self, keys=None):
+        # `keys` lets scripted input (headless runs, benchmarks) stand in for the keyboard
+        if keys is None:
+            keys = pygame.key.get_pressed()
         if keys[pygame.K_SPACE] and not self.jump:
             self.vel_y = self.jump_strength
             self.jump = True
 
     def update(self, platforms=[]):
+        # One fixed tick (see engine/timestep.py); gravity and jump strength are per tick
+        self.prev_y = self.rect.y
         self.vel_y += self.gravity
         self.rect.y += self.vel_y
 
-    # Collision with platforms
+    # Collision with platforms (only the nearby ones when given a spatial index)
+        if isinstance(platforms, SpatialGrid):
+            platforms = platforms.query(self.rect, Platform)
         on_platform = False
         for plat in platforms:
             if self.rect.colliderect(plat.rect) and self.vel_y >= 0:
@@ -52,10 +63,16 @@ class Player:
 
     # Lock player x-position
         self.rect.x = 100
-        self.mask = pygame.mask.from_surface(self.image)
 
-    def draw(self, screen):
-        screen.blit(self.image, self.rect)
+    @property
+    def mask(self):
+        # Cached per image, so changing self.image (animation) just picks up that frame's mask
+        return get_mask(self.image)
+
+    def draw(self, screen, alpha=1.0):
+        # Sprites are pre-multiplied (see generator/postprocess.py)
+        y = round(lerp(self.prev_y, self.rect.y, alpha))
+        return screen.blit(self.image, (self.rect.x, y), special_flags=pygame.BLEND_PREMULTIPLIED)
 
     def is_alive(self):
         return self.health > 0
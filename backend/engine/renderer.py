@@ -0,0 +1,227 @@
+import numpy as np
+import pygame
+
+from engine.entities import ENEMY, PLATFORM, REWARD
+
+# Frame rendering.
+#
+# Everything the game draws goes through a Renderer: cached fonts and HUD text
+# (re-rendered only when the score or health changes), surfaces converted to
+# the display's pixel format once at startup, platforms, enemies and rewards
+# culled to the screen in one vectorized step, and two ways to present a frame:
+#
+#   full   redraw the whole screen and flip all of it (the default)
+#   dirty  repaint the background only under last frame's sprites and draw
+#          this frame's. When the background scrolls, the cleaned frame is
+#          shifted in place (Surface.scroll) and only the strip scrolled into
+#          view is blitted; every pixel moved, so the whole screen is still
+#          sent to the display. While the background is still, only the dirty
+#          rects are sent.
+#
+# Dirty mode does what pygame.sprite.LayeredDirty does (clear the previous
+# rects, draw, update the union) directly on the EntityStore rows, so the
+# entities don't have to become Sprite objects.
+
+FULL = "full"
+DIRTY = "dirty"
+RENDER_MODES = (FULL, DIRTY)
+
+HUD_FONT = ("Arial", 30)
+SCORE_COLOR = (255, 255, 255)
+HEALTH_COLOR = (255, 100, 100)
+
+_fonts = {}
+
+
+def get_font(name=HUD_FONT[0], size=HUD_FONT[1]):
+    """SysFont searches the system fonts on every call; load each (name, size) once."""
+    font = _fonts.get((name, size))
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        if not _fonts:
+            # Fonts can't be used after pygame.quit(); load them again next time
+            pygame.register_quit(_fonts.clear)
+        font = _fonts[(name, size)] = pygame.font.SysFont(name, size)
+    return font
+
+
+def display_format(surface, alpha=None):
+    """
+    Copy of `surface` in the display's pixel format, so blits don't convert
+    pixels every frame. Keeps per-pixel alpha if the surface has it (or if
+    `alpha` is True). Returned unchanged before a display mode is set, and for
+    subsurfaces (atlas frames), which must keep sharing their converted parent.
+    """
+    if surface is None or pygame.display.get_surface() is None or surface.get_parent() is not None:
+        return surface
+    if alpha is None:
+        alpha = bool(surface.get_flags() & pygame.SRCALPHA)
+    return surface.convert_alpha() if alpha else surface.convert()
+
+
+class CachedText:
+    """One line of text, re-rendered only when its value changes."""
+
+    def __init__(self, font, color, antialias=True):
+        self.font = font
+        self.color = color
+        self.antialias = antialias
+        self.text = None
+        self.surface = None
+
+    def render(self, text):
+        if text != self.text:
+            self.text = text
+            self.surface = self.font.render(text, self.antialias, self.color)
+        return self.surface
+
+
+class HUD:
+    """Score and health text in the top-left corner."""
+
+    def __init__(self, font=None, position=(20, 20), line_height=40):
+        font = font or get_font()
+        self.position = position
+        self.line_height = line_height
+        self.score = CachedText(font, SCORE_COLOR)
+        self.health = CachedText(font, HEALTH_COLOR)
+
+    def draw(self, screen, score, health=None):
+        """Blit the HUD and return the rects it covers."""
+        x, y = self.position
+        rects = [screen.blit(self.score.render(f"Score: {score}"), (x, y))]
+        if health is not None:
+            rects.append(screen.blit(self.health.render(f"Health: {health}"), (x, y + self.line_height)))
+        return rects
+
+
+_default_hud = None
+
+
+def default_hud():
+    global _default_hud
+    if _default_hud is None:
+        _default_hud = HUD()
+    return _default_hud
+
+
+class Renderer:
+    """
+    Draws a Game's state and presents it.
+
+    :param screen: The display surface.
+    :param background: Background surface, used to repaint under sprites in dirty mode.
+    :param mode: FULL or DIRTY (see the notes at the top of this module).
+    :param hud: HUD to draw (default: a new one with the cached default font).
+    """
+
+    def __init__(self, screen, background, mode=FULL, hud=None):
+        if mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode {mode!r} (expected one of {RENDER_MODES})")
+        self.screen = screen
+        self.width, self.height = screen.get_size()
+        self.screen_rect = screen.get_rect()
+        self.mode = mode
+        self.hud = hud or HUD()
+        # Skip clearing the screen when an opaque background covers all of it
+        self.clear = bool(background.get_flags() & pygame.SRCALPHA) or background.get_height() < self.height
+        self._background_at = None  # Background offsets of the last frame drawn
+        self._previous = []  # Rects drawn last frame (repainted first in dirty mode)
+        self._update = None  # Rects to present, or None for the whole screen
+        self.full_frames = 0
+        self.dirty_frames = 0  # Of which scrolled_frames had to present the whole screen
+        self.scrolled_frames = 0
+
+    def invalidate(self):
+        """Force the next frame to redraw and present the whole screen."""
+        self._background_at = None
+
+    def draw(self, game, alpha=1.0):
+        """Draw `game` `alpha` (0..1) of the way from its previous tick to the latest."""
+        screen = self.screen
+        store = game.store
+        background = game.bg_scroller.image
+        offsets = game.bg_scroller.offsets(alpha)
+        shift = self._shift(offsets)
+        full = shift is None
+
+        if full:
+            if self.clear:
+                screen.fill((0, 0, 0))
+            for x in offsets:
+                screen.blit(background, (x, 0))
+        else:
+            # Clean last frame's sprites off with the background where it was, then move it
+            self._repaint(background, self._background_at, self._previous)
+            if shift:
+                screen.scroll(shift, 0)
+                exposed = (self.width + shift, 0, -shift, self.height) if shift < 0 else (0, 0, shift, self.height)
+                self._repaint(background, offsets, [pygame.Rect(exposed)])
+        self._background_at = offsets
+
+        rects = []
+        platform_rows = store.visible(PLATFORM, self.width, self.height)
+        for row, pos in zip(platform_rows.tolist(), store.positions(platform_rows, alpha).tolist()):
+            platform = game.entities_by_row[row]
+            rects.append(platform.draw(screen, pos))
+
+        rects.append(game.player.draw(screen, alpha))
+        # Cull off-screen enemies and rewards in one step each and draw the rest with a single blits() call
+        visible = np.concatenate([store.visible(ENEMY, self.width, self.height),
+                                  store.visible(REWARD, self.width, self.height)])
+        rects += screen.blits(
+            [(game.entities_by_row[row].image, pos, None, pygame.BLEND_PREMULTIPLIED)
+             for row, pos in zip(visible.tolist(), store.positions(visible, alpha).tolist())],
+            doreturn=self.mode == DIRTY,
+        ) or []
+        rects += self.hud.draw(screen, game.score, game.player.health)
+
+        if full:
+            self._update = None
+            self._previous = [] if self.mode == FULL else self._on_screen(rects)
+            self.full_frames += 1
+        else:
+            current = self._on_screen(rects)
+            self._update = None if shift else self._previous + current
+            self._previous = current
+            self.dirty_frames += 1
+            self.scrolled_frames += bool(shift)
+
+    def _shift(self, offsets):
+        """How far the background moved since the last frame, or None if it needs a full redraw."""
+        previous = self._background_at
+        if self.mode == FULL or previous is None:
+            return None
+        moves = {x - before for x, before in zip(offsets, previous)}
+        # Both tiles move together except when one loops around
+        if len(moves) != 1:
+            return None
+        shift = moves.pop()
+        return shift if abs(shift) < self.width else None
+
+    def _on_screen(self, rects):
+        clipped = (pygame.Rect(rect).clip(self.screen_rect) for rect in rects if rect is not None)
+        return [rect for rect in clipped if rect.width and rect.height]
+
+    def _repaint(self, background, offsets, rects):
+        # Restore the background under each rect; the clip keeps each blit to that area
+        screen = self.screen
+        for rect in rects:
+            screen.set_clip(rect)
+            if self.clear:
+                screen.fill((0, 0, 0))
+            for x in offsets:
+                screen.blit(background, (x, 0))
+        screen.set_clip(None)
+
+    def present(self):
+        """Send the frame to the display: everything, or only the dirty rects."""
+        if self._update is None:
+            pygame.display.update()
+            return
+        # Many small rects cost more than one full update past a point
+        if sum(rect.width * rect.height for rect in self._update) * 2 >= self.width * self.height:
+            pygame.display.update()
+        elif self._update:
+            pygame.display.update(self._update)
@@ -0,0 +1,20 @@
+import pygame
+
+from engine.entities import REWARD, RectView
+
+class Reward:
+    def __init__(self, x, y, image, store=None, respawn_x=None):
+        self.image = image
+        # With an EntityStore this is a thin view over one of its rows
+        self.store = store
+        if store is None:
+            self.rect = image.get_rect(topleft=(x, y))
+        else:
+            width, height = image.get_size()
+            self.index = store.add(REWARD, x, y, width, height, respawn_x=respawn_x)
+            self.rect = RectView(store, self.index)
+
+    def draw(self, screen, pos=None):
+        # Sprites are pre-multiplied (see generator/postprocess.py). `pos` overrides
+        # the position, e.g. interpolated between ticks.
+        return screen.blit(self.image, self.rect if pos is None else pos, special_flags=pygame.BLEND_PREMULTIPLIED)
@@ -0,0 +1,120 @@
+from collections import defaultdict
+
+# Uniform-grid broad phase for platforms, enemies and rewards.
+#
+# Entities are stored by world position (screen x + how far the level has
+# scrolled). When the whole level scrolls, nothing in the grid moves: scroll()
+# just advances the camera, so the index is never rebuilt per frame. Only an
+# entity that moves relative to the world (an enemy walking, something wrapping
+# back to the right edge) needs update(), and that only touches the grid when
+# the entity crosses into different cells.
+
+
+class SpatialGrid:
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size
+        self.camera_x = 0  # Total distance the world has scrolled left
+        self._cells = defaultdict(dict)  # (cx, cy) -> {id(entity): entity}
+        self._entries = {}  # id(entity) -> (entity, cell range, insertion order)
+        self._next_order = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, entity):
+        return id(entity) in self._entries
+
+    def _cell_range(self, rect):
+        # Inclusive cell bounds of a screen rect, in world space
+        size = self.cell_size
+        left = rect.left + self.camera_x
+        return (
+            left // size,
+            rect.top // size,
+            (left + max(rect.width, 1) - 1) // size,
+            (rect.top + max(rect.height, 1) - 1) // size,
+        )
+
+    @staticmethod
+    def _keys(cells):
+        x0, y0, x1, y1 = cells
+        return [(cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)]
+
+    def insert(self, entity):
+        """Index an entity (anything with a .rect in screen coordinates)."""
+        if id(entity) in self._entries:
+            self.update(entity)
+            return
+        cells = self._cell_range(entity.rect)
+        for key in self._keys(cells):
+            self._cells[key][id(entity)] = entity
+        self._entries[id(entity)] = (entity, cells, self._next_order)
+        self._next_order += 1
+
+    def remove(self, entity):
+        entry = self._entries.pop(id(entity), None)
+        if entry is None:
+            return
+        for key in self._keys(entry[1]):
+            bucket = self._cells[key]
+            bucket.pop(id(entity), None)
+            if not bucket:
+                del self._cells[key]
+
+    def update(self, entity):
+        """Re-index an entity that moved relative to the world. Cheap if it stayed in its cells."""
+        entry = self._entries.get(id(entity))
+        if entry is None:
+            self.insert(entity)
+            return
+        cells = self._cell_range(entity.rect)
+        if cells == entry[1]:
+            return
+        for key in self._keys(entry[1]):
+            bucket = self._cells[key]
+            bucket.pop(id(entity), None)
+            if not bucket:
+                del self._cells[key]
+        for key in self._keys(cells):
+            self._cells[key][id(entity)] = entity
+        self._entries[id(entity)] = (entity, cells, entry[2])
+
+    def scroll(self, speed):
+        """
+        The whole level moved `speed` pixels left on screen. Call this once per
+        frame alongside moving every entity's rect by the same amount; nothing
+        is re-indexed.
+        """
+        self.camera_x += speed
+
+    def query(self, rect, kind=None):
+        """
+        Entities whose cells overlap `rect` (screen coordinates), optionally only
+        instances of `kind`, in insertion order. These are candidates: check the
+        rects (or masks) for actual contact.
+        """
+        found = {}
+        for key in self._keys(self._cell_range(rect)):
+            bucket = self._cells.get(key)
+            if bucket:
+                found.update(bucket)
+        candidates = [entity for entity in found.values() if kind is None or isinstance(entity, kind)]
+        if len(candidates) > 1:
+            candidates.sort(key=lambda entity: self._entries[id(entity)][2])
+        return candidates
+
+    def colliding(self, rect, kind=None):
+        """Entities whose rects actually intersect `rect`."""
+        return [entity for entity in self.query(rect, kind) if entity.rect.colliderect(rect)]
+
+    def pairs(self, kind=None):
+        """Unique candidate pairs of entities sharing a cell (entity-vs-entity broad phase)."""
+        seen = set()
+        for bucket in self._cells.values():
+            members = [entity for entity in bucket.values() if kind is None or isinstance(entity, kind)]
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    key = (id(a), id(b)) if id(a) < id(b) else (id(b), id(a))
+                    if key not in seen:
+                        seen.add(key)
+                        yield a, b
@@ -0,0 +1,55 @@
+# Fixed-timestep simulation.
+#
+# Game logic always advances in ticks of 1/TICK_RATE seconds (all the physics
+# constants, like gravity 0.2 and scroll speed 3, are per tick at 60 Hz), no
+# matter how fast frames are rendered. Rendering draws the state interpolated
+# between the last two ticks, so a 30 Hz or 240 Hz display plays exactly the
+# same game, and a slow frame is caught up with extra ticks instead of slowing
+# the game down.
+
+TICK_RATE = 60
+MAX_CATCH_UP = 5  # Most ticks run for a single rendered frame
+
+
+class FixedTimestep:
+    """
+    Accumulator that turns elapsed wall time into a whole number of ticks.
+
+    :param tick_rate: Simulation ticks per second.
+    :param max_catch_up: Cap on ticks per frame. Time beyond it is dropped
+        (the game slows down instead of spiralling) and counted in `dropped`.
+    """
+
+    def __init__(self, tick_rate=TICK_RATE, max_catch_up=MAX_CATCH_UP):
+        self.dt = 1.0 / tick_rate
+        self.max_catch_up = max_catch_up
+        self.accumulator = 0.0
+        self.dropped = 0
+
+    def advance(self, elapsed):
+        """Add `elapsed` seconds and return how many ticks to run now."""
+        self.accumulator += elapsed
+        # Small epsilon so e.g. four 1/240 s frames make exactly one 1/60 s tick
+        steps = int((self.accumulator + 1e-9) // self.dt)
+        if self.max_catch_up and steps > self.max_catch_up:
+            self.dropped += steps - self.max_catch_up
+            steps = self.max_catch_up
+            self.accumulator = 0.0
+        else:
+            self.accumulator = max(0.0, self.accumulator - steps * self.dt)
+        return steps
+
+    @property
+    def alpha(self):
+        """How far (0..1) rendering is between the previous tick and the latest one."""
+        return min(1.0, self.accumulator / self.dt)
+
+
+def lerp(previous, current, alpha, max_jump=None):
+    """
+    Interpolate a coordinate between two ticks. Jumps larger than `max_jump`
+    (wrap-around, respawn) snap to the current value instead of sliding.
+    """
+    if max_jump is not None and abs(current - previous) > max_jump:
+        return current
+    return previous + (current - previous) * alpha
@@ -0,0 +1,164 @@
+"""
+Per-job event log used to stream progress to the frontend.
+
+Workers publish events as a job runs (status changes, each finished asset,
+denoising steps, optional latent previews) and the API's /events/{task_id}
+endpoint streams them to the browser as Server-Sent Events. Events live in the
+same backend as the job store (JOB_STORE_URL), so they cross process
+boundaries: a SQLite table next to the jobs table, or a Redis stream per job.
+
+Each event is {"id": str, "type": str, "data": dict}. Ids only ever increase
+for a job, so a client can resume with Last-Event-ID.
+"""
+
+import abc
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from job_store import DEFAULT_STORE_URL, DEFAULT_TTL_SECONDS
+
+# Event types
+STATUS = "status"
+ASSET = "asset"
+PROGRESS = "progress"
+PREVIEW = "preview"
+
+
+class EventLog(abc.ABC):
+    """Interface shared by the event log backends."""
+
+    @abc.abstractmethod
+    def publish(self, task_id: str, event_type: str, data: Dict) -> str:
+        """Append an event for a job and return its id."""
+
+    @abc.abstractmethod
+    def read(self, task_id: str, after: str = "0", limit: int = 100) -> List[Dict]:
+        """Events for a job with id greater than `after`, oldest first. Never blocks."""
+
+    @abc.abstractmethod
+    def is_event_id(self, value: str) -> bool:
+        """Whether `value` (e.g. a client's Last-Event-ID) is an id `read` accepts."""
+
+
+class SQLiteEventLog(EventLog):
+    """Events in a SQLite table (WAL mode, shared by every local process)."""
+
+    def __init__(self, path: str = "jobs.db", ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._last_purge = 0.0
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    task_id TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS job_events_task ON job_events (task_id, id)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def publish(self, task_id: str, event_type: str, data: Dict) -> str:
+        now = time.time()
+        with self._connect() as conn:
+            if now - self._last_purge > 60:
+                self._last_purge = now
+                conn.execute("DELETE FROM job_events WHERE created_at < ?", (now - self.ttl_seconds,))
+            cursor = conn.execute(
+                "INSERT INTO job_events (task_id, type, data, created_at) VALUES (?, ?, ?, ?)",
+                (task_id, event_type, json.dumps(data), now),
+            )
+        return str(cursor.lastrowid)
+
+    def read(self, task_id: str, after: str = "0", limit: int = 100) -> List[Dict]:
+        rows = self._connect().execute(
+            "SELECT id, type, data FROM job_events WHERE task_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (task_id, int(after), limit),
+        ).fetchall()
+        return [{"id": str(row[0]), "type": row[1], "data": json.loads(row[2])} for row in rows]
+
+    def is_event_id(self, value: str) -> bool:
+        return re.fullmatch(r"[0-9]{1,18}", value) is not None
+
+
+class RedisEventLog(EventLog):
+    """Events in one capped Redis stream per job."""
+
+    def __init__(self, client, ttl_seconds: int = DEFAULT_TTL_SECONDS, prefix: str = "events:",
+                 max_len: int = 1000):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.max_len = max_len
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisEventLog":
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def publish(self, task_id: str, event_type: str, data: Dict) -> str:
+        key = f"{self.prefix}{task_id}"
+        with self.client.pipeline() as pipe:
+            pipe.xadd(key, {"type": event_type, "data": json.dumps(data)}, maxlen=self.max_len, approximate=True)
+            pipe.expire(key, self.ttl_seconds)
+            event_id, _ = pipe.execute()
+        return _decode(event_id)
+
+    def read(self, task_id: str, after: str = "0", limit: int = 100) -> List[Dict]:
+        # XRANGE with an exclusive start: "(" + id
+        start = "-" if after == "0" else f"({after}"
+        entries = self.client.xrange(f"{self.prefix}{task_id}", min=start, max="+", count=limit)
+        events = []
+        for event_id, fields in entries:
+            fields = {_decode(k): _decode(v) for k, v in fields.items()}
+            events.append({"id": _decode(event_id), "type": fields["type"], "data": json.loads(fields["data"])})
+        return events
+
+    def is_event_id(self, value: str) -> bool:
+        # Stream ids are <milliseconds>-<sequence>
+        return re.fullmatch(r"[0-9]{1,20}(-[0-9]{1,20})?", value) is not None
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def open_event_log(url: str = DEFAULT_STORE_URL) -> EventLog:
+    """Build an event log next to the job store described by `url`."""
+    if url.startswith("sqlite:///"):
+        return SQLiteEventLog(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisEventLog.from_url(url)
+    raise ValueError(f"Unsupported JOB_STORE_URL: {url}")
+
+
+_event_log: Optional[EventLog] = None
+_event_log_lock = threading.Lock()
+
+
+def get_event_log() -> EventLog:
+    """The process-wide event log, opened from JOB_STORE_URL on first use."""
+    global _event_log
+    with _event_log_lock:
+        if _event_log is None:
+            _event_log = open_event_log()
+        return _event_log
@@ -1,11 +1,14 @@
 import json
 import os
+import uuid
 from pathlib import Path
 from datetime import datetime
 from typing import Literal
 
 # Replace this with your actual image generation function import
-from generator.image_generator import generate_image  # Must call your backend
+from generator.asset_pipeline import AssetPipeline, asset_specs, compose_prompts  # Must call your backend
+from generator.atlas import build_game_atlas
+from generator.manifest import get_manifest
 
 
 CONFIG_PATH = Path("config/game_config.json")
@@ -28,29 +31,35 @@ def generate_assets(config: dict, style: Literal["pixel", "realistic", "cartoon"
     """
     print("Generating assets using Stable Diffusion...\n")
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Unique even for runs started in the same second; names the files, atlas and manifest entry
+    run_id = f"cli-{datetime.now().strftime('%Y%m%d_%H%M%S')}-{uuid.uuid4().hex[:8]}"
 
     # Compose prompts with optional white background
-    character_bg_prompt = "white background" if white_bg else "transparent background"
-    enemy_bg_prompt = "white background" if white_bg else "transparent background"
-
-    prompts = {
-        "characters": f"{style} sprite of {config['character_prompt']}, 2D side view, {character_bg_prompt}",
-        "backgrounds": f"{style} background: {config['background_prompt']}, seamless, game backdrop",
-        "rewards": f"{style} icon of {config['reward_prompt']}, 2D, isolated, transparent background",
-        "enemies": f"{style} enemy: {config['enemy_prompt']}, 2D side view, pixel art style, {enemy_bg_prompt}"
-    }
-
-    outputs = {
-        "characters": ASSET_DIR / "characters" / f"character_{timestamp}.png",
-        "backgrounds": ASSET_DIR / "backgrounds" / f"background_{timestamp}.png",
-        "rewards": ASSET_DIR / "rewards" / f"reward_{timestamp}.png",
-        "enemies": ASSET_DIR / "enemies" / f"enemy_{timestamp}.png"
-    }
-
-    for asset_type, prompt in prompts.items():
-        print(f"Generating {asset_type[:-1]}...")
-        generate_image(prompt, str(outputs[asset_type]))
+    prompts = compose_prompts(
+        {
+            "character": config['character_prompt'],
+            "background": config['background_prompt'],
+            "reward": config['reward_prompt'],
+            "enemy": config['enemy_prompt'],
+        },
+        style=style,
+        white_bg=white_bg,
+    )
+
+    specs = asset_specs(prompts, ASSET_DIR, run_id)
+    for spec in specs:
+        print(f"Generating {spec.asset_type[:-1]}...")
+    # Diffusion for all asset types is batched; post-processing and saving overlap with it
+    results = AssetPipeline().run(specs)
+
+    failed = [asset_type for asset_type, result in results.items() if result.error is not None]
+    if failed:
+        raise RuntimeError(f"Failed to generate: {', '.join(failed)}")
+
+    records = {asset_type: result.record for asset_type, result in results.items()}
+    # One texture with every sprite, so the game decodes a single file at launch
+    atlas = build_game_atlas(records, run_id, ASSET_DIR / "atlases")
+    get_manifest().append(run_id, config.get("title", "Generative Game"), records, atlas=atlas)
 
     print("\nAll assets generated and saved under /assets/")
 
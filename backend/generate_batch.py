@@ -0,0 +1,69 @@
+"""
+Generate one asset type for every prompt in a file, across a matrix of styles.
+
+The command-line side of /generate-batch: same planning (identical composed
+prompts are generated once), same pipeline, run in this process.
+
+    python generate_batch.py fantasy_background_prompts.txt
+    python generate_batch.py fantasy_creature_prompts.txt --type enemies --styles pixel cartoon
+
+Images go to <output-dir>/<type>/ with a batch.json summary next to them.
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+from generator.bulk import BULK_IN_FLIGHT, STYLES, plan_batch, run_batch
+from generator.asset_pipeline import ASSET_TYPES
+from generator.dataset_builder import load_prompts
+
+PROGRESS_SECONDS = 5.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate assets for every prompt in a file, in several styles.")
+    parser.add_argument("prompt_file", help="One subject per line")
+    parser.add_argument("--type", dest="asset_type", choices=ASSET_TYPES, default="backgrounds")
+    parser.add_argument("--styles", nargs="+", choices=STYLES, default=list(STYLES))
+    parser.add_argument("--transparent-bg", action="store_true",
+                        help="Ask for a transparent background instead of white (characters, enemies)")
+    parser.add_argument("--output-dir", help="Default: assets/batches/cli-<timestamp>")
+    parser.add_argument("--in-flight", type=int, default=BULK_IN_FLIGHT, help="Prompts in the pipeline at once")
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir or f"assets/batches/cli-{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    plan = plan_batch(load_prompts(args.prompt_file), args.asset_type, args.styles,
+                      not args.transparent_bg, output_dir)
+    print(f"[BULK] {len(plan.specs)} prompt(s) ({plan.duplicates} duplicate(s) skipped) -> {output_dir}")
+
+    last_printed = [time.monotonic()]
+
+    def on_result(result, progress):
+        if time.monotonic() - last_printed[0] >= PROGRESS_SECONDS:
+            last_printed[0] = time.monotonic()
+            stats = progress.snapshot()
+            print(f"[BULK] {stats['done'] + stats['failed']}/{stats['total']} "
+                  f"({stats['images_per_second']} images/s, ETA {stats['eta_seconds']}s)")
+
+    results, progress = run_batch(plan, on_result=on_result, max_in_flight=args.in_flight)
+
+    summary = {
+        "assetType": args.asset_type,
+        "promptFile": args.prompt_file,
+        **progress.snapshot(),
+        "assets": [{"path": r.path, "prompt": r.spec.prompt, "style": style}
+                   for r, style in zip(results, plan.styles) if r.error is None],
+        "failedAssets": {r.spec.prompt: r.error for r in results if r.error is not None},
+    }
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_dir / "batch.json", "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"[BULK] {summary['done']} done, {summary['failed']} failed in {summary['elapsed_seconds']}s "
+          f"({summary['images_per_second']} images/s); summary in {output_dir / 'batch.json'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# generator/asset_pipeline.py
+
+"""
+Staged asset pipeline for one game's character, background, reward and enemy.
+
+Each asset moves through a small DAG of stages:
+
+    compose prompt -> diffusion (GPU, shared batches) -> resize -> PNG encode + save
+        -> alpha matte + trim -> <name>@processed.png + pre-scaled variants
+
+Diffusion goes through the batch scheduler and returns images in memory. The
+CPU stages run on a shared thread pool, so PNG encoding and pixel work for one
+batch overlap with the next denoising call instead of blocking the GPU thread.
+Every asset is retried on its own (diffusion again if the pipeline failed, or
+just the CPU stages if those failed), so one bad asset doesn't throw away the
+other three.
+"""
+
+import io
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from PIL import Image
+
+from generator.batch_scheduler import get_scheduler
+from generator.cache import get_cache
+from generator.image_generator import request_cache_key
+from generator.manifest import asset_record
+from generator.postprocess import SPRITE_TYPES, postprocess, save_processed, save_variants
+
+ASSET_TYPES = ("characters", "backgrounds", "rewards", "enemies")
+
+FILE_PREFIXES = {
+    "characters": "character",
+    "backgrounds": "background",
+    "rewards": "reward",
+    "enemies": "enemy",
+}
+
+# Key of each asset type's description in compose_prompts' `subjects`
+SUBJECT_KEYS = {
+    "characters": "character",
+    "backgrounds": "background",
+    "rewards": "reward",
+    "enemies": "enemy",
+}
+
+PROMPT_TEMPLATES = {
+    "characters": "{style} sprite of {subject}, 2D side view, {bg}",
+    "backgrounds": "{style} background: {subject}, seamless, game backdrop",
+    "rewards": "{style} icon of {subject}, 2D, isolated, transparent background",
+    "enemies": "{style} enemy: {subject}, 2D side view, pixel art style, {bg}",
+}
+
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", "4"))
+MAX_RETRIES = int(os.getenv("ASSET_RETRIES", "2"))
+
+
+class AssetSpec(NamedTuple):
+    asset_type: str
+    prompt: str
+    output_path: str
+
+
+class AssetResult(NamedTuple):
+    spec: AssetSpec
+    path: Optional[str]
+    error: Optional[str]
+    attempts: int
+    record: Optional[Dict] = None  # Manifest entry (see generator/manifest.py)
+
+
+# --- Stage: prompt composition ---
+
+def compose_prompts(subjects: Dict[str, str], style: str = "pixel", white_bg: bool = True) -> Dict[str, str]:
+    """
+    Build the diffusion prompt for each asset type.
+
+    :param subjects: {"character", "background", "reward", "enemy"} descriptions.
+    :param style: Art style to apply (pixel, realistic, cartoon).
+    :param white_bg: Ask for a white background on characters and enemies.
+    """
+    return {
+        asset_type: compose_prompt(asset_type, subjects[SUBJECT_KEYS[asset_type]], style, white_bg)
+        for asset_type in ASSET_TYPES
+    }
+
+
+def compose_prompt(asset_type: str, subject: str, style: str = "pixel", white_bg: bool = True) -> str:
+    """Diffusion prompt for one asset of `asset_type` (see compose_prompts)."""
+    bg_prompt = "white background" if white_bg else "transparent background"
+    return PROMPT_TEMPLATES[asset_type].format(style=style, subject=subject, bg=bg_prompt)
+
+
+def asset_specs(prompts: Dict[str, str], asset_dir, run_id: str) -> List[AssetSpec]:
+    """
+    One AssetSpec per prompt, saved as <asset_dir>/<type>/<prefix>_<run_id>.png.
+    `run_id` must be unique per job (e.g. its task id): jobs running at the
+    same time share the asset folders.
+    """
+    return [
+        AssetSpec(asset_type, prompt, str(Path(asset_dir) / asset_type / f"{FILE_PREFIXES[asset_type]}_{run_id}.png"))
+        for asset_type, prompt in prompts.items()
+    ]
+
+
+# --- CPU stages ---
+
+def resize(image: Image.Image, asset_type: str, sizes: Dict[str, Tuple[int, int]]) -> Image.Image:
+    """Resize to the configured size for this asset type, if any."""
+    size = sizes.get(asset_type)
+    if not size or image.size == tuple(size):
+        return image
+    return image.resize(size, Image.LANCZOS)
+
+
+def save(image: Image.Image, output_path: str) -> bytes:
+    """Encode once in memory so the same bytes can be hashed for the manifest."""
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    data = buffer.getvalue()
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(data)
+    print(f"Saved: {output_path}")
+    return data
+
+
+# --- Runner ---
+
+_cpu_pool: Optional[ThreadPoolExecutor] = None
+_cpu_pool_lock = threading.Lock()
+
+
+def get_cpu_pool() -> ThreadPoolExecutor:
+    """Thread pool shared by every job's CPU stages in this process."""
+    global _cpu_pool
+    with _cpu_pool_lock:
+        if _cpu_pool is None:
+            _cpu_pool = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="asset-cpu")
+        return _cpu_pool
+
+
+class AssetPipeline:
+    """
+    Runs asset specs through diffusion and the CPU stages.
+
+    :param scheduler: Batch scheduler used for diffusion (default: process-wide one).
+    :param sizes: Optional {asset_type: (width, height)} for the resize stage.
+    :param max_retries: Extra attempts per asset before giving up on it.
+    :param use_cache: Reuse raw diffusion output from the generation cache.
+    :param settings: Diffusion settings (guidance_scale, num_inference_steps, seed, height, width).
+    """
+
+    def __init__(self, scheduler=None, sizes: Optional[Dict[str, Tuple[int, int]]] = None,
+                 max_retries: int = MAX_RETRIES, use_cache: bool = True, **settings):
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
+        self.sizes = sizes or {}
+        self.max_retries = max_retries
+        self.cache = get_cache() if use_cache else None
+        self.settings = settings
+
+    def _diffuse(self, spec: AssetSpec, on_step: Optional[Callable]):
+        """Start the diffusion stage; returns a Future resolving to (image, cache_key, from_cache)."""
+        key = request_cache_key(spec.prompt, **self.settings) if self.cache is not None else None
+        cached = self.cache.lookup(key) if key is not None else None
+        if cached is not None:
+            print(f"Cache hit: {spec.asset_type} ({spec.prompt})")
+            return get_cpu_pool().submit(lambda: (Image.open(cached).convert("RGB"), key, True))
+
+        if on_step is not None:
+            step_callback = lambda _index, step, total_steps, latent: on_step(spec, step, total_steps, latent)
+        else:
+            step_callback = None
+
+        image_future = self.scheduler.submit(spec.prompt, on_step=step_callback, **self.settings)
+        # Chain so the result has the same shape as a cache hit
+        return _then(image_future, lambda image: (image, key, False))
+
+    def _process(self, spec: AssetSpec, image: Image.Image, key: Optional[str], from_cache: bool) -> Dict:
+        """CPU stages: cache raw output, resize, matte + trim, variants, encode + save."""
+        if key is not None and not from_cache:
+            self.cache.store_image(key, image)
+        image = resize(image, spec.asset_type, self.sizes)
+        processed = postprocess(image, spec.asset_type)
+        # Derived files first, so anything that sees the original can rely on them existing
+        processed_file = save_processed(processed, spec.output_path) if spec.asset_type in SPRITE_TYPES else None
+        variants = save_variants(processed, spec.asset_type, spec.output_path)
+        # The original path keeps the raw image; the matted sprite has its own name
+        data = save(image, spec.output_path)
+        return asset_record(spec.output_path, data, image.size, variants, processed_file)
+
+    def run(self, specs: List[AssetSpec], on_step: Optional[Callable] = None,
+            on_saved: Optional[Callable] = None) -> Dict[str, AssetResult]:
+        """
+        Generate and save every spec. Returns {asset_type: AssetResult}; failed
+        assets have `error` set instead of `path`.
+
+        :param on_step: on_step(spec, step, total_steps, latent) per denoising step.
+        :param on_saved: on_saved(spec, path) as soon as each asset's file is written.
+        """
+        results = self.run_many(specs, on_step=on_step, on_saved=on_saved)
+        return {result.spec.asset_type: result for result in results}
+
+    def run_many(self, specs: List[AssetSpec], on_step: Optional[Callable] = None,
+                 on_saved: Optional[Callable] = None, on_result: Optional[Callable] = None,
+                 max_in_flight: Optional[int] = None) -> List[AssetResult]:
+        """
+        Like run(), for any number of specs (several may share an asset type).
+        Returns one AssetResult per spec, in order.
+
+        :param on_result: on_result(result) as each spec finishes, saved or failed.
+        :param max_in_flight: Specs in the pipeline at once (default: all). Bulk
+            runs keep this near the scheduler's batch size, so prompts from
+            other jobs on the worker still get into the next batches and
+            finished images don't pile up in memory.
+        """
+        results: List[Optional[AssetResult]] = [None] * len(specs)
+        attempts = [1] * len(specs)
+        pending = {}  # future -> (index, stage, payload)
+        queued = iter(enumerate(specs))
+        limit = max_in_flight or len(specs)
+
+        def fill():
+            while len(pending) < limit:
+                item = next(queued, None)
+                if item is None:
+                    return
+                index, spec = item
+                pending[self._diffuse(spec, on_step)] = (index, "diffuse", None)
+
+        def finish(result, index):
+            results[index] = result
+            if on_result is not None:
+                on_result(result)
+
+        fill()
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                index, stage, payload = pending.pop(future)
+                spec = specs[index]
+                try:
+                    value = future.result()
+                except Exception as e:
+                    if attempts[index] > self.max_retries:
+                        print(f"[ASSET] {spec.asset_type} failed after {attempts[index]} attempt(s): {e}")
+                        finish(AssetResult(spec, None, str(e), attempts[index]), index)
+                        continue
+                    attempts[index] += 1
+                    print(f"[ASSET] {spec.asset_type} {stage} failed ({e}), retrying")
+                    if stage == "diffuse":
+                        pending[self._diffuse(spec, on_step)] = (index, "diffuse", None)
+                    else:
+                        pending[get_cpu_pool().submit(self._process, spec, *payload)] = (index, "process", payload)
+                    continue
+
+                if stage == "diffuse":
+                    pending[get_cpu_pool().submit(self._process, spec, *value)] = (index, "process", value)
+                else:
+                    if on_saved is not None:
+                        on_saved(spec, spec.output_path)
+                    finish(AssetResult(spec, spec.output_path, None, attempts[index], value), index)
+            fill()
+        return results
+
+
+def _then(future, fn):
+    """A Future resolving to fn(future.result()), propagating exceptions."""
+    chained = Future()
+
+    def relay(done):
+        try:
+            chained.set_result(fn(done.result()))
+        except Exception as e:
+            chained.set_exception(e)
+
+    future.add_done_callback(relay)
+    return chained
@@ -0,0 +1,134 @@
+# generator/atlas.py
+
+"""
+Sprite atlases: every sprite of a game packed into one texture.
+
+A game's character, enemy and reward sprites (their pre-scaled, pre-multiplied
+variants, see postprocess.py) plus any animation frames are packed with a
+shelf packer into a single PNG, with a JSON index next to it:
+
+    {"image": "assets/atlases/atlas_<run_id>.png", "size": [w, h], "padding": 1,
+     "frames": {"characters": {"x": 0, "y": 0, "w": 64, "h": 64},
+                "characters/walk/0": {...}, ...}}
+
+Frame names are the asset type for the still sprite and
+"<asset_type>/<animation>/<n>" for animation frames. The engine loads the one
+image and blits subsurfaces of it (engine/atlas.py), so launching a game opens
+and decodes one file instead of one per sprite.
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+from PIL import Image
+
+from generator.postprocess import SPRITE_TYPES, VARIANT_SIZES, variant_path
+
+ATLAS_DIR = Path("assets/atlases")
+# Transparent gutter between frames, so nothing bleeds into a neighbour
+PADDING = 1
+
+
+def pack_shelves(sizes: Dict[str, Tuple[int, int]], width: Optional[int] = None,
+                 padding: int = PADDING) -> Tuple[Dict[str, Tuple[int, int]], Tuple[int, int]]:
+    """
+    Shelf packing: frames sorted by height are laid left to right in rows
+    ("shelves"), starting a new shelf when the next frame doesn't fit.
+
+    :param sizes: {name: (width, height)} of the frames.
+    :param width: Atlas width; by default the smallest power of two that
+        fits the widest frame and makes the atlas roughly square.
+    :param padding: Pixels left between frames.
+    :return: ({name: (x, y)}, (atlas width, atlas height)).
+    """
+    if not sizes:
+        return {}, (0, 0)
+    if width is None:
+        area = sum((w + padding) * (h + padding) for w, h in sizes.values())
+        widest = max(w for w, _ in sizes.values()) + padding
+        width = 1 << math.ceil(math.log2(max(widest, math.sqrt(area))))
+
+    placements = {}
+    x = y = shelf_height = 0
+    # Tallest first keeps shelves tight; names break ties so the layout is stable
+    for name, (w, h) in sorted(sizes.items(), key=lambda item: (-item[1][1], -item[1][0], item[0])):
+        if w > width:
+            raise ValueError(f"Frame {name!r} ({w}px) is wider than the atlas ({width}px)")
+        if x + w > width:
+            x, y = 0, y + shelf_height + padding
+            shelf_height = 0
+        placements[name] = (x, y)
+        x += w + padding
+        shelf_height = max(shelf_height, h)
+    return placements, (width, y + shelf_height)
+
+
+def build_atlas(frames: Dict[str, Union[str, Path, Image.Image]], output_path) -> Dict:
+    """
+    Pack `frames` ({name: image or path}) into `output_path` (PNG) and write
+    its index to the same path with a .json suffix.
+
+    Pixels are copied as they are (no re-blending), so pre-multiplied frames
+    stay pre-multiplied.
+
+    :return: {"image": png path, "index": json path} for the manifest.
+    """
+    images = {name: frame if isinstance(frame, Image.Image) else Image.open(frame)
+              for name, frame in frames.items()}
+    placements, size = pack_shelves({name: image.size for name, image in images.items()})
+
+    atlas = Image.new("RGBA", size, (0, 0, 0, 0))
+    for name, (x, y) in placements.items():
+        atlas.paste(images[name].convert("RGBA"), (x, y))
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    atlas.save(output_path, format="PNG")
+    index_path = output_path.with_suffix(".json")
+    index = {
+        "image": str(output_path).replace("\\", "/"),
+        "size": list(size),
+        "padding": PADDING,
+        "frames": {name: {"x": x, "y": y, "w": images[name].width, "h": images[name].height}
+                   for name, (x, y) in sorted(placements.items())},
+    }
+    with open(index_path, "w") as f:
+        json.dump(index, f, indent=2)
+    print(f"[ATLAS] Packed {len(placements)} frame(s) into {output_path} ({size[0]}x{size[1]})")
+    return {"image": index["image"], "index": str(index_path).replace("\\", "/")}
+
+
+def sprite_frames(records: Dict[str, Dict], animations: Optional[Dict[str, Dict[str, list]]] = None) -> Dict[str, Path]:
+    """
+    Frames for a game's atlas: the draw-size variant of each sprite asset in
+    `records` ({asset_type: manifest record}), plus `animations`
+    ({asset_type: {animation: [frame paths]}}) as "<asset_type>/<animation>/<n>".
+    """
+    frames = {}
+    for asset_type in SPRITE_TYPES:
+        record = records.get(asset_type)
+        if record is None:
+            continue
+        size = VARIANT_SIZES[asset_type][0]
+        variant = record.get("variants", {}).get(f"{size[0]}x{size[1]}")
+        path = Path(variant) if variant else variant_path(record["path"], size)
+        if path.exists():
+            frames[asset_type] = path
+    for asset_type, by_name in (animations or {}).items():
+        for animation, paths in by_name.items():
+            for n, path in enumerate(paths):
+                frames[f"{asset_type}/{animation}/{n}"] = Path(path)
+    return frames
+
+
+def build_game_atlas(records: Dict[str, Dict], run_id: str, atlas_dir=ATLAS_DIR) -> Optional[Dict]:
+    """
+    Atlas of a finished job's sprites (see sprite_frames) as atlas_<run_id>.png,
+    or None if there are none. `run_id` is unique per job, as for asset_specs.
+    """
+    frames = sprite_frames(records)
+    if not frames:
+        return None
+    return build_atlas(frames, Path(atlas_dir) / f"atlas_{run_id}.png")
@@ -0,0 +1,230 @@
+# generator/batch_scheduler.py
+
+"""
+Cross-request micro-batching in front of the diffusion pipeline.
+
+Jobs running at the same time on a worker submit their prompts here instead of
+calling the pipeline themselves. The scheduler waits a short window for more
+prompts to arrive, groups everything with compatible settings (resolution,
+steps, guidance, seed) into one pipeline batch, and hands each image (in
+memory, as a PIL image) back to the job that asked for it through a Future.
+Saving and post-processing happen on the caller's side, so the scheduler
+thread goes straight on to the next batch.
+
+Tune with BATCH_WINDOW_MS and MAX_BATCH_SIZE. `metrics()` reports how long
+prompts waited and how full the batches were; workers publish it after each
+job and the API serves it at /scheduler/stats.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from generator.image_generator import diffuse
+
+DEFAULT_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "50"))
+DEFAULT_MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "8"))
+
+# Keep this many recent samples for the wait/fill metrics
+METRIC_SAMPLES = 1000
+
+
+class BatchSettings(NamedTuple):
+    """Settings that must match for prompts to share a pipeline call."""
+    guidance_scale: float = 7.5
+    num_inference_steps: int = 50
+    height: Optional[int] = None
+    width: Optional[int] = None
+    seed: Optional[int] = None
+
+
+class _Pending(NamedTuple):
+    prompt: str
+    settings: BatchSettings
+    future: Future
+    submitted_at: float
+    index: int  # Position within the caller's submit_many
+    on_step: Optional[Callable]
+
+
+def _percentile(samples: Sequence[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class BatchScheduler:
+    """
+    Collects prompts from concurrent jobs and runs them as shared batches.
+
+    :param window_ms: How long the oldest waiting prompt may wait for others.
+    :param max_batch_size: Prompts per pipeline call. A full group is sent
+        immediately without waiting for the window.
+    :param generate: Batch function with the image_generator.diffuse signature.
+    """
+
+    def __init__(self, window_ms: float = DEFAULT_WINDOW_MS, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 generate=diffuse):
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._generate = generate
+        self._groups: Dict[BatchSettings, List[_Pending]] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._waits = deque(maxlen=METRIC_SAMPLES)
+        self._fills = deque(maxlen=METRIC_SAMPLES)
+        self._prompts_done = 0
+        self._batches_done = 0
+
+        self._thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit_many(self, prompts: Sequence[str], on_step: Optional[Callable] = None,
+                    **settings) -> List[Future]:
+        """
+        Queue prompts together (so they are never split by the window) and
+        return one Future per prompt, resolving to its PIL image.
+
+        `on_step(index, step, total_steps, latent)` is called with each prompt's
+        index in this call, whichever batch it lands in.
+        """
+        key = BatchSettings(**settings)
+        now = time.monotonic()
+        futures = []
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Batch scheduler is closed")
+            group = self._groups.setdefault(key, [])
+            for index, prompt in enumerate(prompts):
+                future = Future()
+                group.append(_Pending(prompt, key, future, now, index, on_step))
+                futures.append(future)
+            self._cond.notify()
+        return futures
+
+    def submit(self, prompt: str, **kwargs) -> Future:
+        return self.submit_many([prompt], **kwargs)[0]
+
+    def generate(self, prompts: Sequence[str], **kwargs) -> List:
+        """Blocking drop-in for diffuse() that shares batches with other callers."""
+        return [future.result() for future in self.submit_many(prompts, **kwargs)]
+
+    def _next_batch(self) -> Optional[List[_Pending]]:
+        # Caller holds self._cond. Returns a batch that is due, or None.
+        if not self._groups:
+            return None
+        now = time.monotonic()
+        due_key = None
+        for key, group in self._groups.items():
+            if len(group) >= self.max_batch_size or self._closed or now - group[0].submitted_at >= self.window:
+                if due_key is None or group[0].submitted_at < self._groups[due_key][0].submitted_at:
+                    due_key = key
+        if due_key is None:
+            return None
+
+        group = self._groups[due_key]
+        batch, rest = group[:self.max_batch_size], group[self.max_batch_size:]
+        if rest:
+            self._groups[due_key] = rest
+        else:
+            del self._groups[due_key]
+        return batch
+
+    def _time_until_due(self) -> Optional[float]:
+        # Caller holds self._cond
+        if not self._groups:
+            return None
+        oldest = min(group[0].submitted_at for group in self._groups.values())
+        return max(0.0, oldest + self.window - time.monotonic())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                batch = self._next_batch()
+                while batch is None:
+                    if self._closed and not self._groups:
+                        return
+                    self._cond.wait(self._time_until_due())
+                    batch = self._next_batch()
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[_Pending]):
+        started = time.monotonic()
+        settings = batch[0].settings._asdict()
+        waits = [started - item.submitted_at for item in batch]
+        print(f"[BATCH] {len(batch)}/{self.max_batch_size} prompts, oldest waited {max(waits) * 1000:.0f}ms")
+
+        def on_step(indices, step, total_steps, latents):
+            for row, i in enumerate(indices):
+                item = batch[i]
+                if item.on_step is None:
+                    continue
+                # One caller's failing callback must not fail the others' prompts
+                try:
+                    item.on_step(item.index, step, total_steps, latents[row] if latents is not None else None)
+                except Exception as e:
+                    print(f"[BATCH] Step callback for {item.prompt!r} failed: {e}")
+
+        wants_steps = any(item.on_step is not None for item in batch)
+        try:
+            images = self._generate(
+                [item.prompt for item in batch],
+                batch_size=len(batch),
+                on_step=on_step if wants_steps else None,
+                **settings,
+            )
+        except Exception as e:
+            for item in batch:
+                item.future.set_exception(e)
+        else:
+            for item, image in zip(batch, images):
+                item.future.set_result(image)
+
+        with self._cond:
+            self._waits.extend(waits)
+            self._fills.append(len(batch) / self.max_batch_size)
+            self._prompts_done += len(batch)
+            self._batches_done += 1
+
+    def metrics(self) -> Dict:
+        """Queue-wait (seconds) and batch-fill (fraction of max_batch_size) stats."""
+        with self._cond:
+            waits, fills = list(self._waits), list(self._fills)
+            pending = sum(len(group) for group in self._groups.values())
+            return {
+                "prompts": self._prompts_done,
+                "batches": self._batches_done,
+                "pending": pending,
+                "queue_wait_mean": sum(waits) / len(waits) if waits else 0.0,
+                "queue_wait_p50": _percentile(waits, 0.50),
+                "queue_wait_p95": _percentile(waits, 0.95),
+                "batch_fill_mean": sum(fills) / len(fills) if fills else 0.0,
+                "window_ms": self.window * 1000,
+                "max_batch_size": self.max_batch_size,
+            }
+
+    def close(self):
+        """Flush everything still queued, then stop the scheduler thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+
+_scheduler: Optional[BatchScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> BatchScheduler:
+    """The process-wide scheduler, started on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = BatchScheduler()
+        return _scheduler
@@ -0,0 +1,135 @@
+# generator/bulk.py
+
+"""
+Bulk generation: one asset type, many subjects, a matrix of styles.
+
+A batch is a list of subjects (e.g. every line of fantasy_background_prompts.txt)
+crossed with a list of styles. Each (subject, style) pair is composed into a
+diffusion prompt exactly as a game's assets are. Composed prompts that come out
+identical (repeated lines, subjects differing only in case or spacing) are
+generated once. The batch then runs through the AssetPipeline with a bounded
+number of specs in flight, so it shares diffusion batches with whatever else
+is running on the worker instead of taking the GPU over.
+
+The /generate-batch endpoint (via worker.run_batch_generation) and
+generate_batch.py both plan and run batches through here.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from generator.asset_pipeline import (ASSET_TYPES, FILE_PREFIXES, AssetPipeline, AssetResult, AssetSpec,
+                                      compose_prompt)
+from generator.batch_scheduler import DEFAULT_MAX_BATCH_SIZE
+
+STYLES = ("pixel", "cartoon", "realistic")
+MAX_BATCH_PROMPTS = int(os.getenv("MAX_BATCH_PROMPTS", "2000"))
+# Specs in the pipeline at once: enough to fill two diffusion batches
+BULK_IN_FLIGHT = int(os.getenv("BULK_IN_FLIGHT", str(2 * DEFAULT_MAX_BATCH_SIZE)))
+
+
+class BatchPlan(NamedTuple):
+    specs: List[AssetSpec]
+    styles: List[str]  # Style of each spec
+    requested: int  # subjects x styles, before deduplication
+
+    @property
+    def duplicates(self) -> int:
+        return self.requested - len(self.specs)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def plan_batch(subjects: Sequence[str], asset_type: str = "backgrounds", styles: Sequence[str] = STYLES,
+               white_bg: bool = True, output_dir="assets/batches") -> BatchPlan:
+    """
+    One AssetSpec per distinct composed prompt, saved as
+    <output_dir>/<asset_type>/<prefix>_<style>_<n>.png.
+
+    :param subjects: Descriptions to generate; blank ones are ignored.
+    :param asset_type: One of ASSET_TYPES; picks the prompt template.
+    :param styles: Styles to cross every subject with.
+    :param white_bg: Ask for a white background (characters and enemies).
+    """
+    if asset_type not in ASSET_TYPES:
+        raise ValueError(f"Unknown asset type {asset_type!r} (expected one of {ASSET_TYPES})")
+    unknown = [style for style in styles if style not in STYLES]
+    if unknown:
+        raise ValueError(f"Unknown style(s) {unknown} (expected some of {STYLES})")
+    subjects = [subject.strip() for subject in subjects if subject.strip()]
+
+    specs, spec_styles, seen = [], [], set()
+    directory = Path(output_dir) / asset_type
+    for style in dict.fromkeys(styles):
+        for subject in subjects:
+            prompt = compose_prompt(asset_type, subject, style, white_bg)
+            if _normalize(prompt) in seen:
+                continue
+            seen.add(_normalize(prompt))
+            name = f"{FILE_PREFIXES[asset_type]}_{style}_{len(specs)}.png"
+            specs.append(AssetSpec(asset_type, prompt, str(directory / name)))
+            spec_styles.append(style)
+    return BatchPlan(specs, spec_styles, len(subjects) * len(styles))
+
+
+class BatchProgress:
+    """Thread-safe counters for a running batch, with throughput and an ETA."""
+
+    def __init__(self, total: int, duplicates: int = 0):
+        self.total = total
+        self.duplicates = duplicates
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, result: AssetResult):
+        with self._lock:
+            if result.error is None:
+                self.done += 1
+            else:
+                self.failed += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            finished = self.done + self.failed
+            elapsed = time.monotonic() - self.started
+        rate = finished / elapsed if elapsed > 0 else 0.0
+        return {
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "duplicates": self.duplicates,
+            "elapsed_seconds": round(elapsed, 2),
+            "images_per_second": round(rate, 3),
+            "eta_seconds": round((self.total - finished) / rate, 1) if rate > 0 else None,
+        }
+
+
+def run_batch(plan: BatchPlan, on_result: Optional[Callable] = None, on_step: Optional[Callable] = None,
+              pipeline: Optional[AssetPipeline] = None,
+              max_in_flight: int = BULK_IN_FLIGHT) -> Tuple[List[AssetResult], BatchProgress]:
+    """
+    Generate every spec of a plan. Returns one AssetResult per spec, in
+    order, and the final progress counters.
+
+    :param on_result: on_result(result, progress) as each asset finishes, saved or failed.
+    :param on_step: Passed on to the pipeline (per denoising step).
+    :param pipeline: AssetPipeline to use (default: a new one on the shared scheduler).
+    :param max_in_flight: Specs in the pipeline at once.
+    """
+    progress = BatchProgress(len(plan.specs), plan.duplicates)
+
+    def finished(result):
+        progress.record(result)
+        if on_result is not None:
+            on_result(result, progress)
+
+    pipeline = pipeline or AssetPipeline()
+    results = pipeline.run_many(plan.specs, on_step=on_step, on_result=finished, max_in_flight=max_in_flight)
+    return results, progress
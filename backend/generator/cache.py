@@ -0,0 +1,294 @@
+# generator/cache.py
+
+"""
+Content-addressed cache of generated images.
+
+Each entry is keyed by a hash of everything that decides what the pipeline
+produces: the composed prompt, seed, guidance scale, step count and the model
+fingerprint. Repeat requests are served by hard-linking the stored PNG to the
+requested output path (falling back to a copy across filesystems) instead of
+running diffusion again. The cache is bounded in bytes and evicts the least
+recently used entries; recency is kept in file mtimes so it survives restarts
+and is shared by every process using the same directory.
+
+Hit/miss/store/eviction counters live in a small SQLite file in the same
+directory (counters.db), so stats() in the API process includes the lookups
+made by the GPU worker processes. Each process adds up its counts in memory
+and writes them at most once per COUNTER_FLUSH_SECONDS, outside the cache lock.
+"""
+
+import atexit
+import functools
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+DEFAULT_CACHE_DIR = os.getenv("GAME_ASSET_CACHE_DIR", "cache/generations")
+DEFAULT_CACHE_MB = int(os.getenv("GAME_ASSET_CACHE_MB", "2048"))
+COUNTERS_FILE = "counters.db"
+COUNTER_NAMES = ("hits", "misses", "stores", "evictions")
+COUNTER_FLUSH_SECONDS = 1.0
+
+
+def cache_key(prompt: str, seed: Optional[int], guidance_scale: float, num_inference_steps: int,
+              model_fingerprint: str, **settings) -> str:
+    """Stable hex digest identifying one generation request."""
+    payload = {
+        "prompt": prompt,
+        "seed": seed,
+        "guidance_scale": float(guidance_scale),
+        "num_inference_steps": int(num_inference_steps),
+        "model": model_fingerprint,
+    }
+    # Unset optional settings (e.g. default height/width) don't change the key
+    payload.update({name: value for name, value in settings.items() if value is not None})
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _link_or_copy(src: Path, dst: Path):
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Different filesystem, or links not supported (e.g. some Windows shares)
+        shutil.copyfile(src, dst)
+
+
+def _flushes_counters(method):
+    # Write the counts a cache operation made once it has released the lock
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._flush_counts()
+    return wrapper
+
+
+class GenerationCache:
+    """
+    Size-bounded LRU store of generated PNGs.
+
+    :param root: Directory holding the cached images (created on demand).
+    :param max_bytes: Evict least recently used entries above this total size.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MB * 1024 * 1024):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> size, LRU first
+        self._total_bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pending: Dict[str, int] = {}  # Counts not yet in counters.db (guarded by self._lock)
+        self._last_flush = 0.0
+        atexit.register(self._flush_counts, True)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.png"
+
+    def _load_index(self):
+        # Caller holds self._lock
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.root.exists():
+            return
+        found = []
+        for path in self.root.glob("*/*.png"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            found.append((stat.st_mtime, path.stem, stat.st_size))
+        for _mtime, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    # --- Shared counters ---
+
+    def _counters_db(self, create: bool = True) -> Optional[sqlite3.Connection]:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        path = self.root / COUNTERS_FILE
+        if not create and not path.exists():
+            return None
+        self.root.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, name: str, amount: int = 1):
+        # Caller holds self._lock; _flush_counts writes it out later
+        self._pending[name] = self._pending.get(name, 0) + amount
+
+    def _flush_counts(self, force: bool = False):
+        # Must not be called with self._lock held
+        now = time.monotonic()
+        with self._lock:
+            if not self._pending or (not force and now - self._last_flush < COUNTER_FLUSH_SECONDS):
+                return
+            pending, self._pending = self._pending, {}
+            self._last_flush = now
+        try:
+            with self._counters_db() as conn:
+                conn.executemany(
+                    "INSERT INTO counters (name, value) VALUES (?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                    list(pending.items()),
+                )
+        except sqlite3.Error as e:
+            # Statistics must never fail a generation
+            print(f"[CACHE] Could not update the counters: {e}")
+
+    def counters(self) -> Dict[str, int]:
+        """Hits, misses, stores and evictions of every process sharing this directory."""
+        self._flush_counts(force=True)
+        counts = dict.fromkeys(COUNTER_NAMES, 0)
+        conn = self._counters_db(create=False)
+        if conn is not None:
+            counts.update(conn.execute("SELECT name, value FROM counters").fetchall())
+        return counts
+
+    def _forget(self, key: str):
+        # Caller holds self._lock
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    @_flushes_counters
+    def fetch(self, key: str, output_path) -> bool:
+        """
+        Materialise the cached image for `key` at `output_path`.
+        Returns False (and counts a miss) when there is no entry.
+        """
+        path = self._path(key)
+        with self._lock:
+            self._load_index()
+            try:
+                _link_or_copy(path, Path(output_path))
+                os.utime(path)  # Mark as recently used for other processes too
+            except FileNotFoundError:
+                # Not cached, or evicted by another process sharing the directory
+                self._forget(key)
+                self._count("misses")
+                return False
+
+            if key not in self._entries:
+                # Stored by another process since we built the index
+                size = path.stat().st_size
+                self._entries[key] = size
+                self._total_bytes += size
+            self._entries.move_to_end(key)
+            self._count("hits")
+            return True
+
+    @_flushes_counters
+    def lookup(self, key: str) -> Optional[Path]:
+        """Path of the cached image for `key` (counted as a hit), or None (a miss)."""
+        path = self._path(key)
+        with self._lock:
+            self._load_index()
+            try:
+                os.utime(path)
+                size = path.stat().st_size
+            except FileNotFoundError:
+                self._forget(key)
+                self._count("misses")
+                return None
+            if key not in self._entries:
+                self._entries[key] = size
+                self._total_bytes += size
+            self._entries.move_to_end(key)
+            self._count("hits")
+            return path
+
+    @_flushes_counters
+    def store_image(self, key: str, image):
+        """Encode an in-memory PIL image straight into the cache."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write under a temporary name so other processes never see half a PNG
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        image.save(tmp_path, format="PNG")
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._load_index()
+            self._forget(key)
+            self._entries[key] = path.stat().st_size
+            self._total_bytes += self._entries[key]
+            self._count("stores")
+            self._evict_over_budget()
+
+    @_flushes_counters
+    def store(self, key: str, image_path):
+        """Add a freshly generated image to the cache, evicting old entries if needed."""
+        path = self._path(key)
+        with self._lock:
+            self._load_index()
+            _link_or_copy(Path(image_path), path)
+            self._forget(key)
+            self._entries[key] = path.stat().st_size
+            self._total_bytes += self._entries[key]
+            self._count("stores")
+            self._evict_over_budget()
+
+    def _evict_over_budget(self):
+        # Caller holds self._lock
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, _size = next(iter(self._entries.items()))
+            self._forget(key)
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+            self._count("evictions")
+
+    def stats(self) -> Dict:
+        """Counters plus the size of the directory. Walks the directory: keep it off the event loop."""
+        counts = self.counters()
+        lookups = counts["hits"] + counts["misses"]
+        # Size from the directory itself: other processes store and evict too
+        sizes = []
+        for path in self.root.glob("*/*.png"):
+            try:
+                sizes.append(path.stat().st_size)
+            except FileNotFoundError:
+                continue
+        return {
+            **counts,
+            "hit_rate": counts["hits"] / lookups if lookups else 0.0,
+            "entries": len(sizes),
+            "bytes": sum(sizes),
+            "max_bytes": self.max_bytes,
+        }
+
+_cache: Optional[GenerationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[GenerationCache]:
+    """The process-wide cache, or None when disabled with GAME_ASSET_CACHE_MB=0."""
+    global _cache
+    if DEFAULT_CACHE_MB <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = GenerationCache()
+        return _cache
@@ -0,0 +1,293 @@
+# generator/caption_index.py
+
+"""
+Incremental caption index for fine-tuning data.
+
+Captions arrive in several shapes: image + .txt pairs in a directory (what
+txt-to-json.py turned into captions.json), captions.json itself (a dict keyed
+by file name) and the dataset builder's game_creatures.json / .jsonl (lists
+of {"image", "text", "prompt"}). All of them go into one SQLite table with a
+row per image and source:
+
+    image  absolute path (key) | text  caption | prompt  generation prompt, if any
+    source .txt or JSON file the caption came from, plus the mtime and size of
+    the image and of its source, so a rescan only re-reads what changed
+
+Directories are listed with os.scandir and .txt files read on a thread pool.
+Pairs whose image and caption both still have the recorded mtime and size are
+skipped without opening anything; rows whose files are gone are dropped. Scans
+and imports only ever replace their own source's rows, so an image captioned
+by several sources keeps one row each and rerunning either is a no-op. Readers
+get one caption per image: the .txt next to it if there is one, otherwise the
+most recently imported caption file's. Readers stream rows from a cursor (iter_entries), so the whole index never has
+to be in memory.
+
+    python -m generator.caption_index scan C:/nus_adv/train
+    python -m generator.caption_index import game_creatures.json captions.json
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_INDEX_PATH = os.getenv("CAPTION_INDEX", "captions.db")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+SCAN_WORKERS = int(os.getenv("CAPTION_SCAN_WORKERS", "8"))
+FETCH_ROWS = 256  # Rows per fetchmany when streaming
+SCHEMA_VERSION = 2  # 1 keyed rows by image alone
+
+
+def _stamp(stat) -> Tuple[int, int]:
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _list_dir(path: str):
+    """(images, captions, subdirectories) of one directory; images/captions map stem -> (path, stamp)."""
+    images, captions, subdirs = {}, {}, []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+                continue
+            stem, ext = os.path.splitext(entry.name)
+            ext = ext.lower()
+            if ext in IMAGE_EXTENSIONS:
+                images[stem] = (entry.path, _stamp(entry.stat()))
+            elif ext == ".txt":
+                captions[stem] = (entry.path, _stamp(entry.stat()))
+    return images, captions, subdirs
+
+
+def _read_caption(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+class CaptionIndex:
+    """
+    Caption rows in a SQLite file.
+
+    :param path: Index file (created on demand).
+    :param workers: Threads used to list directories and read caption files.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH, workers: int = SCAN_WORKERS):
+        self.path = path
+        self.workers = workers
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            # Derived data: rebuild rather than migrate
+            with self.conn:
+                self.conn.execute("DROP TABLE IF EXISTS captions")
+                self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS captions (
+                image TEXT NOT NULL,
+                text TEXT NOT NULL,
+                prompt TEXT,
+                source TEXT NOT NULL,
+                image_mtime_ns INTEGER,
+                image_size INTEGER,
+                source_mtime_ns INTEGER,
+                source_size INTEGER,
+                PRIMARY KEY (image, source)
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS captions_source ON captions (source)")
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(DISTINCT image) FROM captions").fetchone()[0]
+
+    def _stamps(self, where: str, args) -> Dict[str, Tuple]:
+        """image -> (source, image mtime, image size, source mtime, source size) of the matching rows."""
+        rows = self.conn.execute(
+            f"SELECT image, source, image_mtime_ns, image_size, source_mtime_ns, source_size FROM captions "
+            f"WHERE {where}", args
+        )
+        return {row[0]: tuple(row[1:]) for row in rows}
+
+    # --- Image + .txt pairs ---
+
+    def scan(self, root) -> Dict[str, int]:
+        """
+        Index every image + .txt pair under `root`. Returns counts of added,
+        updated, unchanged, removed and uncaptioned images.
+        """
+        root = os.path.abspath(root)
+        images, captions = {}, {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="caption-scan") as pool:
+            # Breadth-first, one scandir task per directory
+            pending = deque([pool.submit(_list_dir, root)])
+            while pending:
+                listing = pending.popleft().result()
+                dir_images, dir_captions, subdirs = listing
+                for stem, (path, stamp) in dir_images.items():
+                    images[path] = stamp
+                    if stem in dir_captions:
+                        captions[path] = dir_captions[stem]
+                pending.extend(pool.submit(_list_dir, subdir) for subdir in subdirs)
+
+            # Only pairs whose image or caption changed are read. Rows from
+            # imported caption files are left alone.
+            prefix = os.path.join(root, "")
+            known = {path: stamp for path, stamp in self._stamps("source LIKE '%.txt'", ()).items()
+                     if path.startswith(prefix)}
+            changed = [path for path, (source, source_stamp) in captions.items()
+                       if known.get(path) != (source, *images[path], *source_stamp)]
+            texts = pool.map(lambda path: _read_caption(captions[path][0]), changed)
+            rows = [(path, text, None, captions[path][0], *images[path], *captions[path][1])
+                    for path, text in zip(changed, texts)]
+
+        removed = [path for path in known if path not in captions]
+        # Rows left behind by a renamed caption file (e.g. a.TXT -> a.txt)
+        stale = [(path, known[path][0]) for path in changed if path in known and known[path][0] != captions[path][0]]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO captions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.executemany("DELETE FROM captions WHERE image = ? AND source = ?",
+                                  stale + [(path, known[path][0]) for path in removed])
+
+        counts = {
+            "added": sum(1 for path in changed if path not in known),
+            "updated": sum(1 for path in changed if path in known),
+            "unchanged": len(captions) - len(changed),
+            "removed": len(removed),
+            "uncaptioned": len(images) - len(captions),
+        }
+        print(f"[INDEX] {root}: {counts['added']} added, {counts['updated']} updated, "
+              f"{counts['unchanged']} unchanged, {counts['removed']} removed, "
+              f"{counts['uncaptioned']} image(s) without a caption")
+        return counts
+
+    # --- JSON / JSONL caption files ---
+
+    def import_file(self, caption_file, base_dir: Optional[str] = None) -> int:
+        """
+        Index a caption file: a dict {file name: caption}, a list of
+        {"image", "text", "prompt"} records, or JSONL of those records. Relative
+        image paths are taken from `base_dir` (default: the current directory).
+        Skipped if the file hasn't changed since it was last imported. Returns
+        the number of rows written.
+        """
+        source = os.path.abspath(caption_file)
+        stamp = _stamp(os.stat(source))
+        known = self._stamps("source = ?", (source,))
+        if known and all(row[3:] == stamp for row in known.values()):
+            print(f"[INDEX] {caption_file}: unchanged, {len(known)} caption(s)")
+            return 0
+
+        rows = []
+        for image, text, prompt in read_records(source):
+            path = os.path.abspath(os.path.join(base_dir or ".", os.path.normpath(image)))
+            try:
+                image_stamp = _stamp(os.stat(path))
+            except FileNotFoundError:
+                image_stamp = (None, None)
+            rows.append((path, text, prompt, source, *image_stamp, *stamp))
+
+        # Only this file's rows are replaced; captions from .txt pairs or other files stay
+        with self.conn:
+            self.conn.execute("DELETE FROM captions WHERE source = ?", (source,))
+            self.conn.executemany("INSERT OR REPLACE INTO captions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        print(f"[INDEX] {caption_file}: {len(rows)} caption(s) imported")
+        return len(rows)
+
+    # --- Reading ---
+
+    def iter_entries(self, existing_only: bool = True) -> Iterator[Dict]:
+        """
+        Stream one {"image", "text", "prompt"} per image in image order,
+        optionally skipping missing images. An image's .txt caption wins over
+        caption files, then the most recently imported file (highest rowid).
+        """
+        cursor = self.conn.execute(
+            "SELECT image, text, prompt FROM captions "
+            "ORDER BY image, source LIKE '%.txt' DESC, rowid DESC"
+        )
+        previous = None
+        while True:
+            rows = cursor.fetchmany(FETCH_ROWS)
+            if not rows:
+                return
+            for image, text, prompt in rows:
+                if image == previous:
+                    continue
+                previous = image
+                if existing_only and not os.path.exists(image):
+                    print(f"Missing image: {image}")
+                    continue
+                yield {"image": image, "text": text, "prompt": prompt}
+
+
+def read_records(path: str) -> List[Tuple[str, str, Optional[str]]]:
+    """(image, caption, prompt) from any of the caption file formats, image paths as written."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            records = []
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # Torn last line of an interrupted build
+        else:
+            records = json.load(f)
+    if isinstance(records, dict):
+        return [(image, text, None) for image, text in records.items()]
+    return [(record["image"], record["text"], record.get("prompt")) for record in records]
+
+
+def iter_entries(caption_file, base_dir: Optional[str] = None) -> Iterator[Dict]:
+    """
+    {"image", "text", "prompt"} for each existing image of a caption index
+    (.db) or caption file, whatever its format; relative image paths are
+    resolved from `base_dir`.
+    """
+    if caption_file.endswith(".db"):
+        index = CaptionIndex(caption_file)
+        try:
+            yield from index.iter_entries()
+        finally:
+            index.close()
+        return
+    for image, text, prompt in read_records(caption_file):
+        path = os.path.join(base_dir or ".", os.path.normpath(image))
+        if os.path.exists(path):
+            yield {"image": path, "text": text, "prompt": prompt}
+        else:
+            print(f"Missing image: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the caption index.")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Index file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    scan = commands.add_parser("scan", help="Index image + .txt caption pairs under directories")
+    scan.add_argument("dirs", nargs="+")
+    imports = commands.add_parser("import", help="Index captions.json / game_creatures.json(l) files")
+    imports.add_argument("files", nargs="+")
+    imports.add_argument("--base-dir", help="Directory relative image paths are resolved from")
+    args = parser.parse_args()
+
+    index = CaptionIndex(args.index)
+    if args.command == "scan":
+        for directory in args.dirs:
+            index.scan(directory)
+    else:
+        for caption_file in args.files:
+            index.import_file(caption_file, args.base_dir)
+    print(f"[INDEX] {args.index}: {len(index)} caption(s)")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# generator/dataset_builder.py
+
+"""
+Streaming builder for the captioned fine-tuning datasets (creatures, backgrounds).
+
+Two stages run at the same time:
+
+    prompts -> diffusion, a batch of prompts per call (calling thread)
+            -> bounded queue
+            -> BLIP captions, a batch of in-memory images per call + PNG saves (consumer thread)
+            -> one JSONL line per finished image
+
+Images never make a round trip through the disk before captioning. While one
+batch is being captioned and saved, the next is already denoising, and the
+queue's bound keeps generation from running ahead of captioning.
+
+A line is appended (and flushed) only after its PNG is written, so the JSONL
+is always a list of complete entries. A rerun reads it and skips every prompt
+that already has an entry and an image, so an interrupted build picks up where
+it stopped. When the run ends, the JSONL is also exported as the JSON array
+the fine-tuning script reads.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from generator.asset_pipeline import get_cpu_pool, save
+
+CAPTION_MODEL_ID = os.getenv("CAPTION_MODEL", "Salesforce/blip-image-captioning-base")
+GEN_BATCH_SIZE = int(os.getenv("DATASET_GEN_BATCH", "4"))
+CAPTION_BATCH_SIZE = int(os.getenv("DATASET_CAPTION_BATCH", "8"))
+QUEUE_DEPTH = 2  # Generated batches waiting for captions before generation blocks
+
+
+class DatasetSpec(NamedTuple):
+    name: str
+    prompt_file: str  # One theme per line
+    template: str  # Diffusion prompt, with {theme}
+    prefix: str  # Images are saved as <prefix>_<line>.png
+    output_dir: str
+    dataset_file: str  # JSONL written as entries finish; exported to the .json next to it
+
+
+DATASETS = {
+    "creatures": DatasetSpec(
+        "creatures", "fantasy_creature_prompts.txt",
+        "{theme}, 2D stylized realism, game creature, isolated on white background",
+        "creature", "outputs", "outputs/game_creatures.jsonl",
+    ),
+    "backgrounds": DatasetSpec(
+        "backgrounds", "fantasy_background_prompts.txt",
+        "{theme}, 2D stylized realism, game background",
+        "bg", "outputs", "outputs/game_backgrounds.jsonl",
+    ),
+}
+
+
+class PromptItem(NamedTuple):
+    index: int  # Line in the prompt file, used for the file name
+    prompt: str
+    image_path: str
+
+
+def load_prompts(file_path) -> List[str]:
+    with open(file_path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+# --- JSONL ---
+
+def read_entries(dataset_file) -> Dict[str, Dict]:
+    """Entries already in a dataset file, by prompt. A torn last line (killed mid-write) is ignored."""
+    entries = {}
+    if not os.path.exists(dataset_file):
+        return entries
+    with open(dataset_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            entries[entry["prompt"]] = entry
+    return entries
+
+
+def export_json(dataset_file, json_file=None) -> str:
+    """Write the JSONL's entries as one JSON array (the format dreambooth_ft reads)."""
+    json_file = json_file or str(Path(dataset_file).with_suffix(".json"))
+    entries = list(read_entries(dataset_file).values())
+    tmp = f"{json_file}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2)
+    os.replace(tmp, json_file)
+    return json_file
+
+
+# --- Captioning ---
+
+_captioner = None
+_captioner_lock = threading.Lock()
+
+
+def get_captioner(model_id: str = CAPTION_MODEL_ID):
+    """BLIP image-to-text pipeline, loaded on first use."""
+    global _captioner
+    with _captioner_lock:
+        if _captioner is None:
+            from transformers import pipeline
+
+            from generator.model_registry import default_device
+
+            device = default_device()
+            print(f"[INFO] Loading caption model {model_id} on {device}")
+            _captioner = pipeline("image-to-text", model=model_id, device=device)
+        return _captioner
+
+
+def blip_captions(images, batch_size: int = CAPTION_BATCH_SIZE) -> List[str]:
+    """One caption per PIL image, captioned `batch_size` at a time."""
+    results = get_captioner()(list(images), batch_size=batch_size)
+    return [result[0]["generated_text"] for result in results]
+
+
+# --- Builder ---
+
+class DatasetBuilder:
+    """
+    Generates, captions and records every not-yet-done prompt of a dataset.
+
+    :param spec: Which dataset (see DATASETS).
+    :param pipe: Diffusion pipeline called with a list of prompts.
+    :param caption: images -> captions (default: batched BLIP).
+    :param gen_batch_size: Prompts per diffusion call.
+    :param caption_batch_size: Images per caption call.
+    :param settings: Extra diffusion arguments (num_inference_steps, guidance_scale, ...).
+    """
+
+    def __init__(self, spec: DatasetSpec, pipe, caption: Optional[Callable] = None,
+                 gen_batch_size: int = GEN_BATCH_SIZE, caption_batch_size: int = CAPTION_BATCH_SIZE, **settings):
+        self.spec = spec
+        self.pipe = pipe
+        self.caption = caption or (lambda images: blip_captions(images, caption_batch_size))
+        self.gen_batch_size = max(1, gen_batch_size)
+        self.caption_batch_size = max(1, caption_batch_size)
+        self.settings = settings
+        self.written = 0
+        self.failed = 0
+
+    def pending(self) -> List[PromptItem]:
+        """Prompts with no entry yet, or whose image has gone missing."""
+        spec = self.spec
+        done = read_entries(spec.dataset_file)
+        items = []
+        for i, theme in enumerate(load_prompts(spec.prompt_file)):
+            prompt = spec.template.format(theme=theme)
+            image_path = f"./{Path(spec.output_dir).as_posix()}/{spec.prefix}_{i}.png"
+            entry = done.get(prompt)
+            if entry is None or not os.path.exists(entry["image"]):
+                items.append(PromptItem(i, prompt, image_path))
+        return items
+
+    def run(self) -> Dict:
+        """Build the dataset; returns counts and throughput."""
+        spec = self.spec
+        items = self.pending()
+        total = len(load_prompts(spec.prompt_file))
+        print(f"[DATASET] {spec.name}: {total - len(items)}/{total} done, {len(items)} to generate")
+        Path(spec.dataset_file).parent.mkdir(parents=True, exist_ok=True)
+
+        started = time.perf_counter()
+        if items:
+            generated = queue.Queue(maxsize=QUEUE_DEPTH)
+            consumer = threading.Thread(target=self._consume, args=(generated,), name="dataset-caption", daemon=True)
+            consumer.start()
+            try:
+                for start in range(0, len(items), self.gen_batch_size):
+                    batch = items[start:start + self.gen_batch_size]
+                    try:
+                        images = self.pipe([item.prompt for item in batch], **self.settings).images
+                    except Exception as e:
+                        # Left out of the JSONL, so the next run retries them
+                        print(f"[WARN] Generation failed for {len(batch)} prompt(s): {e}")
+                        self.failed += len(batch)
+                        continue
+                    _put(generated, list(zip(batch, images)), consumer)
+            finally:
+                _put(generated, None, consumer)
+                consumer.join()
+
+        elapsed = time.perf_counter() - started
+        json_file = export_json(spec.dataset_file)
+        rate = self.written / elapsed if elapsed > 0 else 0.0
+        print(f"[DATASET] {spec.name}: {self.written} written, {self.failed} failed "
+              f"in {elapsed:.1f}s ({rate:.2f} images/s) -> {json_file}")
+        return {"written": self.written, "failed": self.failed, "skipped": total - len(items),
+                "seconds": elapsed, "images_per_second": rate}
+
+    def _consume(self, generated: queue.Queue):
+        # Collects generated images into caption-sized batches; None means generation is done
+        buffered = []
+        with open(self.spec.dataset_file, "a+", encoding="utf-8") as out:
+            # Start on a fresh line if the last run was killed mid-write
+            if out.tell() > 0:
+                out.seek(out.tell() - 1)
+                if out.read(1) != "\n":
+                    out.write("\n")
+            while True:
+                batch = generated.get()
+                if batch is not None:
+                    buffered.extend(batch)
+                while len(buffered) >= self.caption_batch_size or (batch is None and buffered):
+                    chunk, buffered = buffered[:self.caption_batch_size], buffered[self.caption_batch_size:]
+                    self._finish(chunk, out)
+                if batch is None:
+                    return
+
+    def _finish(self, chunk, out):
+        # PNG encoding runs on the CPU pool while BLIP captions the same images
+        saves = [get_cpu_pool().submit(save, image, item.image_path) for item, image in chunk]
+        try:
+            captions = self.caption([image for _, image in chunk])
+        except Exception as e:
+            print(f"[WARN] Captioning failed for {len(chunk)} image(s): {e}")
+            captions = [None] * len(chunk)
+
+        for (item, _), saved, caption in zip(chunk, saves, captions):
+            try:
+                saved.result()
+            except Exception as e:
+                print(f"[WARN] Could not save {item.image_path}: {e}")
+                caption = None
+            if caption is None:
+                self.failed += 1
+                continue
+            out.write(json.dumps({"image": item.image_path, "text": caption, "prompt": item.prompt}) + "\n")
+            self.written += 1
+            print(f"[{item.index + 1}] Generated: {caption}")
+        out.flush()
+
+
+def _put(q: queue.Queue, item, consumer: threading.Thread):
+    """Blocking put that gives up if the consumer thread has died (nothing would ever drain the queue)."""
+    while consumer.is_alive():
+        try:
+            q.put(item, timeout=1.0)
+            return
+        except queue.Full:
+            continue
+    raise RuntimeError("Caption stage stopped unexpectedly")
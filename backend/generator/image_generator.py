@@ -1,25 +1,274 @@
 # generator/image_generator.py
 
-from diffusers import StableDiffusionPipeline
-import torch
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence
+
 from PIL import Image
 
-# Load pipeline globally once to avoid slow repeat loads
-pipe = StableDiffusionPipeline.from_pretrained(
-    "C:/nus_adv/output_model",
-    torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-    revision="fp16" if torch.cuda.is_available() else None
-)
+from generator.cache import cache_key, get_cache
+from generator.model_registry import get_pipeline, get_registry
+
+# Rough peak memory cost of one 512x512 image inside a denoising batch (fp16).
+# fp32 pipelines need about twice as much. Used to pick a batch size that fits.
+BYTES_PER_IMAGE_FP16 = int(1.25 * 1024 ** 3)
+MAX_BATCH_SIZE = 8
+SAVE_WORKERS = 4
+
+# Linear approximation of the SD VAE decoder (latent channel -> RGB), good
+# enough for cheap low-resolution previews without running the VAE
+LATENT_RGB_FACTORS = [
+    [0.3512, 0.2297, 0.3227],
+    [0.3250, 0.4974, 0.2350],
+    [-0.2829, 0.1762, 0.2721],
+    [-0.2120, -0.2616, -0.7177],
+]
+
+
+def _free_memory_bytes(device) -> Optional[int]:
+    """Best-effort free memory on the pipeline's device, or None if unknown."""
+    try:
+        if str(device).startswith("cuda"):
+            import torch
+            free, _total = torch.cuda.mem_get_info(torch.device(device))
+            return int(free)
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ImportError, AttributeError, ValueError, OSError, RuntimeError):
+        return None
+
+
+def auto_batch_size(pipeline=None, max_batch_size: int = MAX_BATCH_SIZE) -> int:
+    """
+    Pick the largest batch size that should fit in the memory currently free
+    on the pipeline's device. Falls back to 1 when free memory can't be read.
+    """
+    pipeline = pipeline if pipeline is not None else get_pipeline()
+    device = getattr(pipeline, "device", "cpu")
+    dtype = getattr(pipeline, "dtype", "float32")
+
+    free = _free_memory_bytes(device)
+    if free is None:
+        return 1
+
+    per_image = BYTES_PER_IMAGE_FP16 * (1 if "float16" in str(dtype) else 2)
+    return max(1, min(max_batch_size, free // per_image))
+
+
+def padded_batches(prompts: Sequence[str], batch_size: int):
+    """
+    Split prompts into batches of exactly `batch_size`, padding the last one by
+    repeating its final prompt so every pipeline call sees the same batch shape.
+
+    Yields (start_index, batch_prompts, real_count); only the first `real_count`
+    outputs of each batch belong to real prompts.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    for start in range(0, len(prompts), batch_size):
+        batch = list(prompts[start:start + batch_size])
+        real_count = len(batch)
+        batch.extend([batch[-1]] * (batch_size - real_count))
+        yield start, batch, real_count
+
+
+def _seed_kwargs(pipeline, seed: Optional[int], count: int):
+    """Pipeline kwargs giving every image in a batch the same fixed seed."""
+    if seed is None:
+        return {}
+    try:
+        import torch
+    except ImportError:
+        # Stub pipelines are deterministic and run without torch
+        return {}
+    device = str(getattr(pipeline, "device", "cpu"))
+    return {"generator": [torch.Generator(device=device).manual_seed(seed) for _ in range(count)]}
+
+
+def _step_kwargs(indices: List[int], total_steps: int, on_step: Optional[Callable]):
+    """Pipeline kwargs reporting each denoising step of a batch to `on_step`."""
+    if on_step is None:
+        return {}
+
+    def callback(_pipeline, step, _timestep, callback_kwargs):
+        on_step(indices, step + 1, total_steps, callback_kwargs.get("latents"))
+        return callback_kwargs
+
+    return {"callback_on_step_end": callback, "callback_on_step_end_tensor_inputs": ["latents"]}
+
+
+def latent_preview(latent) -> Image.Image:
+    """Approximate RGB preview (1/8 resolution) of one (4, h, w) latent tensor."""
+    import torch
+
+    factors = torch.tensor(LATENT_RGB_FACTORS, dtype=latent.dtype, device=latent.device)
+    rgb = torch.einsum("chw,cr->hwr", latent, factors)
+    rgb = ((rgb + 1) / 2).clamp(0, 1).mul(255).byte().cpu().numpy()
+    return Image.fromarray(rgb)
+
+
+def _save_image(image: Image.Image, output_path: str, cache=None, key: Optional[str] = None,
+                on_saved: Optional[Callable] = None, index: int = 0) -> str:
+    image.save(output_path)
+    print(f"Saved: {output_path}")
+    if cache is not None:
+        cache.store(key, output_path)
+    if on_saved is not None:
+        on_saved(index, output_path)
+    return output_path
+
+
+def diffuse(
+    prompts: Sequence[str],
+    batch_size: Optional[int] = None,
+    guidance_scale: float = 7.5,
+    num_inference_steps: int = 50,
+    seed: Optional[int] = None,
+    height: Optional[int] = None,
+    width: Optional[int] = None,
+    pipeline=None,
+    on_step: Optional[Callable] = None,
+    on_batch: Optional[Callable] = None,
+) -> List[Image.Image]:
+    """
+    Run prompts through the pipeline in padded batches and return the images
+    in memory, in prompt order. Nothing is cached or written to disk.
+
+    :param on_step: Called as on_step(prompt_indices, step, total_steps, latents)
+        after every denoising step; row i of `latents` belongs to prompts[prompt_indices[i]].
+    :param on_batch: Called as on_batch(prompt_indices, images) after each
+        pipeline call, so callers can start CPU work while the next batch runs.
+    """
+    if not prompts:
+        return []
+
+    pipeline = pipeline if pipeline is not None else get_pipeline()
+    if batch_size is None:
+        batch_size = auto_batch_size(pipeline)
+    # Never pad a single short batch up to a larger size than we need
+    batch_size = min(batch_size, len(prompts))
+
+    results: List[Optional[Image.Image]] = [None] * len(prompts)
+    for start, batch, real_count in padded_batches(prompts, batch_size):
+        for prompt in batch[:real_count]:
+            print(f"Prompt: {prompt}")
+
+        indices = list(range(start, start + real_count))
+        images = pipeline(
+            list(batch),
+            guidance_scale=guidance_scale,
+            num_inference_steps=num_inference_steps,
+            height=height,
+            width=width,
+            **_seed_kwargs(pipeline, seed, len(batch)),
+            **_step_kwargs(indices, num_inference_steps, on_step),
+        ).images[:real_count]
+        for i, image in zip(indices, images):
+            results[i] = image
+        if on_batch is not None:
+            on_batch(indices, images)
+    return results
+
+
+def request_cache_key(prompt: str, guidance_scale: float = 7.5, num_inference_steps: int = 50,
+                      seed: Optional[int] = None, height: Optional[int] = None,
+                      width: Optional[int] = None) -> str:
+    """Generation cache key for a prompt rendered by the shared registry model."""
+    return cache_key(prompt, seed, guidance_scale, num_inference_steps, get_registry().fingerprint(),
+                     height=height, width=width)
+
+
+def generate_images(
+    prompts: Sequence[str],
+    output_paths: Sequence[str],
+    batch_size: Optional[int] = None,
+    guidance_scale: float = 7.5,
+    num_inference_steps: int = 50,
+    seed: Optional[int] = None,
+    height: Optional[int] = None,
+    width: Optional[int] = None,
+    pipeline=None,
+    use_cache: bool = True,
+    on_step: Optional[Callable] = None,
+    on_saved: Optional[Callable] = None,
+) -> List[str]:
+    """
+    Generate one image per prompt, running the prompts through the pipeline in
+    padded batches. Images are written on a thread pool while the next batch is
+    denoising.
+
+    :param prompts: Text prompts, one per output image.
+    :param output_paths: Where to save each image (same order as prompts).
+    :param batch_size: Prompts per pipeline call. None picks one from free memory.
+    :param guidance_scale: Classifier-free guidance scale passed to the pipeline.
+    :param num_inference_steps: Denoising steps per image.
+    :param seed: Fixed seed for every image. Unseeded requests reuse any cached
+        image generated with the same prompt and settings.
+    :param height: Output height in pixels. None uses the model's default.
+    :param width: Output width in pixels. None uses the model's default.
+    :param pipeline: Pipeline to use instead of the shared one from the model registry.
+        Explicit pipelines bypass the generation cache.
+    :param use_cache: Serve repeat requests from the generation cache.
+    :param on_step: Called as on_step(prompt_indices, step, total_steps, latents)
+        after every denoising step; row i of `latents` belongs to prompts[prompt_indices[i]].
+    :param on_saved: Called as on_saved(prompt_index, output_path) as soon as
+        each image is on disk (including cache hits).
+    :return: The saved output paths, in prompt order.
+    """
+    if len(prompts) != len(output_paths):
+        raise ValueError("prompts and output_paths must have the same length")
+    if not prompts:
+        return []
+
+    settings = dict(guidance_scale=guidance_scale, num_inference_steps=num_inference_steps,
+                    seed=seed, height=height, width=width)
+    cache = get_cache() if use_cache and pipeline is None else None
+    keys: List[Optional[str]] = [None] * len(prompts)
+    todo = list(range(len(prompts)))
+
+    if cache is not None:
+        todo = []
+        for i, (prompt, output_path) in enumerate(zip(prompts, output_paths)):
+            keys[i] = request_cache_key(prompt, **settings)
+            if cache.fetch(keys[i], output_path):
+                print(f"Cache hit: {output_path}")
+                if on_saved is not None:
+                    on_saved(i, str(output_path))
+            else:
+                todo.append(i)
+
+    if not todo:
+        return [str(path) for path in output_paths]
+
+    pending = []
+    with ThreadPoolExecutor(max_workers=min(SAVE_WORKERS, len(todo))) as saver:
+        def save_batch(indices, images):
+            for local_index, image in zip(indices, images):
+                i = todo[local_index]
+                pending.append(saver.submit(_save_image, image, str(output_paths[i]), cache, keys[i], on_saved, i))
+
+        def report_step(indices, step, total_steps, latents):
+            on_step([todo[i] for i in indices], step, total_steps, latents)
+
+        # Only loads the model now that we know something actually needs generating
+        diffuse(
+            [prompts[i] for i in todo],
+            batch_size=batch_size,
+            pipeline=pipeline,
+            on_step=report_step if on_step is not None else None,
+            on_batch=save_batch,
+            **settings,
+        )
+
+    # Re-raise any error from the save threads
+    for future in pending:
+        future.result()
+    return [str(path) for path in output_paths]
 
-pipe = pipe.to("cuda" if torch.cuda.is_available() else "cpu")
 
 def generate_image(prompt: str, output_path: str):
     """
     Generate an image from text prompt using Stable Diffusion 2.1.
     Save result to the given output path.
     """
-    print(f"Prompt: {prompt}")
-    
-    image: Image.Image = pipe(prompt, guidance_scale=7.5).images[0]
-    image.save(output_path)
-    print(f"Saved: {output_path}")
\ No newline at end of file
+    generate_images([prompt], [output_path], batch_size=1)
@@ -0,0 +1,247 @@
+# generator/latent_cache.py
+
+"""
+On-disk cache of VAE latents and token IDs for fine-tuning.
+
+Training images don't change between epochs or runs, so each one goes through
+the VAE once. The cache stores the latent distribution's parameters (mean and
+log-variance, i.e. `vae.encode(x).latent_dist.parameters`) rather than one
+sampled latent, so training still draws a fresh latent every step
+(sample_latents), exactly as encoding on every step did, without the VAE.
+The caption's token IDs are stored next to them.
+
+Layout, one directory per resolution:
+
+    <root>/<resolution>px/moments.npy    float16 (capacity, 2 * C, h, w)  memory-mapped
+    <root>/<resolution>px/input_ids.npy  int32 (capacity, max_length)     memory-mapped
+    <root>/<resolution>px/index.json     rows by key, plus shapes and the model id
+
+Rows are keyed by the SHA-256 of the image file and the resolution: moved or
+renamed images still hit, edited images are encoded again, and an edited
+caption only re-tokenizes its row. File hashes are remembered by (path, mtime,
+size), so a warm run doesn't even re-read the images.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+DEFAULT_LATENT_CACHE_DIR = os.getenv("LATENT_CACHE_DIR", "cache/latents")
+SCALING_FACTOR = 0.18215  # SD VAE latent scale, used when the VAE config doesn't say
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LatentCache:
+    """
+    Memory-mapped latent moments and token IDs for one resolution.
+
+    :param root: Cache directory (created on demand).
+    :param resolution: Side length images are resized to before encoding.
+    :param model_id: Identifies the VAE; a cache built with another model is discarded.
+    :param max_length: Tokenizer max length (CLIP: 77).
+    """
+
+    def __init__(self, root=DEFAULT_LATENT_CACHE_DIR, resolution: int = 768, model_id: str = "",
+                 max_length: int = 77):
+        self.dir = Path(root) / f"{resolution}px"
+        self.resolution = resolution
+        self.model_id = model_id
+        self.max_length = max_length
+        self.rows: Dict[str, Dict] = {}  # key -> {"row", "prompt_sha256"}
+        self.files: Dict[str, List] = {}  # path -> [mtime_ns, size, sha256]
+        self.latent_shape = None
+        self.count = 0
+        self._moments = None
+        self._input_ids = None
+        self._load()
+
+    # --- Index ---
+
+    def _load(self):
+        index_path = self.dir / "index.json"
+        if not index_path.exists():
+            return
+        with open(index_path) as f:
+            index = json.load(f)
+        if index.get("model") != self.model_id or index.get("max_length") != self.max_length:
+            print(f"[CACHE] Latent cache in {self.dir} was built for another model, rebuilding")
+            return
+        self.rows = index["rows"]
+        self.files = index.get("files", {})
+        self.count = index["count"]
+        self.latent_shape = tuple(index["latent_shape"])
+        self._moments = np.load(self.dir / "moments.npy", mmap_mode="r+")
+        self._input_ids = np.load(self.dir / "input_ids.npy", mmap_mode="r+")
+
+    def _save(self):
+        self._moments.flush()
+        self._input_ids.flush()
+        index = {
+            "model": self.model_id,
+            "resolution": self.resolution,
+            "max_length": self.max_length,
+            "latent_shape": list(self.latent_shape),
+            "count": self.count,
+            "rows": self.rows,
+            "files": self.files,
+        }
+        # Written after the arrays and swapped in whole, so an interrupted build keeps the old index
+        tmp = self.dir / "index.json.tmp"
+        with open(tmp, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp, self.dir / "index.json")
+
+    def key(self, image_path) -> str:
+        """Cache key of an image: content hash + resolution."""
+        path = str(Path(image_path).resolve())
+        stat = os.stat(path)
+        known = self.files.get(path)
+        if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            sha = known[2]
+        else:
+            sha = file_sha256(path)
+            self.files[path] = [stat.st_mtime_ns, stat.st_size, sha]
+        return f"{sha}:{self.resolution}"
+
+    # --- Storage ---
+
+    def _reserve(self, rows: int, latent_shape):
+        """Make room for `rows` more rows, growing the memory-mapped files by doubling."""
+        if self._moments is None:
+            self.latent_shape = tuple(latent_shape)
+            capacity = max(16, rows)
+        elif self.count + rows <= len(self._moments):
+            return
+        else:
+            capacity = max(len(self._moments) * 2, self.count + rows)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        moments = np.lib.format.open_memmap(self.dir / "moments.npy.tmp", mode="w+", dtype=np.float16,
+                                            shape=(capacity, *self.latent_shape))
+        input_ids = np.lib.format.open_memmap(self.dir / "input_ids.npy.tmp", mode="w+", dtype=np.int32,
+                                              shape=(capacity, self.max_length))
+        if self._moments is not None:
+            moments[:self.count] = self._moments[:self.count]
+            input_ids[:self.count] = self._input_ids[:self.count]
+        moments.flush()
+        input_ids.flush()
+        del moments, input_ids
+        self._moments = self._input_ids = None
+        os.replace(self.dir / "moments.npy.tmp", self.dir / "moments.npy")
+        os.replace(self.dir / "input_ids.npy.tmp", self.dir / "input_ids.npy")
+        self._moments = np.load(self.dir / "moments.npy", mmap_mode="r+")
+        self._input_ids = np.load(self.dir / "input_ids.npy", mmap_mode="r+")
+
+    def build(self, entries: Iterable[Dict], encode: Callable, tokenize: Callable, batch_size: int = 4) -> List[int]:
+        """
+        Make sure every entry is cached and return their rows, in order.
+        Entries are consumed as they come (e.g. streamed from a caption index);
+        uncached images are encoded a batch at a time along the way.
+
+        :param entries: [{"image": path, "prompt": caption}, ...]
+        :param encode: Image paths -> latent parameters, array (B, 2 * C, h, w).
+            Only called for images not cached yet.
+        :param tokenize: Captions -> token IDs, array (B, max_length).
+        :param batch_size: Images per encode call.
+        """
+        keys, missing, stale, queued = [], [], [], set()
+        hits = encoded = 0
+        for entry in entries:
+            key = self.key(entry["image"])
+            keys.append(key)
+            known = self.rows.get(key)
+            if key in queued:
+                continue
+            if known is None:
+                queued.add(key)
+                missing.append((key, entry))
+                if len(missing) >= batch_size:
+                    encoded += self._encode(missing, encode, tokenize)
+                    missing = []
+            elif known["prompt_sha256"] != text_sha256(entry["prompt"]):
+                # Same image with a new caption: the latents stay, only the tokens change
+                queued.add(key)
+                stale.append((key, entry))
+            else:
+                hits += 1
+        if missing:
+            encoded += self._encode(missing, encode, tokenize)
+
+        if stale:
+            input_ids = np.asarray(tokenize([entry["prompt"] for _, entry in stale]), dtype=np.int32)
+            for (key, entry), ids in zip(stale, input_ids):
+                self._input_ids[self.rows[key]["row"]] = ids
+                self.rows[key]["prompt_sha256"] = text_sha256(entry["prompt"])
+        print(f"[CACHE] Latents at {self.resolution}px: {hits} cached, {encoded} encoded, "
+              f"{len(stale)} re-tokenized")
+
+        if self._moments is not None:
+            self._save()
+        return [self.rows[key]["row"] for key in keys]
+
+    def _encode(self, batch, encode: Callable, tokenize: Callable) -> int:
+        moments = np.asarray(encode([entry["image"] for _, entry in batch]), dtype=np.float16)
+        input_ids = np.asarray(tokenize([entry["prompt"] for _, entry in batch]), dtype=np.int32)
+        self._reserve(len(batch), moments.shape[1:])
+        rows = slice(self.count, self.count + len(batch))
+        self._moments[rows] = moments
+        self._input_ids[rows] = input_ids
+        for offset, (key, entry) in enumerate(batch):
+            self.rows[key] = {"row": self.count + offset, "prompt_sha256": text_sha256(entry["prompt"])}
+        self.count += len(batch)
+        print(f"[CACHE] Encoded {len(batch)} image(s), {self.count} row(s) cached")
+        return len(batch)
+
+    def moments(self, row: int) -> np.ndarray:
+        return self._moments[row]
+
+    def input_ids(self, row: int) -> np.ndarray:
+        return self._input_ids[row]
+
+
+class CachedLatentDataset:
+    """
+    Map-style dataset over cache rows for a torch DataLoader. Items are
+    {"moments", "input_ids"} arrays, read from the memory map on demand.
+    """
+
+    def __init__(self, cache: LatentCache, rows: Sequence[int]):
+        self.cache = cache
+        self.rows = list(rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        row = self.rows[i]
+        return {
+            "moments": np.array(self.cache.moments(row)),
+            "input_ids": np.array(self.cache.input_ids(row), dtype=np.int64),
+        }
+
+
+def sample_latents(moments, scaling_factor: float = SCALING_FACTOR, generator=None):
+    """
+    Draw latents from cached moments, like `latent_dist.sample() * scaling_factor`
+    (the same maths as diffusers' DiagonalGaussianDistribution).
+    """
+    import torch
+
+    mean, logvar = torch.chunk(moments.float(), 2, dim=1)
+    std = torch.exp(0.5 * torch.clamp(logvar, -30.0, 20.0))
+    noise = torch.randn(mean.shape, generator=generator, device=mean.device, dtype=mean.dtype)
+    return (mean + std * noise) * scaling_factor
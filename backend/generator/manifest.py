@@ -0,0 +1,130 @@
+# generator/manifest.py
+
+"""
+Append-only manifest of every generated asset.
+
+Each line of the manifest (ASSET_MANIFEST, default assets/manifest.jsonl) is
+one JSON record for a finished job:
+
+    {"job_id": ..., "title": ..., "created_at": ...,
+     "assets": {"characters": {"path", "sha256", "bytes", "width", "height",
+                               "variants": {"64x64": path}, "processed": path}, ...},
+     "atlas": {"image": path, "index": path}}
+
+"path" is the raw generated image and "processed" (sprites only) the matted,
+trimmed sprite. "atlas" (optional) is the job's sprite atlas, see atlas.py.
+
+The worker also copies a job's "assets" block into the per-run config, so
+run_game resolves its exact files straight from the config it is launched
+with. The manifest itself answers lookups for configs that only carry a job
+id or title; it is read incrementally (only lines appended since the last
+read), so repeated lookups don't rescan the file.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_MANIFEST_PATH = os.getenv("ASSET_MANIFEST", "assets/manifest.jsonl")
+
+
+def asset_record(path: str, data: bytes, size: Tuple[int, int], variants: Dict[str, str],
+                 processed: Optional[str] = None) -> Dict:
+    """
+    Manifest entry for one saved asset, from the PNG bytes that were written.
+    `processed` is the matted sprite saved next to it (sprites only).
+    """
+    record = {
+        "path": str(path).replace("\\", "/"),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "bytes": len(data),
+        "width": size[0],
+        "height": size[1],
+        "variants": {name: str(variant).replace("\\", "/") for name, variant in variants.items()},
+    }
+    if processed is not None:
+        record["processed"] = str(processed).replace("\\", "/")
+    return record
+
+
+class AssetManifest:
+    """
+    JSONL manifest shared by every process writing to the same file.
+
+    :param path: Manifest file (created on first append).
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH):
+        self.path = Path(path)
+        self._by_job: Dict[str, Dict] = {}
+        self._by_title: Dict[str, Dict] = {}
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def append(self, job_id: str, title: str, assets: Dict[str, Dict], atlas: Optional[Dict] = None) -> Dict:
+        """Record a job's assets ({asset_type: asset_record}) and sprite atlas, and return the entry."""
+        entry = {"job_id": job_id, "title": title, "created_at": time.time(), "assets": assets}
+        if atlas is not None:
+            entry["atlas"] = atlas
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            # One write on an O_APPEND file, so lines from other processes never interleave
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+        return entry
+
+    def _refresh(self):
+        # Caller holds self._lock. Index only what was appended since the last read.
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # Leave a partially written last line for the next refresh
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                print(f"[WARN] Skipping corrupt manifest line in {self.path}")
+                continue
+            self._by_job[entry["job_id"]] = entry
+            self._by_title[entry["title"]] = entry  # Latest job wins
+        self._offset += end
+
+    def lookup(self, job_id: Optional[str] = None, title: Optional[str] = None) -> Optional[Dict]:
+        """The entry for `job_id`, else the latest entry for `title`, else None."""
+        with self._lock:
+            self._refresh()
+            if job_id is not None and job_id in self._by_job:
+                return self._by_job[job_id]
+            if title is not None:
+                return self._by_title.get(title)
+            return None
+
+    def entries(self) -> List[Dict]:
+        """Latest entry per job, oldest first."""
+        with self._lock:
+            self._refresh()
+            return sorted(self._by_job.values(), key=lambda entry: entry["created_at"])
+
+
+_manifest: Optional[AssetManifest] = None
+_manifest_lock = threading.Lock()
+
+
+def get_manifest() -> AssetManifest:
+    """The process-wide manifest at ASSET_MANIFEST."""
+    global _manifest
+    with _manifest_lock:
+        if _manifest is None:
+            _manifest = AssetManifest()
+        return _manifest
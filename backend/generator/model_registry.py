@@ -0,0 +1,287 @@
+# generator/model_registry.py
+
+"""
+Process-wide registry of diffusion pipelines.
+
+Pipelines are loaded the first time they are asked for (never at import time),
+keyed by (model path, dtype, device), and shared by everything in the process:
+the API worker, the batch/dataset generators and the fine-tuning script.
+When a memory budget is set, the least recently used pipelines are evicted to
+stay under it.
+
+Backends are pluggable. "diffusers" loads a real StableDiffusionPipeline and
+"stub" returns flat-colour images instantly, so the API can boot and serve in
+tests without torch or a GPU. Pick one with the GAME_ASSET_BACKEND env var.
+"""
+
+import gc
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Callable, Dict, NamedTuple, Optional
+
+from PIL import Image
+
+DEFAULT_MODEL_PATH = os.getenv("GAME_ASSET_MODEL", "C:/nus_adv/output_model")
+DEFAULT_BACKEND = os.getenv("GAME_ASSET_BACKEND", "diffusers")
+
+
+class ModelKey(NamedTuple):
+    model_path: str
+    dtype: str
+    device: str
+
+
+# --- Backends ---
+
+class StubPipeline:
+    """
+    Stand-in for StableDiffusionPipeline. Returns one flat-colour image per
+    prompt (colour derived from the prompt) without loading any weights.
+    """
+
+    def __init__(self, model_path: str, dtype: str = "float32", device: str = "cpu", size=(512, 512)):
+        self.model_path = model_path
+        self.dtype = dtype
+        self.device = device
+        self.size = size
+        self.nbytes = 0
+
+    def __call__(self, prompt, guidance_scale: float = 7.5, num_inference_steps: int = 50,
+                 height: Optional[int] = None, width: Optional[int] = None,
+                 callback_on_step_end: Optional[Callable] = None, **kwargs):
+        prompts = [prompt] if isinstance(prompt, str) else list(prompt)
+        size = (width or self.size[0], height or self.size[1])
+        if callback_on_step_end is not None:
+            # No latents to report; callers must cope with None
+            for step in range(num_inference_steps):
+                callback_on_step_end(self, step, 0, {"latents": None})
+        images = [Image.new("RGB", size, _prompt_color(p)) for p in prompts]
+        return SimpleNamespace(images=images)
+
+
+def _prompt_color(prompt: str):
+    digest = hashlib.md5(prompt.encode("utf-8")).digest()
+    return digest[0], digest[1], digest[2]
+
+
+def _load_stub(key: ModelKey, **load_kwargs):
+    return StubPipeline(key.model_path, key.dtype, key.device)
+
+
+def _load_diffusers(key: ModelKey, **load_kwargs):
+    # Heavy imports live here so importing the registry stays cheap
+    import torch
+    from diffusers import StableDiffusionPipeline
+
+    print(f"[MODEL] Loading {key.model_path} ({key.dtype}) on {key.device}...")
+    pipeline = StableDiffusionPipeline.from_pretrained(
+        key.model_path,
+        torch_dtype=getattr(torch, key.dtype),
+        **load_kwargs,
+    )
+    return pipeline.to(key.device)
+
+
+BACKENDS: Dict[str, Callable] = {
+    "diffusers": _load_diffusers,
+    "stub": _load_stub,
+}
+
+
+def register_backend(name: str, loader: Callable):
+    """Register a loader `loader(key, **load_kwargs) -> pipeline` under `name`."""
+    BACKENDS[name] = loader
+
+
+def default_device(backend: str = DEFAULT_BACKEND) -> str:
+    if backend == "stub":
+        return "cpu"
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def default_dtype(device: str) -> str:
+    return "float16" if device.startswith("cuda") else "float32"
+
+
+# Weight files whose size/mtime identify a local model snapshot. Fine-tuning
+# rewrites these in place, so the fingerprint changes when the model does.
+FINGERPRINT_FILES = (
+    "model_index.json",
+    "unet/config.json",
+    "unet/diffusion_pytorch_model.safetensors",
+    "unet/diffusion_pytorch_model.fp16.safetensors",
+    "unet/diffusion_pytorch_model.bin",
+)
+
+
+def model_fingerprint(key: ModelKey, backend: str = DEFAULT_BACKEND) -> str:
+    """
+    Short hash identifying the weights a key would load, without loading them.
+    Hub model IDs (no local files) are identified by name only.
+    """
+    parts = [backend, key.model_path, key.dtype]
+    for name in FINGERPRINT_FILES:
+        try:
+            stat = os.stat(os.path.join(key.model_path, name))
+        except OSError:
+            continue
+        parts.append(f"{name}:{stat.st_size}:{int(stat.st_mtime)}")
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def pipeline_nbytes(pipeline) -> int:
+    """Approximate memory held by a pipeline's weights."""
+    nbytes = getattr(pipeline, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+
+    total = 0
+    components = getattr(pipeline, "components", None) or {}
+    for module in components.values():
+        parameters = getattr(module, "parameters", None)
+        if callable(parameters):
+            total += sum(p.numel() * p.element_size() for p in parameters())
+    return total
+
+
+# --- Registry ---
+
+class ModelRegistry:
+    """
+    Lazily loads and caches pipelines with LRU eviction under a memory budget.
+
+    :param backend: Name of the loader in BACKENDS used for new pipelines.
+    :param memory_budget_bytes: Evict least recently used pipelines once the
+        loaded total goes over this. None means no limit.
+    """
+
+    def __init__(self, backend: str = DEFAULT_BACKEND, memory_budget_bytes: Optional[int] = None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown model backend: {backend}")
+        self.backend = backend
+        self.memory_budget_bytes = memory_budget_bytes
+        self._models: "OrderedDict[ModelKey, tuple]" = OrderedDict()  # key -> (pipeline, nbytes)
+        self._lock = threading.Lock()
+        self._load_locks: Dict[ModelKey, threading.Lock] = {}
+
+    def make_key(self, model_path: Optional[str] = None, dtype: Optional[str] = None,
+                 device: Optional[str] = None) -> ModelKey:
+        device = device or default_device(self.backend)
+        return ModelKey(model_path or DEFAULT_MODEL_PATH, dtype or default_dtype(device), device)
+
+    def get(self, model_path: Optional[str] = None, dtype: Optional[str] = None,
+            device: Optional[str] = None, **load_kwargs):
+        """
+        Return the shared pipeline for (model_path, dtype, device), loading it
+        on first use. Extra kwargs are only used for that first load.
+        """
+        key = self.make_key(model_path, dtype, device)
+
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other models stay available, but
+        # make concurrent first requests for the same key wait for one load
+        with load_lock:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key][0]
+
+            pipeline = BACKENDS[self.backend](key, **load_kwargs)
+
+            with self._lock:
+                self._models[key] = (pipeline, pipeline_nbytes(pipeline))
+                self._load_locks.pop(key, None)
+                self._evict_over_budget(keep=key)
+        return pipeline
+
+    def fingerprint(self, model_path: Optional[str] = None, dtype: Optional[str] = None,
+                    device: Optional[str] = None) -> str:
+        """Fingerprint of the model a get() with the same arguments would return."""
+        return model_fingerprint(self.make_key(model_path, dtype, device), self.backend)
+
+    def loaded(self):
+        """Keys of loaded pipelines, least recently used first."""
+        with self._lock:
+            return list(self._models)
+
+    def memory_in_use(self) -> int:
+        with self._lock:
+            return sum(nbytes for _pipeline, nbytes in self._models.values())
+
+    def evict(self, key: ModelKey) -> bool:
+        with self._lock:
+            removed = self._models.pop(key, None) is not None
+        if removed:
+            _release_memory()
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+        _release_memory()
+
+    def _evict_over_budget(self, keep: ModelKey):
+        # Caller holds self._lock
+        if self.memory_budget_bytes is None:
+            return
+        evicted = False
+        while sum(nbytes for _p, nbytes in self._models.values()) > self.memory_budget_bytes:
+            victim = next((k for k in self._models if k != keep), None)
+            if victim is None:
+                break
+            print(f"[MODEL] Evicting idle model {victim.model_path} ({victim.dtype}, {victim.device})")
+            del self._models[victim]
+            evicted = True
+        if evicted:
+            _release_memory()
+
+
+def _release_memory():
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
+
+
+def _budget_from_env() -> Optional[int]:
+    budget_mb = os.getenv("GAME_ASSET_MODEL_BUDGET_MB")
+    return int(budget_mb) * 1024 * 1024 if budget_mb else None
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    """The process-wide registry, created on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry(DEFAULT_BACKEND, _budget_from_env())
+        return _registry
+
+
+def set_registry(registry: ModelRegistry) -> ModelRegistry:
+    """Swap the process-wide registry (e.g. for a stub one in tests)."""
+    global _registry
+    with _registry_lock:
+        _registry = registry
+    return registry
+
+
+def get_pipeline(model_path: Optional[str] = None, dtype: Optional[str] = None,
+                 device: Optional[str] = None, **load_kwargs):
+    """Shortcut for get_registry().get(...)."""
+    return get_registry().get(model_path, dtype, device, **load_kwargs)
@@ -0,0 +1,202 @@
+# generator/postprocess.py
+
+"""
+Sprite post-processing done once at generation time instead of on every game launch.
+
+For sprite assets (characters, enemies, rewards) this:
+  1. mattes the white background into a real alpha channel: near-white pixels
+     connected to the image border are flood-filled as background (so white
+     details inside the sprite survive), and the one-pixel band around them
+     gets a soft alpha with the white bleed removed from its colour;
+  2. trims the image to the bounding box of its opaque pixels, and saves the
+     result next to the original as <name>@processed.png;
+  3. writes pre-scaled, pre-multiplied variants at the sizes the engine draws
+     them, next to the original as <name>@<w>x<h>.png.
+
+The original file keeps the raw generated image, so a different matte can be
+re-derived from it later. Backgrounds only get the pre-scaled variant (opaque,
+no matte).
+
+The game loads the variants as-is and blits them with
+pygame.BLEND_PREMULTIPLIED, so startup does no per-pixel work at all.
+"""
+
+import os
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Minimum channel value for a pixel to count as white background
+WHITE_THRESHOLD = 245
+# Edge pixels with every channel at or below this are fully opaque
+EDGE_OPAQUE_BELOW = 191
+
+# Sizes (width, height) the engine draws each asset type at. Sprite variants
+# are fitted inside the box keeping their aspect ratio after trimming.
+VARIANT_SIZES: Dict[str, List[Tuple[int, int]]] = {
+    "characters": [(64, 64)],
+    "enemies": [(64, 64)],
+    "rewards": [(32, 32)],
+    "backgrounds": [(960, 540)],
+}
+
+SPRITE_TYPES = ("characters", "rewards", "enemies")
+
+
+def variant_path(path, size: Tuple[int, int]) -> Path:
+    """Where the variant of `path` at `size` is stored: <stem>@<w>x<h>.png."""
+    path = Path(path)
+    return path.with_name(f"{path.stem}@{size[0]}x{size[1]}.png")
+
+
+def processed_path(path) -> Path:
+    """Where the matted and trimmed sprite of `path` is stored: <stem>@processed.png."""
+    path = Path(path)
+    return path.with_name(f"{path.stem}@processed.png")
+
+
+# --- Matte ---
+
+def _dilate(mask: np.ndarray) -> np.ndarray:
+    # 4-connected, one pixel
+    grown = mask.copy()
+    grown[1:, :] |= mask[:-1, :]
+    grown[:-1, :] |= mask[1:, :]
+    grown[:, 1:] |= mask[:, :-1]
+    grown[:, :-1] |= mask[:, 1:]
+    return grown
+
+
+def _flood_from_border(candidate: np.ndarray) -> np.ndarray:
+    """
+    Pixels of `candidate` 4-connected to the image border.
+
+    Scanline fill: each horizontal run of candidate pixels is one node, and a
+    breadth-first walk from the runs touching the border visits each run once,
+    stepping to the runs it overlaps in the rows above and below.
+    """
+    height, width = candidate.shape
+    before = np.zeros_like(candidate)
+    before[:, 1:] = candidate[:, :-1]
+    after = np.zeros_like(candidate)
+    after[:, :-1] = candidate[:, 1:]
+    run_rows, run_starts = np.nonzero(candidate & ~before)
+    run_ends = np.nonzero(candidate & ~after)[1] + 1  # Same row-major order as the starts
+    if not len(run_rows):
+        return candidate.copy()
+    # runs[y, x]: id of the run containing (y, x), -1 outside the candidate
+    runs = np.where(candidate, np.cumsum(candidate & ~before).reshape(height, width) - 1, -1)
+
+    reached = np.zeros(len(run_rows), dtype=bool)
+    border = np.concatenate([runs[0], runs[-1], runs[:, 0], runs[:, -1]])
+    seeds = np.unique(border[border >= 0])
+    reached[seeds] = True
+    queue = deque(seeds.tolist())
+    while queue:
+        run = queue.popleft()
+        y, start, end = run_rows[run], run_starts[run], run_ends[run]
+        for row in (y - 1, y + 1):
+            if 0 <= row < height:
+                touching = runs[row, start:end]
+                for neighbour in np.unique(touching[touching >= 0]).tolist():
+                    if not reached[neighbour]:
+                        reached[neighbour] = True
+                        queue.append(neighbour)
+    return candidate & reached[runs]
+
+
+def alpha_matte(image: Image.Image, threshold: int = WHITE_THRESHOLD) -> Image.Image:
+    """
+    Turn the white background of a sprite into transparency.
+
+    Fully transparent pixels keep RGB white, so the old colorkey loader still
+    works on the result.
+    """
+    rgb = np.asarray(image.convert("RGB"), dtype=np.float32)
+    whiteness = rgb.min(axis=-1)
+    background = _flood_from_border(whiteness >= threshold)
+
+    alpha = np.ones(whiteness.shape, dtype=np.float32)
+    alpha[background] = 0.0
+
+    # Soft edge: the band just inside the background gets alpha from how far it
+    # is from white, and its colour has the white blended out of it
+    edge = _dilate(background) & ~background
+    edge_alpha = np.clip((255.0 - whiteness[edge]) / (255.0 - EDGE_OPAQUE_BELOW), 0.0, 1.0)
+    alpha[edge] = edge_alpha
+    safe = np.maximum(edge_alpha, 1e-3)[:, None]
+    rgb[edge] = np.clip((rgb[edge] - (1.0 - edge_alpha[:, None]) * 255.0) / safe, 0.0, 255.0)
+
+    rgb[background] = 255.0
+    rgba = np.dstack([rgb, alpha * 255.0]).round().astype(np.uint8)
+    return Image.fromarray(rgba, "RGBA")
+
+
+def trim(image: Image.Image) -> Image.Image:
+    """Crop to the bounding box of non-transparent pixels (no-op without alpha)."""
+    if image.mode != "RGBA":
+        return image
+    bbox = image.getchannel("A").getbbox()
+    return image.crop(bbox) if bbox else image
+
+
+# --- Variants ---
+
+def premultiply(image: Image.Image) -> Image.Image:
+    """RGB multiplied by alpha, as pygame.BLEND_PREMULTIPLIED expects."""
+    rgba = np.asarray(image, dtype=np.uint16)
+    rgb = (rgba[..., :3] * rgba[..., 3:] + 127) // 255
+    return Image.fromarray(np.dstack([rgb, rgba[..., 3]]).astype(np.uint8), "RGBA")
+
+
+def fit_size(size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    """Largest size inside `box` with the aspect ratio of `size`."""
+    scale = min(box[0] / size[0], box[1] / size[1])
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def scaled_variant(image: Image.Image, box: Tuple[int, int], sprite: bool) -> Image.Image:
+    if not sprite:
+        # Backgrounds fill the screen exactly
+        return image.convert("RGB").resize(box, Image.LANCZOS)
+    # Resample in premultiplied space so transparent white never bleeds into the edges
+    return premultiply(image).resize(fit_size(image.size, box), Image.LANCZOS)
+
+
+def postprocess(image: Image.Image, asset_type: str) -> Image.Image:
+    """Matte and trim a sprite; other asset types pass through unchanged."""
+    if asset_type not in SPRITE_TYPES:
+        return image
+    return trim(alpha_matte(image))
+
+
+def save_processed(image: Image.Image, output_path) -> str:
+    """Write a post-processed sprite next to `output_path` (see processed_path) and return its path."""
+    path = processed_path(output_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    image.save(tmp_path, format="PNG")
+    os.replace(tmp_path, path)
+    return str(path)
+
+
+def save_variants(image: Image.Image, asset_type: str, output_path,
+                  sizes: Optional[Dict[str, List[Tuple[int, int]]]] = None) -> Dict[str, str]:
+    """
+    Write the pre-scaled variants of a post-processed asset next to `output_path`.
+    Returns {"<w>x<h>": path}.
+    """
+    sizes = VARIANT_SIZES if sizes is None else sizes
+    paths = {}
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    for box in sizes.get(asset_type, []):
+        path = variant_path(output_path, box)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        scaled_variant(image, box, asset_type in SPRITE_TYPES).save(tmp_path, format="PNG")
+        os.replace(tmp_path, path)
+        paths[f"{box[0]}x{box[1]}"] = str(path)
+    return paths
+
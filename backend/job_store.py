@@ -0,0 +1,336 @@
+"""
+Persistent job status storage shared by every API and worker process.
+
+Jobs move through QUEUED -> STARTED -> SUCCESS/FAILURE. Status changes go
+through `transition`, which is an atomic compare-and-set, so two processes can
+never both start the same job or overwrite a finished one. Finished jobs
+expire after a TTL so the store doesn't grow without bound. A job can name
+its `owner` (the in-memory worker pool holding it); `unfinished` lets a
+restarted pool find and fail the jobs its predecessor lost.
+
+Pick the backend with JOB_STORE_URL:
+    sqlite:///jobs.db          (default, local file in WAL mode)
+    redis://localhost:6379/0   (needs the `redis` package)
+"""
+
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+QUEUED = "QUEUED"
+STARTED = "STARTED"
+SUCCESS = "SUCCESS"
+FAILURE = "FAILURE"
+
+TERMINAL_STATUSES = (SUCCESS, FAILURE)
+
+# Allowed status changes: {from_status: (to_status, ...)}
+TRANSITIONS = {
+    QUEUED: (STARTED, FAILURE),
+    STARTED: (SUCCESS, FAILURE),
+    SUCCESS: (),
+    FAILURE: (),
+}
+
+DEFAULT_STORE_URL = os.getenv("JOB_STORE_URL", "sqlite:///jobs.db")
+DEFAULT_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 60 * 60)))
+PURGE_INTERVAL_SECONDS = 60
+
+
+def _allowed_from(to_status: str):
+    return [status for status, targets in TRANSITIONS.items() if to_status in targets]
+
+
+class JobStore(abc.ABC):
+    """Interface shared by the job store backends."""
+
+    @abc.abstractmethod
+    def create(self, task_id: str, result=None, owner: Optional[str] = None) -> Dict:
+        """Register a new QUEUED job held by `owner` (None if it survives restarts) and return it."""
+
+    @abc.abstractmethod
+    def get(self, task_id: str) -> Optional[Dict]:
+        """Return {"task_id", "status", "result", "owner", ...} or None if unknown/expired."""
+
+    @abc.abstractmethod
+    def unfinished(self) -> List[Dict]:
+        """Every QUEUED or STARTED job, as returned by `get`."""
+
+    @abc.abstractmethod
+    def transition(self, task_id: str, to_status: str, result=None) -> bool:
+        """
+        Atomically move a job to `to_status` (storing `result`) if that is a
+        legal move from its current status. Returns False otherwise.
+        """
+
+    @abc.abstractmethod
+    def update(self, task_id: str, result) -> bool:
+        """
+        Replace the result of a STARTED job (e.g. a bulk job's progress)
+        without changing its status. Returns False if the job isn't running.
+        """
+
+    @abc.abstractmethod
+    def delete(self, task_id: str):
+        """Forget a job whatever its status."""
+
+    @abc.abstractmethod
+    def purge_expired(self) -> int:
+        """Drop finished jobs past their TTL. Returns how many were removed."""
+
+
+# --- SQLite (local, multi-process) ---
+
+class SQLiteJobStore(JobStore):
+    """
+    Job store in a local SQLite file. WAL mode lets several API/worker
+    processes read while one writes; each thread/process gets its own connection.
+    """
+
+    def __init__(self, path: str = "jobs.db", ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._last_purge = 0.0
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    task_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    expires_at REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_expires_at ON jobs (expires_at)")
+            # Stores created before jobs had owners
+            columns = [row["name"] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if "owner" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections must not cross threads or survive a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, task_id: str, result=None, owner: Optional[str] = None) -> Dict:
+        now = time.time()
+        if now - self._last_purge > PURGE_INTERVAL_SECONDS:
+            self._last_purge = now
+            self.purge_expired()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (task_id, status, result, created_at, updated_at, owner) VALUES (?, ?, ?, ?, ?, ?)",
+                (task_id, QUEUED, json.dumps(result), now, now, owner),
+            )
+        return {"task_id": task_id, "status": QUEUED, "result": result, "owner": owner}
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        row = self._connect().execute(
+            "SELECT * FROM jobs WHERE task_id = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (task_id, time.time()),
+        ).fetchone()
+        return self._job(row) if row is not None else None
+
+    def unfinished(self) -> List[Dict]:
+        rows = self._connect().execute(
+            "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, STARTED)
+        ).fetchall()
+        return [self._job(row) for row in rows]
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Dict:
+        return {
+            "task_id": row["task_id"],
+            "status": row["status"],
+            "result": json.loads(row["result"]) if row["result"] is not None else None,
+            "owner": row["owner"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def transition(self, task_id: str, to_status: str, result=None) -> bool:
+        allowed = _allowed_from(to_status)
+        if not allowed:
+            return False
+        now = time.time()
+        expires_at = now + self.ttl_seconds if to_status in TERMINAL_STATUSES else None
+        placeholders = ", ".join("?" for _ in allowed)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"""
+                UPDATE jobs SET status = ?, result = ?, updated_at = ?, expires_at = ?
+                WHERE task_id = ? AND status IN ({placeholders})
+                """,
+                (to_status, json.dumps(result), now, expires_at, task_id, *allowed),
+            )
+        return cursor.rowcount == 1
+
+    def update(self, task_id: str, result) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET result = ?, updated_at = ? WHERE task_id = ? AND status = ?",
+                (json.dumps(result), time.time(), task_id, STARTED),
+            )
+        return cursor.rowcount == 1
+
+    def delete(self, task_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE task_id = ?", (task_id,))
+
+    def purge_expired(self) -> int:
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),))
+        return cursor.rowcount
+
+
+# --- Redis (optional, shared across machines) ---
+
+class RedisJobStore(JobStore):
+    """
+    Job store in Redis hashes. Finished jobs get a Redis EXPIRE, so expiry
+    needs no purge step. `client` can be any redis-py compatible client
+    (e.g. fakeredis.FakeRedis in tests).
+    """
+
+    def __init__(self, client, ttl_seconds: int = DEFAULT_TTL_SECONDS, prefix: str = "job:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisJobStore":
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, task_id: str) -> str:
+        return f"{self.prefix}{task_id}"
+
+    def create(self, task_id: str, result=None, owner: Optional[str] = None) -> Dict:
+        now = time.time()
+        self.client.hset(self._key(task_id), mapping={
+            "status": QUEUED,
+            "result": json.dumps(result),
+            # Hash values can't be None
+            "owner": owner or "",
+            "created_at": now,
+            "updated_at": now,
+        })
+        return {"task_id": task_id, "status": QUEUED, "result": result, "owner": owner}
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        raw = self.client.hgetall(self._key(task_id))
+        if not raw:
+            return None
+        fields = {_decode(k): _decode(v) for k, v in raw.items()}
+        return {
+            "task_id": task_id,
+            "status": fields["status"],
+            "result": json.loads(fields["result"]),
+            "owner": fields.get("owner") or None,
+            "created_at": float(fields["created_at"]),
+            "updated_at": float(fields["updated_at"]),
+        }
+
+    def unfinished(self) -> List[Dict]:
+        # Finished jobs carry a TTL; only running and queued ones never expire
+        jobs = []
+        for key in self.client.scan_iter(match=f"{self.prefix}*"):
+            job = self.get(_decode(key)[len(self.prefix):])
+            if job is not None and job["status"] not in TERMINAL_STATUSES:
+                jobs.append(job)
+        return sorted(jobs, key=lambda job: job["created_at"])
+
+    def transition(self, task_id: str, to_status: str, result=None) -> bool:
+        from redis.exceptions import WatchError
+
+        allowed = _allowed_from(to_status)
+        key = self._key(task_id)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    # Optimistic lock: the MULTI block fails if anyone else
+                    # touched the job between our read and our write
+                    pipe.watch(key)
+                    current = pipe.hget(key, "status")
+                    if current is None or _decode(current) not in allowed:
+                        pipe.unwatch()
+                        return False
+                    pipe.multi()
+                    pipe.hset(key, mapping={
+                        "status": to_status,
+                        "result": json.dumps(result),
+                        "updated_at": time.time(),
+                    })
+                    if to_status in TERMINAL_STATUSES:
+                        pipe.expire(key, self.ttl_seconds)
+                    pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+
+    def update(self, task_id: str, result) -> bool:
+        from redis.exceptions import WatchError
+
+        key = self._key(task_id)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    current = pipe.hget(key, "status")
+                    if current is None or _decode(current) != STARTED:
+                        pipe.unwatch()
+                        return False
+                    pipe.multi()
+                    pipe.hset(key, mapping={"result": json.dumps(result), "updated_at": time.time()})
+                    pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+
+    def delete(self, task_id: str):
+        self.client.delete(self._key(task_id))
+
+    def purge_expired(self) -> int:
+        # Redis expires finished jobs on its own
+        return 0
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def open_job_store(url: str = DEFAULT_STORE_URL) -> JobStore:
+    """Build a job store from a sqlite:/// or redis:// URL."""
+    if url.startswith("sqlite:///"):
+        return SQLiteJobStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisJobStore.from_url(url)
+    raise ValueError(f"Unsupported JOB_STORE_URL: {url}")
+
+
+_store: Optional[JobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """The process-wide job store, opened from JOB_STORE_URL on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = open_job_store()
+        return _store
@@ -0,0 +1,145 @@
+"""
+Worker metrics shared with the API.
+
+GPU workers run in their own processes (or on other hosts), so what they
+measure in memory is invisible to the API. Each worker process publishes a
+snapshot of its metrics (e.g. the batch scheduler's queue waits and batch
+fill) under its own source name, in the same backend as the job store
+(JOB_STORE_URL), and /scheduler/stats serves the latest snapshot of every
+worker. Snapshots are replaced, not summed: percentiles can't be merged
+across processes.
+"""
+
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from job_store import DEFAULT_STORE_URL
+
+# Snapshots older than this come from workers that have gone away (seconds)
+DEFAULT_SNAPSHOT_MAX_AGE = 15 * 60
+
+
+class MetricsStore(abc.ABC):
+    """Interface shared by the metrics backends."""
+
+    @abc.abstractmethod
+    def put_snapshot(self, group: str, source: str, data: Dict):
+        """Replace the snapshot `source` last published under `group`."""
+
+    @abc.abstractmethod
+    def snapshots(self, group: str, max_age: float = DEFAULT_SNAPSHOT_MAX_AGE) -> List[Dict]:
+        """
+        Snapshots of `group` published within `max_age` seconds, as
+        {"source": str, "updated_at": float, **data}, ordered by source.
+        """
+
+
+class SQLiteMetricsStore(MetricsStore):
+    """Snapshots in a SQLite table next to the jobs table (WAL mode)."""
+
+    def __init__(self, path: str = "jobs.db"):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS metric_snapshots (
+                    grp TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (grp, source)
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def put_snapshot(self, group: str, source: str, data: Dict):
+        now = time.time()
+        with self._connect() as conn:
+            # Worker processes get new names when they restart; drop the ones long gone
+            conn.execute("DELETE FROM metric_snapshots WHERE updated_at < ?", (now - DEFAULT_SNAPSHOT_MAX_AGE,))
+            conn.execute(
+                "INSERT OR REPLACE INTO metric_snapshots (grp, source, data, updated_at) VALUES (?, ?, ?, ?)",
+                (group, source, json.dumps(data), now),
+            )
+
+    def snapshots(self, group: str, max_age: float = DEFAULT_SNAPSHOT_MAX_AGE) -> List[Dict]:
+        rows = self._connect().execute(
+            "SELECT source, data, updated_at FROM metric_snapshots WHERE grp = ? AND updated_at >= ? "
+            "ORDER BY source",
+            (group, time.time() - max_age),
+        ).fetchall()
+        return [{"source": source, "updated_at": updated_at, **json.loads(data)}
+                for source, data, updated_at in rows]
+
+
+class RedisMetricsStore(MetricsStore):
+    """Snapshots in one Redis hash per group, keyed by source."""
+
+    def __init__(self, client, prefix: str = "metrics:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisMetricsStore":
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def put_snapshot(self, group: str, source: str, data: Dict):
+        payload = {"updated_at": time.time(), "data": data}
+        self.client.hset(f"{self.prefix}{group}:snapshots", source, json.dumps(payload))
+
+    def snapshots(self, group: str, max_age: float = DEFAULT_SNAPSHOT_MAX_AGE) -> List[Dict]:
+        key = f"{self.prefix}{group}:snapshots"
+        cutoff = time.time() - max_age
+        result, stale = [], []
+        for source, payload in sorted(self.client.hgetall(key).items()):
+            source, payload = _decode(source), json.loads(payload)
+            if payload["updated_at"] < cutoff:
+                stale.append(source)
+                continue
+            result.append({"source": source, "updated_at": payload["updated_at"], **payload["data"]})
+        if stale:
+            self.client.hdel(key, *stale)
+        return result
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def open_metrics_store(url: str = DEFAULT_STORE_URL) -> MetricsStore:
+    """Build a metrics store next to the job store described by `url`."""
+    if url.startswith("sqlite:///"):
+        return SQLiteMetricsStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisMetricsStore.from_url(url)
+    raise ValueError(f"Unsupported JOB_STORE_URL: {url}")
+
+
+_metrics: Optional[MetricsStore] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsStore:
+    """The process-wide metrics store, opened from JOB_STORE_URL on first use."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = open_metrics_store()
+        return _metrics
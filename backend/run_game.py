@@ -1,31 +1,33 @@
-import pygame
+import argparse
 import json
 import os
 import sys
-from PIL import Image
+import zlib
+from pathlib import Path
+
 import numpy as np
+import pygame
+from PIL import Image
 
-# This assumes your engine files are in an 'engine' subfolder
-from engine.player import Player
-from engine.enemy import Enemy
-from engine.platform import Platform
-from engine.level import BackgroundScroller, draw_score
+from generator.manifest import get_manifest
+from generator.postprocess import variant_path
 
-# Initialize Pygame
-pygame.init()
-WIDTH, HEIGHT = 960, 540
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-clock = pygame.time.Clock()
+# This assumes your engine files are in an 'engine' subfolder
+from engine.atlas import SpriteAtlas
+from engine.game import HEIGHT, WIDTH, Game, GameAssets, ScriptedInput, init_display
+from engine.levels import LevelGenerator
+from engine.renderer import FULL, RENDER_MODES
 
 # --- SECTION 1: INTEGRATION - DYNAMIC CONFIGURATION LOADER ---
 # This block is from the new script. It allows Electron to tell the game
 # which specific set of generated assets to run via a command-line argument.
 
-if len(sys.argv) > 1:
-    # If a command-line argument is provided, use it as the path
-    config_path = sys.argv[1]
-    print(f"Loading configuration from provided path: {config_path}")
-else:
+def find_config_path(config_path=None):
+    if config_path:
+        # If a command-line argument is provided, use it as the path
+        print(f"Loading configuration from provided path: {config_path}")
+        return config_path
+
     # This is a fallback for testing the script directly without Electron
     print("Usage: python run_game.py <path_to_config_json>")
     output_dir = "output_model"
@@ -42,27 +44,26 @@ else:
         raise Exception("No config file provided and no fallback found in output_model.")
     config_path = configs[0]
     print(f"No config path provided, using latest found: {config_path}")
+    return config_path
 
-try:
-    with open(config_path) as f:
-        config = json.load(f)
-except FileNotFoundError:
-    print(f"FATAL ERROR: The configuration file was not found at the path: {config_path}")
-    pygame.quit()
-    sys.exit()
-
-# Set the window title from the loaded configuration
-pygame.display.set_caption(config.get("title", "Generative Game"))
+def load_config(config_path):
+    try:
+        with open(config_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"FATAL ERROR: The configuration file was not found at the path: {config_path}")
+        pygame.quit()
+        sys.exit()
 
 # --- SECTION 2: INTEGRATION - ROBUST IMAGE LOADING UTILITIES ---
 
-def load_latest_image(folder):
-    """Finds the most recently modified image in a folder and returns it as a transparent Surface."""
+def latest_image_path(folder):
+    """Finds the most recently modified image in a folder (ignoring pre-scaled variants)."""
     if not os.path.exists(folder):
         raise FileNotFoundError(f"Asset folder not found: {folder}")
     
     files = sorted(
-        [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(('.png', '.jpg', '.jpeg'))],
+        [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(('.png', '.jpg', '.jpeg')) and "@" not in f],
         key=os.path.getmtime,
         reverse=True
     )
@@ -71,7 +72,49 @@ def load_latest_image(folder):
     
     latest_file = files[0]
     print(f"Loading latest image from '{folder}': {os.path.basename(latest_file)}")
-    return load_image_make_transparent(latest_file)
+    return latest_file
+
+def resolve_assets(config):
+    """Exact asset records for this run: from the config itself, else the manifest."""
+    if config.get("assets"):
+        return config["assets"]
+    entry = get_manifest().lookup(job_id=config.get("jobId"), title=config.get("title"))
+    if entry is None:
+        print("[WARN] No manifest entry for this config, falling back to the newest files in assets/")
+        return {}
+    return entry["assets"]
+
+def resolve_atlas(config):
+    """This run's sprite atlas record ({"image", "index"}), or None for runs from before atlases."""
+    if config.get("assets"):
+        return config.get("atlas")
+    entry = get_manifest().lookup(job_id=config.get("jobId"), title=config.get("title"))
+    return entry.get("atlas") if entry else None
+
+def load_atlas(config):
+    atlas = resolve_atlas(config)
+    if atlas is None or not os.path.exists(atlas["index"]):
+        return None
+    print(f"Loading sprites from atlas '{atlas['image']}'")
+    return SpriteAtlas.load(atlas["index"])
+
+def asset_files(assets, asset_type, size):
+    """(original path, pre-scaled variant path) for one asset type of this run."""
+    record = assets.get(asset_type)
+    if record is None:
+        path = latest_image_path(f"assets/{asset_type}")
+        return path, variant_path(path, size)
+    variant = record.get("variants", {}).get(f"{size[0]}x{size[1]}")
+    return record["path"], Path(variant) if variant else variant_path(record["path"], size)
+
+def load_sprite(assets, asset_type, size):
+    """Loads this run's sprite of `asset_type` as a pre-multiplied Surface at `size`."""
+    path, variant = asset_files(assets, asset_type, size)
+    if variant.exists():
+        # Matted, trimmed, scaled and pre-multiplied at generation time
+        return pygame.image.load(str(variant)).convert_alpha()
+    # Assets generated before post-processing existed
+    return pygame.transform.scale(load_image_make_transparent(path), size).premul_alpha()
 
 def load_image_make_transparent(path, colorkey=(255, 255, 255)):
     """Loads an image and sets its white background to be transparent."""
@@ -89,99 +132,73 @@ def darken_color(color, amount=40):
     return tuple(max(c - amount, 0) for c in color)
 
 
-# --- SECTION 3: ASSET AND GAME ENTITY SETUP (FROM ORIGINAL SCRIPT) ---
-# This section now uses the robust loading functions to get the latest assets.
-
-bg_folder = "assets/backgrounds"
-latest_bg_path = sorted([os.path.join(bg_folder, f) for f in os.listdir(bg_folder)], key=os.path.getmtime, reverse=True)[0]
+# --- SECTION 3: ASSET SETUP ---
+# Assets come from the run config / asset manifest; older configs fall back to the latest files.
 
-BG_IMG = pygame.transform.scale(load_image_make_transparent(latest_bg_path), (WIDTH, HEIGHT))
-platform_color = darken_color(get_average_color(latest_bg_path))
+def load_assets(config):
+    assets = resolve_assets(config)
 
-CHAR_IMG = pygame.transform.scale(load_latest_image("assets/characters"), (64, 64))
-ENEMY_IMG = pygame.transform.scale(load_latest_image("assets/enemies"), (64, 64))
-REWARD_IMG = pygame.transform.scale(load_latest_image("assets/rewards"), (32, 32))
+    latest_bg_path, bg_variant_path = asset_files(assets, "backgrounds", (WIDTH, HEIGHT))
+    if bg_variant_path.exists():
+        background = pygame.image.load(str(bg_variant_path)).convert()
+        platform_color = darken_color(get_average_color(bg_variant_path))
+    else:
+        background = pygame.transform.scale(load_image_make_transparent(latest_bg_path), (WIDTH, HEIGHT))
+        platform_color = darken_color(get_average_color(latest_bg_path))
 
-# Game entities are restored to their exact original positions
-player = Player(100, HEIGHT - 40, CHAR_IMG) # Adjusted to be above the platform, not inside it
-reward_rect = pygame.Rect(WIDTH + 200, HEIGHT - 90, 32, 32)
+    # One decode for every sprite when the run has an atlas; otherwise one file each
+    atlas = load_atlas(config)
 
-enemies = [
-    Enemy(WIDTH + 100, HEIGHT - 100, ENEMY_IMG),
-    Enemy(400 + 50, 400 - 64, ENEMY_IMG),
-    Enemy(700 + 50, 300 - 64, ENEMY_IMG),
-    Enemy(1000 + 50, 350 - 64, ENEMY_IMG),
-]
+    def sprite(asset_type, size):
+        if atlas is not None and asset_type in atlas:
+            return atlas.frame(asset_type)
+        return load_sprite(assets, asset_type, size)
 
-# --- SECTION 4: GAME STATE AND MAIN LOOP (FROM ORIGINAL SCRIPT) ---
-# All game logic, including score and health, is preserved from your original script.
+    # Sprites are pre-multiplied, so they are drawn with BLEND_PREMULTIPLIED
+    return GameAssets(
+        background=background,
+        character=sprite("characters", (64, 64)),
+        enemy=sprite("enemies", (64, 64)),
+        reward=sprite("rewards", (32, 32)),
+        platform_color=platform_color,
+    )
 
-score = 0
-bg_scroller = BackgroundScroller(BG_IMG, speed=3)
-platforms = [
-    Platform(0, HEIGHT - 40, WIDTH * 2, 40, color=platform_color),
-    Platform(400, 400, 120, 20, color=platform_color),
-    Platform(700, 300, 100, 20, color=platform_color),
-    Platform(1000, 350, 150, 20, color=platform_color),
-]
-font = pygame.font.SysFont(None, 28)
 
-def draw_hud():
-    # This function, which relies on player.health, is preserved.
-    draw_score(screen, score, player.health)
+# --- SECTION 4: GAME LOOP ---
+# The loop itself lives in engine/game.py so it can also run headless (see engine/benchmark.py).
 
 def main():
-    global score
-    running = True
-
-    while running:
-        clock.tick(60)
-        screen.fill((0, 0, 0))
-        bg_scroller.update()
-        bg_scroller.draw(screen)
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-
-        player.handle_keys()
-        player.update(platforms)
-
-        for enemy in enemies:
-            enemy.rect.x -= bg_scroller.speed
-            if enemy.rect.right < 0:
-                enemy.rect.left = WIDTH + 100
-        reward_rect.x -= bg_scroller.speed
-        if reward_rect.right < 0:
-            reward_rect.left = WIDTH + 300
-        for plat in platforms:
-            plat.move(bg_scroller.speed)
-
-        for enemy in enemies:
-            enemy.check_collision_and_damage(player)
-        if player.rect.colliderect(reward_rect):
-            score += 1
-            reward_rect.left = WIDTH + 300
-
-        for plat in platforms:
-            plat.draw(screen)
-
-        player.draw(screen)
-        for enemy in enemies:
-            enemy.draw(screen)
-        screen.blit(REWARD_IMG, reward_rect)
-        
-        # The HUD (score and health) is drawn on every frame.
-        draw_hud()
-
-        if not player.is_alive():
-            print("Game Over!")
-            running = False
-
-        pygame.display.update()
+    parser = argparse.ArgumentParser(description="Play a generated game.")
+    parser.add_argument("config", nargs="?", help="Per-run config written by the generator")
+    parser.add_argument("--headless", action="store_true", help="Run with SDL's dummy video driver")
+    parser.add_argument("--ticks", type=int, help="Stop after this many simulation ticks (60 per second)")
+    parser.add_argument("--fps", type=int, default=60, help="Render rate cap, 0 for uncapped (gameplay is unaffected)")
+    parser.add_argument("--render", choices=RENDER_MODES, default=FULL,
+                        help="'dirty' repaints only the regions sprites covered and scrolls the rest of "
+                             "the frame in place instead of redrawing the background (see engine/renderer.py)")
+    parser.add_argument("--seed", type=int, help="Level seed (default: derived from the game's title)")
+    parser.add_argument("--jump-every", type=int, help="Scripted input: jump every N ticks instead of the keyboard")
+    args = parser.parse_args()
+
+    config = load_config(find_config_path(args.config))
+    # Set the window title from the loaded configuration
+    screen = init_display(WIDTH, HEIGHT, headless=args.headless, title=config.get("title", "Generative Game"))
+
+    inputs = None
+    if args.jump_every:
+        inputs = ScriptedInput.periodic(pygame.K_SPACE, args.jump_every, hold=1, ticks=args.ticks or 100000)
+    # Levels are streamed in seeded chunks (engine/levels.py), denser each level
+    seed = args.seed if args.seed is not None else zlib.crc32(config.get("title", "").encode("utf-8"))
+    levels = LevelGenerator(seed, num_levels=int(config.get("levels") or 1), width=WIDTH, height=HEIGHT)
+    print(f"Playing {levels.num_levels} level(s), seed {seed}")
+    game = Game(screen, load_assets(config), inputs=inputs, render_mode=args.render, levels=levels)
+    # Headless runs use simulated time (each frame is exactly 1 / fps seconds)
+    render_fps = args.fps or (240 if args.headless else 0)
+    score = game.run(max_ticks=args.ticks, render_fps=render_fps, realtime=not args.headless)
+    print(f"Final score: {score}")
 
     pygame.quit()
     sys.exit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
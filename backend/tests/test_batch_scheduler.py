@@ -0,0 +1,28 @@
+"""Prompts from different jobs share a batch without sharing each other's failures."""
+
+from generator.batch_scheduler import BatchScheduler
+
+
+def _fake_diffuse(prompts, batch_size, on_step=None, **settings):
+    if on_step is not None:
+        for step in (1, 2):
+            on_step(list(range(len(prompts))), step, 2, None)
+    return [f"image of {prompt}" for prompt in prompts]
+
+
+def test_failing_step_callback_only_affects_its_own_job():
+    scheduler = BatchScheduler(window_ms=5000, max_batch_size=2, generate=_fake_diffuse)
+    steps = []
+
+    def broken(index, step, total_steps, latent):
+        raise ValueError("preview encoding failed")
+
+    try:
+        failing = scheduler.submit("a castle", on_step=broken)
+        healthy = scheduler.submit("a forest", on_step=lambda index, step, total, latent: steps.append(step))
+        assert failing.result(timeout=5) == "image of a castle"
+        assert healthy.result(timeout=5) == "image of a forest"
+    finally:
+        scheduler.close()
+    assert steps == [1, 2]
+    assert scheduler.metrics()["batches"] == 1
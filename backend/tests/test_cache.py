@@ -0,0 +1,39 @@
+"""Generation cache counters and stats, shared by every process using the directory."""
+
+from PIL import Image
+
+from generator.cache import GenerationCache
+
+
+def _image(color):
+    return Image.new("RGB", (8, 8), color)
+
+
+def test_counts_are_batched_and_shared(tmp_path):
+    api_side = GenerationCache(tmp_path)
+    worker_side = GenerationCache(tmp_path)  # Another process on the same directory
+
+    worker_side.store_image("a" * 64, _image("red"))
+    assert worker_side.lookup("a" * 64) is not None
+    assert worker_side.lookup("b" * 64) is None
+    assert worker_side.fetch("a" * 64, tmp_path / "out.png")
+
+    # The store was written straight away; later counts wait for the next flush
+    assert api_side.counters()["stores"] == 1
+    worker_side.counters()
+    assert api_side.counters() == {"hits": 2, "misses": 1, "stores": 1, "evictions": 0}
+
+
+def test_stats_cover_entries_stored_by_other_processes(tmp_path):
+    api_side = GenerationCache(tmp_path)
+    worker_side = GenerationCache(tmp_path, max_bytes=1)
+
+    worker_side.store_image("a" * 64, _image("red"))
+    worker_side.store_image("b" * 64, _image("blue"))
+    worker_side.counters()  # Flushes its counts
+
+    stats = api_side.stats()
+    assert stats["entries"] == 1
+    assert stats["bytes"] == (tmp_path / "bb" / f"{'b' * 64}.png").stat().st_size
+    assert stats["stores"] == 2
+    assert stats["evictions"] == 1
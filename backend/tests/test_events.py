@@ -0,0 +1,49 @@
+"""/events resumes after Last-Event-ID and ignores ids it can't have issued."""
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from events import ASSET, STATUS, RedisEventLog, SQLiteEventLog
+from job_store import SQLiteJobStore
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    log = SQLiteEventLog(str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(api, "jobs", store)
+    monkeypatch.setattr(api, "events", log)
+    store.create("job-1")
+    log.publish("job-1", STATUS, {"status": "STARTED", "result": None})
+    log.publish("job-1", ASSET, {"url": "/assets/a.png"})
+    log.publish("job-1", STATUS, {"status": "SUCCESS", "result": {}})
+    # No lifespan: the worker pool isn't needed to read events
+    return TestClient(api.app)
+
+
+def _ids(response):
+    assert response.status_code == 200
+    return [line[len("id: "):] for line in response.text.splitlines() if line.startswith("id: ")]
+
+
+def test_stream_resumes_after_last_event_id(client):
+    assert _ids(client.get("/events/job-1")) == ["1", "2", "3"]
+    assert _ids(client.get("/events/job-1", headers={"Last-Event-ID": "1"})) == ["2", "3"]
+
+
+@pytest.mark.parametrize("header", ["abc", "1.5", "-1", "", "1-0"])
+def test_invalid_last_event_id_starts_over(client, header):
+    assert _ids(client.get("/events/job-1", headers={"Last-Event-ID": header})) == ["1", "2", "3"]
+
+
+def test_each_backend_accepts_its_own_ids(tmp_path):
+    redis_log = RedisEventLog(fakeredis.FakeRedis())
+    sqlite_log = SQLiteEventLog(str(tmp_path / "jobs.db"))
+    redis_id = redis_log.publish("job-1", STATUS, {"status": "STARTED"})
+    sqlite_id = sqlite_log.publish("job-1", STATUS, {"status": "STARTED"})
+
+    assert redis_log.is_event_id(redis_id) and redis_log.is_event_id(sqlite_id)
+    assert sqlite_log.is_event_id(sqlite_id) and not sqlite_log.is_event_id(redis_id)
+    assert not redis_log.is_event_id("abc")
@@ -0,0 +1,81 @@
+"""The SQLite and Redis job stores honour the same contract."""
+
+import time
+
+import fakeredis
+import pytest
+
+from job_store import FAILURE, QUEUED, STARTED, SUCCESS, RedisJobStore, SQLiteJobStore
+
+TTL_SECONDS = 1
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteJobStore(str(tmp_path / "jobs.db"), ttl_seconds=TTL_SECONDS)
+    return RedisJobStore(fakeredis.FakeRedis(), ttl_seconds=TTL_SECONDS)
+
+
+def test_create_and_get(store):
+    created = store.create("job-1", owner="host:1:abc")
+    assert created["status"] == QUEUED
+
+    job = store.get("job-1")
+    assert job["status"] == QUEUED
+    assert job["result"] is None
+    assert job["owner"] == "host:1:abc"
+    assert store.get("missing") is None
+
+
+def test_job_starts_only_once(store):
+    store.create("job-1")
+    assert store.transition("job-1", STARTED)
+    assert not store.transition("job-1", STARTED)
+    assert store.get("job-1")["status"] == STARTED
+
+
+def test_illegal_transitions_are_refused(store):
+    store.create("job-1")
+    assert not store.transition("job-1", SUCCESS)
+    assert not store.update("job-1", {"done": 1})
+    assert not store.transition("missing", STARTED)
+
+    assert store.transition("job-1", STARTED)
+    assert store.update("job-1", {"done": 1})
+    assert store.get("job-1")["result"] == {"done": 1}
+    assert store.transition("job-1", SUCCESS, {"url": "/assets/a.png"})
+
+    # Finished jobs are final
+    assert not store.transition("job-1", FAILURE, "late")
+    assert not store.update("job-1", {"done": 2})
+    assert store.get("job-1")["result"] == {"url": "/assets/a.png"}
+
+
+def test_unfinished_lists_queued_and_started_jobs(store):
+    for task_id in ("queued", "started", "done"):
+        store.create(task_id)
+    store.transition("started", STARTED)
+    store.transition("done", FAILURE, "boom")
+    assert [job["task_id"] for job in store.unfinished()] == ["queued", "started"]
+
+
+def test_finished_jobs_expire_after_ttl(store):
+    store.create("running")
+    store.transition("running", STARTED)
+    store.create("done")
+    store.transition("done", STARTED)
+    store.transition("done", SUCCESS, {"url": "/assets/a.png"})
+    assert store.get("done")["status"] == SUCCESS
+
+    time.sleep(TTL_SECONDS + 0.2)
+    assert store.get("done") is None
+    assert store.get("running")["status"] == STARTED
+    store.purge_expired()
+    assert store.get("done") is None
+
+
+def test_delete(store):
+    store.create("job-1")
+    store.delete("job-1")
+    assert store.get("job-1") is None
@@ -0,0 +1,29 @@
+"""Streaming chunks reuses pooled entities, so memory stays flat after warm-up."""
+
+import pygame
+
+from engine import bench_levels
+
+CHUNKS = 12
+# Chunks played before the pools and caches are expected to have settled
+WARM_UP = 3
+# Allowed growth of live Python memory over the chunks after warm-up (KB)
+MAX_LIVE_GROWTH_KB = 16
+
+
+def test_pools_and_memory_stay_flat_while_streaming():
+    try:
+        game, samples = bench_levels.run(levels=1, chunks_per_level=CHUNKS, seed=1234, draw=True)
+    finally:
+        pygame.quit()
+
+    assert game.levels.next_chunk == CHUNKS
+    settled = samples[WARM_UP:]
+    assert len(settled) >= CHUNKS // 2
+
+    # Every entity after warm-up comes out of a pool rather than being created
+    assert {sample["pooled"] for sample in settled} == {settled[0]["pooled"]}
+    assert max(sample["store_rows"] for sample in settled) <= settled[0]["pooled"]
+
+    growth = settled[-1]["live_kb"] - min(sample["live_kb"] for sample in settled)
+    assert growth < MAX_LIVE_GROWTH_KB, [round(sample["live_kb"], 1) for sample in samples]
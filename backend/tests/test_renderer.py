@@ -0,0 +1,44 @@
+"""Dirty-rect rendering draws exactly what a full redraw does, scrolling or not."""
+
+import hashlib
+
+import pygame
+import pytest
+
+from engine.benchmark import make_game
+from engine.game import HEIGHT, WIDTH, init_display
+from engine.renderer import DIRTY, FULL
+
+FRAMES = 240
+SEED = 7
+
+
+def _frames(screen, scenario, mode):
+    game = make_game(screen, scenario, SEED, FRAMES, mode)
+    hashes = []
+    for tick in range(FRAMES):
+        game.update()
+        # Interpolated frames too, so the background moves by uneven amounts
+        game.draw(0.5 if tick % 3 else 1.0)
+        game.renderer.present()
+        hashes.append(hashlib.sha1(pygame.image.tobytes(screen, "RGB")).hexdigest())
+    return hashes, game.renderer
+
+
+@pytest.fixture(scope="module")
+def screen():
+    yield init_display(WIDTH, HEIGHT, headless=True, title="renderer test")
+    pygame.quit()
+
+
+@pytest.mark.parametrize("scroll_speed", [3, 0])
+def test_dirty_frames_match_full_frames(screen, scroll_speed):
+    scenario = {"name": "baseline", "enemies": 4, "platforms": 4, "background": [WIDTH, HEIGHT],
+                "scroll_speed": scroll_speed}
+    full, _ = _frames(screen, scenario, FULL)
+    dirty, renderer = _frames(screen, scenario, DIRTY)
+
+    assert [tick for tick, (a, b) in enumerate(zip(full, dirty)) if a != b] == []
+    # Only the first frame and background loop-arounds are full redraws
+    assert renderer.dirty_frames >= FRAMES - 5
+    assert renderer.scrolled_frames == (renderer.dirty_frames if scroll_speed else 0)
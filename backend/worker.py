@@ -1,16 +1,43 @@
 import os
+import io
 import json
+import time
+import base64
+import socket
 from pathlib import Path
-from datetime import datetime
-from typing import Literal, Dict
+from typing import Literal
 
 # Make sure this import path is correct for your project
 # You might need to adjust it based on your folder structure and how you run the app.
-from generator.image_generator import generate_image 
+from generator.asset_pipeline import AssetPipeline, asset_specs, compose_prompts
+from generator.image_generator import latent_preview
+from generator.atlas import build_game_atlas
+from generator.batch_scheduler import get_scheduler
+from generator.bulk import plan_batch, run_batch
+from generator.manifest import get_manifest
+from job_store import JobStore, STARTED, SUCCESS, FAILURE
+from events import get_event_log, STATUS, ASSET, PROGRESS, PREVIEW
+from metrics import get_metrics
 
 ASSET_DIR = Path("assets")
 OUTPUT_MODEL_DIR = Path("output_model")
 
+# Result keys the frontend reads for each asset type
+URL_KEYS = {
+    "characters": "characterUrl",
+    "backgrounds": "backgroundUrl",
+    "rewards": "rewardUrl",
+    "enemies": "enemyUrl",
+}
+
+# Publish a progress event every N denoising steps, and a latent preview every
+# M steps when the request asked for previews
+PROGRESS_EVERY = 5
+PREVIEW_EVERY = 10
+
+# A bulk job's aggregate progress is saved and published at most this often
+BATCH_PROGRESS_SECONDS = 1.0
+
 def make_dirs():
     # Create required asset and output directories if they don't exist
     for subdir in ["characters", "backgrounds", "rewards", "enemies"]:
@@ -18,18 +45,54 @@ def make_dirs():
     OUTPUT_MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def run_asset_generation(task_id: str, config: dict, jobs_db: Dict):
+def emit(task_id: str, event_type: str, data: dict):
+    # Progress reporting must never break the job itself
+    try:
+        get_event_log().publish(task_id, event_type, data)
+    except Exception as e:
+        print(f"[WARN] Could not publish {event_type} event for {task_id}: {e}")
+
+
+def publish_scheduler_metrics():
+    # This process's batching stats, for the API's /scheduler/stats
+    try:
+        source = f"{socket.gethostname()}:{os.getpid()}"
+        get_metrics().put_snapshot("scheduler", source, get_scheduler().metrics())
+    except Exception as e:
+        print(f"[WARN] Could not publish scheduler metrics: {e}")
+
+
+def _encode_preview(latent) -> str:
+    buffer = io.BytesIO()
+    latent_preview(latent).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def _build_atlas(records: dict, run_id: str):
+    # The game can still load the sprites one by one, so a failed atlas doesn't fail the job
+    try:
+        return build_game_atlas(records, run_id)
+    except Exception as e:
+        print(f"[WARN] Could not build the sprite atlas: {e}")
+        return None
+
+
+def run_asset_generation(task_id: str, config: dict, jobs_db: JobStore):
     """
     This function contains the core logic from your old `generate_assets.py`.
     It's designed to be run in the background.
 
     :param task_id: The ID of the job we're running.
     :param config: Dictionary with prompts from the frontend.
-    :param jobs_db: The shared dictionary to update job status.
+    :param jobs_db: The shared job store to update job status.
     """
     print(f"Starting job {task_id}...")
-    jobs_db[task_id]["status"] = "STARTED"
-    
+    if not jobs_db.transition(task_id, STARTED):
+        # Another worker already picked this job up (or it expired)
+        print(f"Job {task_id} is not queued, skipping.")
+        return
+    emit(task_id, STATUS, {"status": STARTED, "result": None})
+
     try:
         make_dirs()
 
@@ -50,13 +113,7 @@ def run_asset_generation(task_id: str, config: dict, jobs_db: Dict):
         style = "pixel" # You could pass this from the frontend too!
         white_bg = True # For character/enemy sprites
 
-        # Compose prompts
-        prompts = {
-            "characters": f"{style} sprite of {prompt_map['character']}, 2D side view, {'white background' if white_bg else 'transparent background'}",
-            "backgrounds": f"{style} background: {prompt_map['background']}, seamless, game backdrop",
-            "rewards": f"{style} icon of {prompt_map['reward']}, 2D, isolated, transparent background",
-            "enemies": f"{style} enemy: {prompt_map['enemy']}, 2D side view, pixel art style, {'white background' if white_bg else 'transparent background'}"
-        }
+        prompts = compose_prompts(prompt_map, style=style, white_bg=white_bg)
 
         # The result object that the frontend expects
         generated_asset_paths = {
@@ -64,33 +121,129 @@ def run_asset_generation(task_id: str, config: dict, jobs_db: Dict):
             "configPath": str(run_config_path) # Path to the specific config for this run
         }
 
-        # Use a timestamp to ensure unique filenames
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-        for asset_type, prompt in prompts.items():
-            print(f"Generating {asset_type[:-1]} with prompt: {prompt}")
-            # The path where the image will be saved (relative to the backend root)
-            relative_save_path = Path("assets") / asset_type / f"{asset_type[:-1]}_{timestamp}.png"
-            
-            # Call your actual image generator
-            generate_image(prompt, str(relative_save_path))
-            
-            # Store the URL-friendly path for the frontend
-            # This corresponds to the StaticFiles mount in api.py
-            if asset_type == "characters":
-                generated_asset_paths["characterUrl"] = str(relative_save_path).replace("\\", "/")
-            elif asset_type == "backgrounds":
-                generated_asset_paths["backgroundUrl"] = str(relative_save_path).replace("\\", "/")
-            elif asset_type == "rewards":
-                generated_asset_paths["rewardUrl"] = str(relative_save_path).replace("\\", "/")
-            elif asset_type == "enemies":
-                generated_asset_paths["enemyUrl"] = str(relative_save_path).replace("\\", "/")
+        # The task id keeps file names unique: jobs running at the same time share the asset folders
+        # Paths are relative to the backend root, matching the StaticFiles mount in api.py
+        specs = asset_specs(prompts, "assets", task_id)
+        for spec in specs:
+            print(f"Generating {spec.asset_type[:-1]} with prompt: {spec.prompt}")
+
+        want_previews = bool(config.get("previews"))
+
+        def on_saved(spec, path):
+            # Stream each asset to the frontend as soon as it is on disk
+            emit(task_id, ASSET, {"asset": spec.asset_type, "key": URL_KEYS[spec.asset_type], "url": path.replace("\\", "/")})
+
+        def on_step(spec, step, total_steps, latent):
+            # Runs inside a diffusion batch shared with other jobs: an error here
+            # must not reach the pipeline, or every job in the batch fails
+            try:
+                if step % PROGRESS_EVERY == 0 or step == total_steps:
+                    emit(task_id, PROGRESS, {"asset": spec.asset_type, "step": step, "total": total_steps})
+                if want_previews and latent is not None and step % PREVIEW_EVERY == 0:
+                    emit(task_id, PREVIEW, {"asset": spec.asset_type, "step": step, "image": _encode_preview(latent)})
+            except Exception as e:
+                print(f"[WARN] Could not report step {step} of {spec.asset_type} for {task_id}: {e}")
+
+        # Diffusion shares batches with other jobs on this worker; background removal,
+        # resizing and PNG encoding run on the CPU pool while the GPU moves on
+        results = AssetPipeline().run(specs, on_step=on_step, on_saved=on_saved)
+
+        failed = {}
+        for asset_type, result in results.items():
+            if result.error is not None:
+                failed[asset_type] = result.error
+            else:
+                # Store the URL-friendly path for the frontend
+                generated_asset_paths[URL_KEYS[asset_type]] = result.path.replace("\\", "/")
+
+        if failed:
+            # Keep the assets that did succeed so the frontend can still show them
+            print(f"Job {task_id} failed for: {', '.join(failed)}")
+            error = {"error": f"Failed to generate {', '.join(failed)}", "failedAssets": failed, **generated_asset_paths}
+            jobs_db.transition(task_id, FAILURE, error)
+            emit(task_id, STATUS, {"status": FAILURE, "result": error})
+            return
+
+        # Record exactly which files belong to this run, and point the run config at
+        # them so run_game doesn't have to guess from directory listings
+        records = {t: r.record for t, r in results.items()}
+        entry = get_manifest().append(task_id, config['title'], records, atlas=_build_atlas(records, task_id))
+        run_config = {**config, "jobId": task_id, "assets": entry["assets"]}
+        if "atlas" in entry:
+            run_config["atlas"] = entry["atlas"]
+        with open(run_config_path, 'w') as f:
+            json.dump(run_config, f, indent=4)
 
         print(f"Job {task_id} completed successfully.")
-        jobs_db[task_id]["status"] = "SUCCESS"
-        jobs_db[task_id]["result"] = generated_asset_paths
+        jobs_db.transition(task_id, SUCCESS, generated_asset_paths)
+        emit(task_id, STATUS, {"status": SUCCESS, "result": generated_asset_paths})
 
     except Exception as e:
         print(f"Job {task_id} failed: {e}")
-        jobs_db[task_id]["status"] = "FAILURE"
-        jobs_db[task_id]["result"] = str(e)
\ No newline at end of file
+        jobs_db.transition(task_id, FAILURE, str(e))
+        emit(task_id, STATUS, {"status": FAILURE, "result": str(e)})
+    finally:
+        publish_scheduler_metrics()
+
+
+def run_batch_generation(task_id: str, config: dict, jobs_db: JobStore):
+    """
+    Bulk job queued by /generate-batch: every subject in config['prompts'],
+    in every style of config['styles'], as config['asset_type'] assets.
+
+    While it runs, the job's result holds the aggregate progress (done, failed,
+    images/s, ETA), also published as progress events; each image is published
+    as an asset event as soon as it is saved. The job succeeds if anything was
+    generated and lists whatever failed.
+
+    :param task_id: The batch ID.
+    :param config: Request body from /generate-batch.
+    :param jobs_db: The shared job store to update job status.
+    """
+    print(f"Starting batch {task_id}...")
+    if not jobs_db.transition(task_id, STARTED):
+        print(f"Batch {task_id} is not queued, skipping.")
+        return
+    emit(task_id, STATUS, {"status": STARTED, "result": None})
+
+    try:
+        plan = plan_batch(config["prompts"], config["asset_type"], config["styles"], config.get("white_bg", True),
+                          ASSET_DIR / "batches" / task_id)
+        print(f"[BULK] {task_id}: {len(plan.specs)} prompt(s), {plan.duplicates} duplicate(s) skipped")
+        styles = {spec.output_path: style for spec, style in zip(plan.specs, plan.styles)}
+        last_published = [0.0]
+
+        def on_result(result, progress):
+            if result.error is None:
+                emit(task_id, ASSET, {"asset": result.spec.asset_type, "style": styles[result.path],
+                                      "prompt": result.spec.prompt, "url": result.path.replace("\\", "/")})
+            now = time.monotonic()
+            finished = progress.done + progress.failed
+            if now - last_published[0] >= BATCH_PROGRESS_SECONDS or finished == progress.total:
+                last_published[0] = now
+                snapshot = {"batchId": task_id, **progress.snapshot()}
+                jobs_db.update(task_id, snapshot)
+                emit(task_id, PROGRESS, snapshot)
+
+        results, progress = run_batch(plan, on_result=on_result)
+
+        summary = {
+            "batchId": task_id,
+            "assetType": config["asset_type"],
+            **progress.snapshot(),
+            "assets": [{"url": r.path.replace("\\", "/"), "prompt": r.spec.prompt, "style": style}
+                       for r, style in zip(results, plan.styles) if r.error is None],
+            "failedAssets": {r.spec.prompt: r.error for r in results if r.error is not None},
+        }
+        status = SUCCESS if progress.done or not plan.specs else FAILURE
+        print(f"[BULK] {task_id}: {progress.done} done, {progress.failed} failed "
+              f"({summary['images_per_second']} images/s)")
+        jobs_db.transition(task_id, status, summary)
+        emit(task_id, STATUS, {"status": status, "result": summary})
+
+    except Exception as e:
+        print(f"Batch {task_id} failed: {e}")
+        jobs_db.transition(task_id, FAILURE, str(e))
+        emit(task_id, STATUS, {"status": FAILURE, "result": str(e)})
+    finally:
+        publish_scheduler_metrics()
@@ -0,0 +1,508 @@
+"""
+GPU worker pool fed by a bounded priority queue.
+
+The API puts jobs on a broker instead of running diffusion in its own
+threadpool. A fixed number of worker processes each own a copy of the model
+(loaded once at startup through the model registry) and pull jobs in priority
+order, so interactive /generate-game requests run ahead of bulk dataset jobs.
+When the queue is full, `submit` raises QueueFullError and the API answers 429.
+
+Brokers:
+    memory://                  in-process heap (default; workers must be embedded in the API,
+                               and only one process per host may run them: see WorkerPool.start)
+    redis://localhost:6379/0   shared sorted set, so several API processes can
+                               enqueue and a standalone pool (`python worker_pool.py`) runs the jobs
+
+Job handlers are referenced by "module:function" and called in the worker as
+handler(task_id, payload, job_store).
+"""
+
+import argparse
+import fcntl
+import heapq
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+DEFAULT_BROKER_URL = os.getenv("BROKER_URL", "memory://")
+DEFAULT_MAX_QUEUE = int(os.getenv("MAX_QUEUE", "32"))
+DEFAULT_WORKERS = int(os.getenv("GPU_WORKERS", "1"))
+DEFAULT_MODE = os.getenv("WORKER_MODE", "process")
+# Jobs each worker runs at once; above 1 lets the batch scheduler merge their prompts
+DEFAULT_SLOTS = int(os.getenv("WORKER_SLOTS", "2"))
+# How often the pool checks that its workers are still alive
+MONITOR_SECONDS = 1.0
+# Held by the process running an in-memory pool, so a host runs at most one
+POOL_LOCK_FILE = os.getenv("POOL_LOCK_FILE", "worker_pool.lock")
+LOST_ON_RESTART = "Lost on restart: the server holding this job stopped before the job finished"
+
+
+class QueueFullError(Exception):
+    """Raised by submit when the broker already holds max_size jobs."""
+
+    def __init__(self, position: int, max_size: int):
+        super().__init__(f"Generation queue is full ({max_size} jobs waiting)")
+        self.position = position
+        self.max_size = max_size
+
+
+class BrokerClosedError(Exception):
+    """Raised by submit once the pool has started shutting down."""
+
+
+# --- Brokers ---
+
+class InProcessBroker:
+    """Bounded priority queue living in this process. Lower priority values run first."""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_QUEUE):
+        self.max_size = max_size
+        self.closed = False
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def put(self, job: Dict, priority: int = PRIORITY_INTERACTIVE) -> int:
+        """Queue a job and return its 1-based position."""
+        with self._cond:
+            if self.closed:
+                raise BrokerClosedError("Worker pool is shutting down")
+            if len(self._heap) >= self.max_size:
+                ahead = sum(1 for entry in self._heap if entry[0] <= priority)
+                raise QueueFullError(ahead + 1, self.max_size)
+            entry = (priority, next(self._seq), job)
+            heapq.heappush(self._heap, entry)
+            self._cond.notify()
+            return sum(1 for other in self._heap if other[:2] < entry[:2]) + 1
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Next job by priority. None on timeout, or once closed and empty."""
+        with self._cond:
+            if not self._heap and not self.closed:
+                self._cond.wait(timeout)
+            if not self._heap:
+                return None
+            return heapq.heappop(self._heap)[2]
+
+    def position(self, task_id: str) -> Optional[int]:
+        with self._cond:
+            for rank, entry in enumerate(sorted(self._heap, key=lambda e: e[:2]), start=1):
+                if entry[2]["task_id"] == task_id:
+                    return rank
+        return None
+
+    def drain_pending(self) -> List[Dict]:
+        """Remove and return every queued job."""
+        with self._cond:
+            jobs = [entry[2] for entry in sorted(self._heap, key=lambda e: e[:2])]
+            self._heap.clear()
+            return jobs
+
+    def close(self):
+        """Reject new jobs; get() keeps handing out what is already queued."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._heap)
+
+
+class RedisBroker:
+    """
+    Bounded priority queue in a Redis sorted set (score = priority, then
+    arrival order). Works with any redis-py compatible client.
+    """
+
+    def __init__(self, client, max_size: int = DEFAULT_MAX_QUEUE, name: str = "gpu_jobs"):
+        self.client = client
+        self.max_size = max_size
+        self.closed = False
+        self.key = f"{name}:queue"
+        self.index_key = f"{name}:index"
+        self.seq_key = f"{name}:seq"
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisBroker":
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def put(self, job: Dict, priority: int = PRIORITY_INTERACTIVE) -> int:
+        from redis.exceptions import WatchError
+
+        if self.closed:
+            raise BrokerClosedError("Worker pool is shutting down")
+        seq = self.client.incr(self.seq_key)
+        # Priority in the high bits, arrival order in the low bits
+        score = priority * 2 ** 32 + seq
+        member = json.dumps(job)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(self.key)
+                    size = pipe.zcard(self.key)
+                    if size >= self.max_size:
+                        pipe.unwatch()
+                        ahead = self.client.zcount(self.key, "-inf", (priority + 1) * 2 ** 32 - 1)
+                        raise QueueFullError(ahead + 1, self.max_size)
+                    pipe.multi()
+                    pipe.zadd(self.key, {member: score})
+                    pipe.hset(self.index_key, job["task_id"], member)
+                    pipe.execute()
+                    break
+                except WatchError:
+                    continue
+        return self.position(job["task_id"]) or 1
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        if self.closed:
+            # Leave queued jobs in Redis for the next pool to pick up
+            return None
+        popped = self.client.bzpopmin(self.key, timeout=timeout or 0)
+        if not popped:
+            return None
+        job = json.loads(popped[1])
+        self.client.hdel(self.index_key, job["task_id"])
+        return job
+
+    def position(self, task_id: str) -> Optional[int]:
+        member = self.client.hget(self.index_key, task_id)
+        if member is None:
+            return None
+        rank = self.client.zrank(self.key, member)
+        return rank + 1 if rank is not None else None
+
+    def drain_pending(self) -> List[Dict]:
+        # Jobs stay in Redis; another pool process will run them
+        return []
+
+    def close(self):
+        self.closed = True
+
+    def __len__(self):
+        return self.client.zcard(self.key)
+
+
+def open_broker(url: str = DEFAULT_BROKER_URL, max_size: int = DEFAULT_MAX_QUEUE):
+    """Build a broker from a memory:// or redis:// URL."""
+    if url.startswith("memory://"):
+        return InProcessBroker(max_size)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker.from_url(url, max_size=max_size)
+    raise ValueError(f"Unsupported BROKER_URL: {url}")
+
+
+# --- Worker side ---
+
+def _resolve_handler(path: str):
+    module_name, _, func_name = path.partition(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _publish_failure(task_id: str, result: str):
+    from events import get_event_log, STATUS
+    from job_store import FAILURE
+
+    get_event_log().publish(task_id, STATUS, {"status": FAILURE, "result": result})
+
+
+def _run_job(job: Dict, store, done_queue):
+    from job_store import FAILURE
+
+    task_id = job["task_id"]
+    try:
+        _resolve_handler(job["handler"])(task_id, job["payload"], store)
+    except Exception as e:
+        # Handlers record their own failures; this catches ones that couldn't
+        print(f"[WORKER] Job {task_id} crashed: {e}")
+        if store.transition(task_id, FAILURE, str(e)):
+            _publish_failure(task_id, str(e))
+    finally:
+        done_queue.put(task_id)
+
+
+def _worker_main(task_queue, done_queue, slots: int = 1, warm_model: bool = True):
+    """
+    Worker loop. Runs in its own process (or thread in "thread" mode), loads
+    the model once, then executes the jobs on its own queue, up to `slots` at
+    a time (the pool never sends it more), until it receives a None sentinel.
+    """
+    from job_store import get_job_store
+
+    if warm_model:
+        from generator.model_registry import get_pipeline
+        get_pipeline()
+    store = get_job_store()
+
+    with ThreadPoolExecutor(max_workers=slots) as executor:
+        while True:
+            job = task_queue.get()
+            if job is None:
+                break
+            executor.submit(_run_job, job, store, done_queue)
+
+
+# --- Pool ---
+
+class WorkerPool:
+    """
+    Runs queued jobs on `num_workers` model-owning workers.
+
+    :param num_workers: Worker processes (or threads), each with its own model copy.
+    :param broker: Where jobs wait. Defaults to one opened from BROKER_URL.
+    :param mode: "process" for real deployments, "thread" to keep everything in
+        this process (tests, stub backend).
+    :param slots_per_worker: Jobs a worker runs at once. Above 1 lets jobs on
+        the same worker share pipeline batches.
+    :param warm_model: Load the model when a worker starts rather than on its first job.
+    """
+
+    def __init__(self, num_workers: int = DEFAULT_WORKERS, broker=None, mode: str = DEFAULT_MODE,
+                 slots_per_worker: int = DEFAULT_SLOTS, warm_model: bool = True):
+        if mode not in ("process", "thread"):
+            raise ValueError(f"Unknown worker mode: {mode}")
+        self.num_workers = num_workers
+        self.broker = broker if broker is not None else open_broker()
+        self.mode = mode
+        self.slots_per_worker = slots_per_worker
+        self.warm_model = warm_model
+
+        self._slots = threading.Semaphore(num_workers * slots_per_worker)
+        self._in_flight: Dict[str, Dict] = {}
+        self._idle = threading.Condition()
+        self._workers = []
+        self._threads = []
+        self._started = False
+        self._stopping = False
+        self._task_queues = []
+        self._free = []
+        self._lock_file = None
+
+        # Jobs on an in-memory broker die with this process; the API stamps them
+        # with this id so the next pool on the host can tell they were lost
+        self.owner = None
+        if isinstance(self.broker, InProcessBroker):
+            self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def start(self):
+        if self._started:
+            return
+        if self.owner is not None:
+            self._lock_host()
+            self._fail_lost_jobs()
+        self._started = True
+        self._stopping = False
+        self._threads = []
+
+        if self.mode == "process":
+            ctx = multiprocessing.get_context("spawn")
+            self._done_queue = ctx.Queue()
+            self._new_queue, self._spawn = ctx.Queue, ctx.Process
+        else:
+            self._done_queue = queue.Queue()
+            self._new_queue, self._spawn = queue.Queue, threading.Thread
+
+        # One task queue per worker, so the pool always knows which worker holds
+        # which job and never gives a worker more jobs than it has slots
+        self._task_queues = [None] * self.num_workers
+        self._workers = [None] * self.num_workers
+        self._free = [self.slots_per_worker] * self.num_workers
+        for i in range(self.num_workers):
+            self._start_worker(i)
+
+        for target in (self._dispatch, self._collect, self._monitor):
+            thread = threading.Thread(target=target, name=f"pool-{target.__name__[1:]}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"[POOL] Started {self.num_workers} {self.mode} worker(s)")
+
+    def _start_worker(self, worker_id: int):
+        task_queue = self._new_queue()
+        worker = self._spawn(
+            target=_worker_main,
+            args=(task_queue, self._done_queue, self.slots_per_worker, self.warm_model),
+            name=f"gpu-worker-{worker_id}",
+            daemon=True,
+        )
+        worker.start()
+        self._task_queues[worker_id] = task_queue
+        self._workers[worker_id] = worker
+
+    def _lock_host(self):
+        # Every embedded pool loads its own model copies onto the same GPUs, and
+        # a second one would fail the first one's jobs as lost: allow only one
+        lock_file = open(POOL_LOCK_FILE, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(
+                "Another process on this host already runs an in-memory worker pool. "
+                "Run a single API process (no `uvicorn --workers N`), or use "
+                "BROKER_URL=redis://... with EMBEDDED_WORKERS=0 and `python worker_pool.py`."
+            )
+        self._lock_file = lock_file
+
+    def _fail_lost_jobs(self):
+        # The in-memory queue of this host's previous pool is gone: its QUEUED
+        # jobs will never run and its STARTED ones will never finish
+        from job_store import FAILURE, get_job_store
+
+        store = get_job_store()
+        host = f"{socket.gethostname()}:"
+        lost = 0
+        for job in store.unfinished():
+            owner = job.get("owner")
+            if owner and owner.startswith(host) and owner != self.owner:
+                if store.transition(job["task_id"], FAILURE, LOST_ON_RESTART):
+                    _publish_failure(job["task_id"], LOST_ON_RESTART)
+                    lost += 1
+        if lost:
+            print(f"[POOL] Failed {lost} job(s) lost when the previous server stopped")
+
+    def submit(self, task_id: str, handler: str, payload: Dict, priority: int = PRIORITY_INTERACTIVE) -> int:
+        """
+        Queue a job and return its 1-based queue position.
+        Raises QueueFullError (-> HTTP 429) when the queue is at capacity.
+        """
+        job = {"task_id": task_id, "handler": handler, "payload": payload}
+        return self.broker.put(job, priority)
+
+    def position(self, task_id: str) -> Optional[int]:
+        return self.broker.position(task_id)
+
+    def _dispatch(self):
+        # Only take a job off the broker once a worker slot is free, so
+        # priorities are decided at the last moment
+        while True:
+            self._slots.acquire()
+            job = self.broker.get(timeout=0.5)
+            if job is None:
+                self._slots.release()
+                if self.broker.closed:
+                    return
+                continue
+            with self._idle:
+                # The least busy worker; a free slot exists because _slots was acquired
+                worker_id = max(range(self.num_workers), key=lambda i: self._free[i])
+                self._free[worker_id] -= 1
+                self._in_flight[job["task_id"]] = {**job, "worker_id": worker_id}
+                self._task_queues[worker_id].put(job)
+
+    def _collect(self):
+        while True:
+            task_id = self._done_queue.get()
+            if task_id is None:
+                return
+            with self._idle:
+                job = self._in_flight.pop(task_id, None)
+                if job is None:
+                    # Already failed by the monitor
+                    continue
+                self._free[job["worker_id"]] += 1
+                self._idle.notify_all()
+            self._slots.release()
+
+    def _monitor(self):
+        # A worker that dies (OOM, CUDA abort, segfault) never reports its jobs
+        # done: fail them, give their slots back and start a replacement
+        from job_store import FAILURE, get_job_store
+
+        while not self._stopping:
+            time.sleep(MONITOR_SECONDS)
+            for worker_id, worker in enumerate(self._workers):
+                if self._stopping or worker.is_alive():
+                    continue
+                exitcode = getattr(worker, "exitcode", None)
+                reason = f"Worker crashed (exit code {exitcode})" if exitcode is not None else "Worker crashed"
+                with self._idle:
+                    lost = [task_id for task_id, job in self._in_flight.items() if job["worker_id"] == worker_id]
+                    for task_id in lost:
+                        del self._in_flight[task_id]
+                    self._free[worker_id] = self.slots_per_worker
+                    self._start_worker(worker_id)
+                    self._idle.notify_all()
+                store = get_job_store()
+                for task_id in lost:
+                    if store.transition(task_id, FAILURE, reason):
+                        _publish_failure(task_id, reason)
+                    self._slots.release()
+                print(f"[POOL] gpu-worker-{worker_id} died (exit code {exitcode}); failed {len(lost)} job(s) and restarted it")
+
+    def shutdown(self, drain: bool = True, timeout: Optional[float] = None):
+        """
+        Stop accepting jobs and wait for running ones to finish. With drain=True
+        queued jobs are run first; otherwise they are marked FAILURE.
+        """
+        if not self._started:
+            return
+        from job_store import FAILURE, get_job_store
+
+        print(f"[POOL] Shutting down ({'draining' if drain else 'cancelling'} {len(self.broker)} queued job(s))")
+        if not drain:
+            store = get_job_store()
+            for job in self.broker.drain_pending():
+                if store.transition(job["task_id"], FAILURE, "Cancelled: server shutting down"):
+                    _publish_failure(job["task_id"], "Cancelled: server shutting down")
+        self.broker.close()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        dispatcher = self._threads[0]
+        dispatcher.join(timeout)
+        with self._idle:
+            while self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    print(f"[POOL] Gave up waiting for {len(self._in_flight)} running job(s)")
+                    break
+                self._idle.wait(remaining)
+
+        self._stopping = True
+        for task_queue in self._task_queues:
+            task_queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._done_queue.put(None)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        self._started = False
+        print("[POOL] Stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a standalone GPU worker pool against a shared broker.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--slots", type=int, default=DEFAULT_SLOTS, help="Concurrent jobs per worker")
+    parser.add_argument("--broker", default=DEFAULT_BROKER_URL)
+    args = parser.parse_args()
+
+    if args.broker.startswith("memory://"):
+        parser.error("A standalone pool needs a shared broker, e.g. --broker redis://localhost:6379/0")
+
+    pool = WorkerPool(args.workers, open_broker(args.broker), mode="process", slots_per_worker=args.slots)
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    pool.start()
+    stop.wait()
+    pool.shutdown(drain=True)
+
+
+if __name__ == "__main__":
+    main()
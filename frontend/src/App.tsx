@@ -86,27 +86,45 @@ function App() {
     const [latestJob, setLatestJob] = useState<Job | null>(null);
     const [isGenerating, setIsGenerating] = useState<boolean>(false);
     const [showPreview, setShowPreview] = useState<boolean>(false);
+    // Assets and per-asset progress streamed in while the job is still running
+    const [assetUrls, setAssetUrls] = useState<Partial<GameResult>>({});
+    const [progress, setProgress] = useState<Record<string, number>>({});
+
+    const jobFinished = latestJob?.status === 'SUCCESS' || latestJob?.status === 'FAILURE';
 
     useEffect(() => {
-        if (!latestJob || latestJob.status === 'SUCCESS' || latestJob.status === 'FAILURE') {
+        if (!latestJob || jobFinished) {
             setIsGenerating(false);
             return;
         }
-        const intervalId = setInterval(async () => {
-            try {
-                const res = await axios.get<{ task_id: string; status: JobStatus; result: any }>(`${API_URL}/status/${latestJob.id}`);
-                if (res.data.status === 'SUCCESS' || res.data.status === 'FAILURE') {
-                    setLatestJob(prev => prev ? { ...prev, status: res.data.status, result: res.data.result } : null);
-                    clearInterval(intervalId);
-                }
-            } catch (error) {
-                console.error(`Error polling job ${latestJob.id}:`, error);
+        // The backend pushes progress over Server-Sent Events instead of us polling /status
+        const source = new EventSource(`${API_URL}/events/${latestJob.id}`);
+        source.addEventListener('asset', (e) => {
+            const data = JSON.parse((e as MessageEvent).data);
+            setAssetUrls(prev => ({ ...prev, [data.key]: data.url }));
+        });
+        source.addEventListener('progress', (e) => {
+            const data = JSON.parse((e as MessageEvent).data);
+            setProgress(prev => ({ ...prev, [data.asset]: Math.round((100 * data.step) / data.total) }));
+        });
+        source.addEventListener('status', (e) => {
+            const data = JSON.parse((e as MessageEvent).data);
+            if (data.status === 'SUCCESS' || data.status === 'FAILURE') {
+                source.close();
+                setLatestJob(prev => prev ? { ...prev, status: data.status, result: data.result } : null);
+            } else {
+                setLatestJob(prev => prev ? { ...prev, status: data.status } : null);
+            }
+        });
+        source.onerror = () => {
+            // EventSource reconnects on its own (resuming via Last-Event-ID); only give up if it closed
+            if (source.readyState === EventSource.CLOSED) {
+                console.error(`Event stream for job ${latestJob.id} closed`);
                 setLatestJob(prev => prev ? { ...prev, status: 'FAILURE' } : null);
-                clearInterval(intervalId);
             }
-        }, 3000);
-        return () => clearInterval(intervalId);
-    }, [latestJob]);
+        };
+        return () => source.close();
+    }, [latestJob?.id, jobFinished]);
 
     const handleInputChange = (e: React.ChangeEvent<HTMLInputElement | HTMLTextAreaElement>) => {
         const { name, value } = e.target;
@@ -120,6 +138,8 @@ function App() {
         setIsGenerating(true);
         setShowPreview(false);
         setLatestJob(null);
+        setAssetUrls({});
+        setProgress({});
         try {
             const res = await axios.post<{ task_id: string }>(`${API_URL}/generate-game`, formData);
             setLatestJob({ id: res.data.task_id, status: 'QUEUED', formData, result: null });
@@ -186,6 +206,16 @@ function App() {
                             <p className={`job-status status-${latestJob.status.toLowerCase()}`}>
                                 Status: {latestJob.status}
                             </p>
+                            {latestJob.status === 'STARTED' && (
+                                <div className="streamed-assets">
+                                    {Object.entries(progress).map(([asset, percent]) => (
+                                        <p key={asset}>{asset}: {percent}%</p>
+                                    ))}
+                                    {Object.entries(assetUrls).map(([key, url]) => (
+                                        <img key={key} src={`${API_URL}/${url}`} alt={key} width={96} />
+                                    ))}
+                                </div>
+                            )}
                             {latestJob.status === 'SUCCESS' && latestJob.result && (
                                 <div className="actions-container">
                                     <button className="action-button preview" onClick={() => setShowPreview(true)}>